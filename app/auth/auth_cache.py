@@ -0,0 +1,84 @@
+import time
+from dataclasses import dataclass
+from sqlalchemy import event
+from app.config.classes import AuthCacheConfig
+from app.config.constants import AUTH_CACHE_CONFIG
+from app.models.db_model import User
+from app.utils.cache import BoundedCache
+
+
+@dataclass(frozen=True)
+class CurrentUser:
+    id: int
+    username: str
+
+
+class AuthCache:
+    def __init__(self, config: AuthCacheConfig):
+        self.enabled = config.enabled
+        self.ttl_seconds = config.ttl_seconds
+        # Values carry their own deadline: BoundedCache's TTL is an idle
+        # timeout, but a busy token or user must still be re-checked.
+        self.tokens = BoundedCache(max_entries=config.token_entries,
+                                   ttl_seconds=config.ttl_seconds)
+        self.users = BoundedCache(max_entries=config.user_entries,
+                                  ttl_seconds=config.ttl_seconds)
+
+    def token_user_id(self, token: str) -> int | None:
+        if not self.enabled:
+            return None
+        entry = self.tokens.get(token)
+        if entry is None:
+            return None
+        user_id, deadline = entry
+        if time.time() >= deadline:
+            self.tokens.pop(token)
+            return None
+        return user_id
+
+    def user(self, user_id: int) -> CurrentUser | None:
+        if not self.enabled:
+            return None
+        entry = self.users.get(user_id)
+        if entry is None:
+            return None
+        user, deadline = entry
+        if time.monotonic() >= deadline:
+            self.users.pop(user_id)
+            return None
+        return user
+
+    def remember(self, token: str, user: User,
+                 expires_at: float | None) -> CurrentUser:
+        current = self.remember_user(user)
+        if self.enabled:
+            # A cached token never outlives its own `exp` claim.
+            deadline = time.time() + self.ttl_seconds
+            if expires_at is not None:
+                deadline = min(deadline, expires_at)
+            self.tokens.set(token, (current.id, deadline))
+        return current
+
+    def remember_user(self, user: User) -> CurrentUser:
+        current = CurrentUser(id=user.id, username=user.username)
+        if self.enabled:
+            self.users.set(user.id, (current,
+                                     time.monotonic() + self.ttl_seconds))
+        return current
+
+    def invalidate_user(self, user_id: int):
+        # Cached tokens still map to the id, but the next request has to
+        # load the user again (and gets a 401 if it is gone).
+        self.users.pop(user_id)
+
+    def stats(self) -> dict:
+        return {"tokens": self.tokens.stats(), "users": self.users.stats()}
+
+
+auth_cache = AuthCache(AUTH_CACHE_CONFIG)
+
+
+@event.listens_for(User, "after_update")
+@event.listens_for(User, "after_delete")
+def _user_changed(mapper, connection, target: User):
+    auth_cache.invalidate_user(target.id)
@@ -1,16 +1,33 @@
-from fastapi import Depends, HTTPException, status
+from fastapi import Depends, HTTPException, WebSocket, status
 from fastapi.security import OAuth2PasswordBearer
 from sqlalchemy.orm import Session
+from app.auth.auth_cache import CurrentUser, auth_cache
 from app.auth.jwt_handler import decode_access_token
+from app.models.db_model import User
 from app.services.user_service import get_user_by_username
 from app.utils.helpers import get_db
+from app.utils.metrics import timed
 
 
 oauth2_scheme = OAuth2PasswordBearer(tokenUrl="login")
 
 
-def get_current_user(token: str = Depends(oauth2_scheme),
-                     db: Session = Depends(get_db)):
+def authenticate(token: str, db: Session) -> CurrentUser:
+    # A token verified earlier skips the signature check, and a cached
+    # user skips the query; the session stays unused on that path.
+    user_id = auth_cache.token_user_id(token)
+    if user_id is not None:
+        user = auth_cache.user(user_id)
+        if user is not None:
+            return user
+        row = db.get(User, user_id)
+        if not row:
+            raise HTTPException(
+                status_code=status.HTTP_401_UNAUTHORIZED,
+                detail="User not found",
+            )
+        return auth_cache.remember_user(row)
+
     payload = decode_access_token(token)
     if not payload or "sub" not in payload:
         raise HTTPException(
@@ -23,4 +40,20 @@ def get_current_user(token: str = Depends(oauth2_scheme),
             status_code=status.HTTP_401_UNAUTHORIZED,
             detail="User not found",
         )
-    return user
+    return auth_cache.remember(token, user, payload.get("exp"))
+
+
+def get_current_user(token: str = Depends(oauth2_scheme),
+                     db: Session = Depends(get_db)) -> CurrentUser:
+    with timed("auth"):
+        return authenticate(token, db)
+
+
+def get_websocket_user(websocket: WebSocket,
+                       db: Session) -> CurrentUser | None:
+    token = websocket.query_params.get("token", "")
+    try:
+        with timed("auth"):
+            return authenticate(token, db)
+    except HTTPException:
+        return None
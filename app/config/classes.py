@@ -1,3 +1,4 @@
+from typing import Literal
 from pydantic import (SecretStr,
                       Field,
                       BaseModel,
@@ -34,13 +35,237 @@ class ModelConfig(BaseSettings):
         return self
 
 
+class ClientConfig(BaseSettings):
+    base_url: str | None = Field(default=None, alias="OPENAI_BASE_URL")
+    max_connections: PositiveInt = 100
+    max_keepalive_connections: PositiveInt = 20
+    keepalive_expiry: float = Field(default=30.0, gt=0.0)
+    connect_timeout: float = Field(default=5.0, gt=0.0)
+    stt_timeout: float = Field(default=60.0, gt=0.0)
+    tts_timeout: float = Field(default=60.0, gt=0.0)
+    image_timeout: float = Field(default=120.0, gt=0.0)
+    max_retries: int = Field(default=2, ge=0)
+
+    model_config = SettingsConfigDict(
+        env_file=".env",
+        env_file_encoding="utf-8",
+        env_prefix="OPENAI_CLIENT_",
+        case_sensitive=False,
+        populate_by_name=True,
+        extra="ignore",
+    )
+
+
+class AgentCacheConfig(BaseSettings):
+    max_entries: PositiveInt = 1000
+    ttl_seconds: float = Field(default=3600.0, gt=0.0)
+    max_bytes: PositiveInt = 64 * 1024 * 1024
+
+    model_config = SettingsConfigDict(
+        env_file=".env",
+        env_file_encoding="utf-8",
+        env_prefix="AGENT_CACHE_",
+        case_sensitive=False,
+        extra="ignore",
+    )
+
+
+class SemanticCacheConfig(BaseSettings):
+    enabled: bool = False
+    threshold: float = Field(default=0.9, gt=0.0, le=1.0)
+    ttl_seconds: float = Field(default=86400.0, gt=0.0)
+    max_entries: PositiveInt = 1000
+
+    model_config = SettingsConfigDict(
+        env_file=".env",
+        env_file_encoding="utf-8",
+        env_prefix="SEMANTIC_CACHE_",
+        case_sensitive=False,
+        extra="ignore",
+    )
+
+
+class EmbeddingCacheConfig(BaseSettings):
+    enabled: bool = True
+    max_entries: PositiveInt = 100_000
+    memory_entries: PositiveInt = 1024
+    touch_interval_seconds: float = Field(default=3600.0, ge=0.0)
+
+    model_config = SettingsConfigDict(
+        env_file=".env",
+        env_file_encoding="utf-8",
+        env_prefix="EMBEDDING_CACHE_",
+        case_sensitive=False,
+        extra="ignore",
+    )
+
+
+class AuthCacheConfig(BaseSettings):
+    enabled: bool = True
+    token_entries: PositiveInt = 10_000
+    user_entries: PositiveInt = 10_000
+    ttl_seconds: float = Field(default=300.0, gt=0.0)
+
+    model_config = SettingsConfigDict(
+        env_file=".env",
+        env_file_encoding="utf-8",
+        env_prefix="AUTH_CACHE_",
+        case_sensitive=False,
+        extra="ignore",
+    )
+
+
+class SttConfig(BaseSettings):
+    model: str = "gpt-4o-mini-transcribe"
+    fallback_model: str = "whisper-1"
+    max_upload_bytes: PositiveInt = 25 * 1024 * 1024
+    chunk_size: PositiveInt = 64 * 1024
+    latency_budget_seconds: float = Field(default=30.0, gt=0.0)
+    primary_share: float = Field(default=0.6, gt=0.0, le=1.0)
+    min_fallback_seconds: float = Field(default=2.0, ge=0.0)
+
+    model_config = SettingsConfigDict(
+        env_file=".env",
+        env_file_encoding="utf-8",
+        env_prefix="STT_",
+        case_sensitive=False,
+        extra="ignore",
+    )
+
+
+class TtsCacheConfig(BaseSettings):
+    enabled: bool = True
+    max_bytes: PositiveInt = 256 * 1024 * 1024
+    chunk_size: PositiveInt = 16 * 1024
+
+    model_config = SettingsConfigDict(
+        env_file=".env",
+        env_file_encoding="utf-8",
+        env_prefix="TTS_CACHE_",
+        case_sensitive=False,
+        extra="ignore",
+    )
+
+
+class ImageJobConfig(BaseSettings):
+    model: str = "gpt-image-1"
+    size: str = "1024x1024"
+    max_concurrency: PositiveInt = 2
+    stale_after_seconds: float = Field(default=600.0, gt=0.0)
+    wait_seconds: float = Field(default=180.0, gt=0.0)
+
+    model_config = SettingsConfigDict(
+        env_file=".env",
+        env_file_encoding="utf-8",
+        env_prefix="IMAGE_JOBS_",
+        case_sensitive=False,
+        extra="ignore",
+    )
+
+
+class SingleFlightConfig(BaseSettings):
+    enabled: bool = True
+
+    model_config = SettingsConfigDict(
+        env_file=".env",
+        env_file_encoding="utf-8",
+        env_prefix="SINGLE_FLIGHT_",
+        case_sensitive=False,
+        extra="ignore",
+    )
+
+
+class MetricsConfig(BaseSettings):
+    enabled: bool = True
+    server_timing: bool = False
+
+    model_config = SettingsConfigDict(
+        env_file=".env",
+        env_file_encoding="utf-8",
+        env_prefix="METRICS_",
+        case_sensitive=False,
+        extra="ignore",
+    )
+
+
+class ReadinessConfig(BaseSettings):
+    retry_initial_seconds: float = Field(default=1.0, gt=0.0)
+    retry_max_seconds: float = Field(default=60.0, gt=0.0)
+
+    model_config = SettingsConfigDict(
+        env_file=".env",
+        env_file_encoding="utf-8",
+        env_prefix="READINESS_",
+        case_sensitive=False,
+        extra="ignore",
+    )
+
+
+class VectorStoreConfig(BaseSettings):
+    backend: Literal["chroma", "numpy"] = "chroma"
+    dtype: Literal["float32", "float16", "int8"] = "float32"
+
+    model_config = SettingsConfigDict(
+        env_file=".env",
+        env_file_encoding="utf-8",
+        env_prefix="VECTOR_STORE_",
+        case_sensitive=False,
+        extra="ignore",
+    )
+
+
+class RetrievalConfig(BaseSettings):
+    mode: Literal["vector", "hybrid"] = "hybrid"
+    candidates: PositiveInt = 20
+    rrf_k: PositiveInt = 60
+    fast_path: bool = True
+    fast_path_margin: float = Field(default=2.0, ge=1.0)
+    max_batch_queries: PositiveInt = 100
+
+    model_config = SettingsConfigDict(
+        env_file=".env",
+        env_file_encoding="utf-8",
+        env_prefix="RETRIEVAL_",
+        case_sensitive=False,
+        extra="ignore",
+    )
+
+
+class DatabaseConfig(BaseSettings):
+    url: str = Field(default="sqlite:///./logs.db", alias="DATABASE_URL")
+    async_sessions: bool = False
+    sqlite_journal_mode: Literal["wal", "delete", "truncate"] = "wal"
+    sqlite_synchronous: Literal["off", "normal", "full"] = "normal"
+    sqlite_busy_timeout_ms: int = Field(default=5000, ge=0)
+    sqlite_cache_size_kib: PositiveInt = 16384
+    sqlite_mmap_size: int = Field(default=64 * 1024 * 1024, ge=0)
+    pool_size: PositiveInt = 5
+    max_overflow: int = Field(default=10, ge=0)
+
+    model_config = SettingsConfigDict(
+        env_file=".env",
+        env_file_encoding="utf-8",
+        env_prefix="DATABASE_",
+        case_sensitive=False,
+        populate_by_name=True,
+        extra="ignore",
+    )
+
+
 class PromptConfig(BaseModel):
     memory_span: PositiveInt = 10  # Number of exchanges to remember
+    history_token_budget: PositiveInt = 2000  # Hard cap on chat_history
+    full_reply_turns: PositiveInt = 1  # Newest replies kept untrimmed
+    trimmed_reply_tokens: PositiveInt = 120  # Older replies cut to this
+    rolling_summary: bool = False  # Fold dropped turns into a summary
+    summary_token_budget: PositiveInt = 300
+    speculative_prefetch: bool = False  # Search while the LLM first thinks
     instructions: str = ("""You are Smart Librarian — a concise, helpful assistant that recommends and summarizes books strictly from our internal library via tools.
 Never recommend or discuss a book unless it was returned by the search_relevant_books tool.  
 If a title is mentioned by the user, always verify it using get_summary_by_title.
 search_relevant_books(query): Returns a list of titles ranked by topic that is MANDATORY to be IMMEDIATELY presented to the user.
 get_summary_by_title(title): Returns the full summary for a specific book.
+search_relevant_books_batch(queries): Same as search_relevant_books for several topics in one call; use it when the user asks about more than one topic and present one ranked list per topic.
 
 When asked for a topic or genre:
 1. Call search_relevant_books.
@@ -1,20 +1,68 @@
 import os
 from pathlib import Path
-from app.config.classes import ModelConfig, PromptConfig
+from app.config.classes import (ModelConfig,
+                                PromptConfig,
+                                ClientConfig,
+                                AgentCacheConfig,
+                                SemanticCacheConfig,
+                                EmbeddingCacheConfig,
+                                AuthCacheConfig,
+                                SttConfig,
+                                TtsCacheConfig,
+                                ImageJobConfig,
+                                MetricsConfig,
+                                ReadinessConfig,
+                                SingleFlightConfig,
+                                VectorStoreConfig,
+                                RetrievalConfig,
+                                DatabaseConfig)
 
 SECRET_KEY = os.getenv("SECRET_KEY", "secret_key_placeholder")
 ALGORITHM = "HS256"
-DATABASE_URL = "sqlite:///./logs.db"
+DATABASE_CONFIG = DatabaseConfig()
 MODEL_CONFIG = ModelConfig()
+CLIENT_CONFIG = ClientConfig()
+AGENT_CACHE_CONFIG = AgentCacheConfig()
+SEMANTIC_CACHE_CONFIG = SemanticCacheConfig()
+EMBEDDING_CACHE_CONFIG = EmbeddingCacheConfig()
+AUTH_CACHE_CONFIG = AuthCacheConfig()
+STT_CONFIG = SttConfig()
+TTS_CACHE_CONFIG = TtsCacheConfig()
+IMAGE_JOB_CONFIG = ImageJobConfig()
+METRICS_CONFIG = MetricsConfig()
+READINESS_CONFIG = ReadinessConfig()
+SINGLE_FLIGHT_CONFIG = SingleFlightConfig()
+VECTOR_STORE_CONFIG = VectorStoreConfig()
+RETRIEVAL_CONFIG = RetrievalConfig()
 PROMPT_CONFIG = PromptConfig()
 DATA_PATH = (Path(__file__).resolve()
              .parents[2]
              / "data"
              / "book_summaries.json")
+CATALOG_STORE_PATH = (Path(__file__).resolve()
+                      .parents[2]
+                      / "data"
+                      / "catalog.bin")
 CHROMA_PATH = (Path(__file__).resolve()
                .parents[2]
                / "data"
                / "chroma_store")
+EMBEDDING_CACHE_PATH = (Path(__file__).resolve()
+                        .parents[2]
+                        / "data"
+                        / "embedding_cache.db")
+VECTOR_INDEX_PATH = (Path(__file__).resolve()
+                     .parents[2]
+                     / "data"
+                     / "vector_index")
+TTS_CACHE_PATH = (Path(__file__).resolve()
+                  .parents[2]
+                  / "data"
+                  / "tts_cache")
+IMAGE_STORE_PATH = (Path(__file__).resolve()
+                    .parents[2]
+                    / "data"
+                    / "images")
 FORBIDDEN_WORDS = [
     "prost", "proasta", "idiot", "idioata", "cretin", "cretina", "nebun",
     "nebuna", "bou", "vacă", "dobitoc", "dobitocă", "tâmpit", "tâmpită",
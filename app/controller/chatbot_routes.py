@@ -1,22 +1,194 @@
-import base64
-from io import BytesIO
-from fastapi.responses import Response
-from openai import OpenAI
-from app.utils.helpers import bots, get_db
+import json
+import time
+import asyncio
+import hashlib
+import tempfile
+from pathlib import Path
+from contextlib import AsyncExitStack
+from fastapi.responses import FileResponse, Response, StreamingResponse
+from app.utils.helpers import bots, get_db, get_openai
 from fastapi import APIRouter, Depends, HTTPException, status
-from fastapi import UploadFile, File
+from fastapi import Header, Query, UploadFile, File
+from fastapi import WebSocket, WebSocketDisconnect
+from sqlalchemy import func, select, tuple_
 from sqlalchemy.orm import Session
-from app.auth.jwt_auth import get_current_user
+from app.auth.jwt_auth import get_current_user, get_websocket_user
+from app.services.db_connection import SessionLocal, async_session
+from app.services.history import load_history, load_history_async
 from app.models import db_model as m
 from app.models.schemas import (ConversationOut,
                                 ConversationWithMessages,
                                 MessageIn)
-from app.config.constants import MODEL_CONFIG, PROMPT_CONFIG
+from app.config.constants import MODEL_CONFIG, PROMPT_CONFIG, CLIENT_CONFIG
+from app.config.constants import DATABASE_CONFIG, TTS_CACHE_CONFIG
+from app.config.constants import STT_CONFIG, TTS_CACHE_PATH
 from app.services.chat_service import create_agent  # your bot factory
+from app.utils.audio_cache import AudioCache
+from app.utils.metrics import timed
+from app.utils.single_flight import Abandoned, single_flight
 
 
 router = APIRouter()
 
+TTS_VOICE = "alloy"
+TTS_MODELS = ("gpt-4o-mini-tts", "gpt-4o-realtime-preview-2024-12-17")
+tts_cache = AudioCache(TTS_CACHE_PATH, TTS_CACHE_CONFIG.max_bytes)
+tts_flights = single_flight("tts")
+
+
+def _get_chatbot(conversation_id: int):
+    bot = bots.get(conversation_id)
+    if bot is None:
+        bot = create_agent(MODEL_CONFIG, PROMPT_CONFIG)
+        bots.set(conversation_id, bot)
+    return bot
+
+
+def _owned_conversation(db: Session, conversation_id: int, user_id: int):
+    return (
+        db.query(m.Conversation)
+        .filter(m.Conversation.id == conversation_id,
+                m.Conversation.user_id == user_id)
+        .first()
+    )
+
+
+def _release_owned(db: Session, conversation_id: int, user_id: int):
+    # Run in a worker thread by the async routes; the connection goes back
+    # to the pool before they wait on the socket or the API.
+    try:
+        return _owned_conversation(db, conversation_id, user_id)
+    finally:
+        db.close()
+
+
+def _add_turn(db, conv: m.Conversation, content: str, reply: str):
+    # The whole turn goes into one transaction: a single commit (and on
+    # SQLite a single WAL append) instead of one per row.
+    db.add(m.Message(conversation_id=conv.id, role="user", content=content))
+    db.add(m.Message(conversation_id=conv.id,
+                     role="assistant",
+                     content=reply))
+    if conv.title == "New conversation":
+        words = content.split()
+        conv.title = " ".join(words[:8]) if words else "New conversation"
+
+
+def _save_turn(conversation_id: int, content: str, reply: str):
+    with SessionLocal() as db:
+        conv = db.get(m.Conversation, conversation_id)
+        if not conv:
+            return
+        _add_turn(db, conv, content, reply)
+        db.commit()
+
+
+async def _save_turn_async(conversation_id: int, content: str, reply: str):
+    if not DATABASE_CONFIG.async_sessions:
+        await asyncio.to_thread(_save_turn, conversation_id, content, reply)
+        return
+    async with async_session() as db:
+        conv = await db.get(m.Conversation, conversation_id)
+        if not conv:
+            return
+        _add_turn(db, conv, content, reply)
+        await db.commit()
+
+
+def _load_history(conversation_id: int) -> list[tuple[str, str]]:
+    with SessionLocal() as db:
+        return load_history(db, conversation_id, PROMPT_CONFIG.memory_span)
+
+
+async def _load_history_async(conversation_id: int
+                              ) -> list[tuple[str, str]]:
+    if not DATABASE_CONFIG.async_sessions:
+        return await asyncio.to_thread(_load_history, conversation_id)
+    async with async_session() as db:
+        return await load_history_async(db, conversation_id,
+                                        PROMPT_CONFIG.memory_span)
+
+
+def _anchor(db: Session, conversation_id: int, message_id: int):
+    # The pair is compared inside the query, as stored; an id from another
+    # conversation (or 0) falls back to comparing ids.
+    anchor = (select(m.Message.created_at, m.Message.id)
+              .where(m.Message.id == message_id,
+                     m.Message.conversation_id == conversation_id,
+                     m.Message.created_at.is_not(None)))
+    if db.execute(anchor).first() is None:
+        return None
+    return anchor.scalar_subquery()
+
+
+def _messages(db: Session,
+              conversation_id: int,
+              since_id: int | None = None,
+              before_id: int | None = None,
+              limit: int | None = None) -> tuple[list[m.Message], bool]:
+    # Keyset paging on (created_at, id), the order messages are shown in:
+    # the anchor messages are looked up and rows are compared with them as
+    # a pair, so a page costs the same however long the conversation is.
+    # ix_messages_conv_created covers the pair (the id is the rowid on
+    # SQLite).
+    query = db.query(m.Message).filter(
+        m.Message.conversation_id == conversation_id)
+    key = tuple_(m.Message.created_at, m.Message.id)
+    if since_id is not None:
+        anchor = _anchor(db, conversation_id, since_id)
+        query = query.filter(key > anchor if anchor is not None
+                             else m.Message.id > since_id)
+    if before_id is not None:
+        anchor = _anchor(db, conversation_id, before_id)
+        query = query.filter(key < anchor if anchor is not None
+                             else m.Message.id < before_id)
+    if limit is None:
+        return (query.order_by(m.Message.created_at.asc(),
+                               m.Message.id.asc()).all(), False)
+    # The newest `limit` messages (one extra tells us whether more exist),
+    # returned oldest first like the unpaged response.
+    msgs = (query.order_by(m.Message.created_at.desc(), m.Message.id.desc())
+            .limit(limit + 1).all())
+    return list(reversed(msgs[:limit])), len(msgs) > limit
+
+
+def _conversation_out(conv: m.Conversation,
+                      msgs: list[m.Message],
+                      has_more: bool = False) -> dict:
+    return {
+        "conversation": {"id": conv.id, "title": conv.title},
+        "messages": [{"id": m_.id,
+                      "role": m_.role,
+                      "content": m_.content} for m_ in msgs],
+        "has_more": has_more,
+    }
+
+
+def _conversation_etag(db: Session, conv: m.Conversation, *params) -> str:
+    # Messages are append-only, so the newest id and the count change
+    # whenever the history does; the title covers renames.
+    last_id, count = (
+        db.query(func.max(m.Message.id), func.count(m.Message.id))
+        .filter(m.Message.conversation_id == conv.id)
+        .one()
+    )
+    digest = hashlib.sha256(
+        repr((conv.id, conv.title, last_id, count, params)).encode())
+    return f'W/"{digest.hexdigest()[:32]}"'
+
+
+async def _stream_reply(conversation_id: int, content: str):
+    # History comes from the database on every turn, so any worker or
+    # replica can serve any conversation; the cached bot only saves work.
+    history = await _load_history_async(conversation_id)
+    bot = _get_chatbot(conversation_id)
+    async for event in bot.astream(content, history):
+        if event["event"] == "done":
+            await _save_turn_async(conversation_id, content,
+                                   event["data"]["content"])
+            bots.set(conversation_id, bot)
+        yield event
+
 
 @router.post("/conversations", response_model=ConversationOut)
 def create_conversation(db: Session = Depends(get_db),
@@ -26,8 +198,6 @@ def create_conversation(db: Session = Depends(get_db),
     db.commit()
     db.refresh(conv)
 
-    bots[conv.id] = create_agent(MODEL_CONFIG, PROMPT_CONFIG)
-
     return {"id": conv.id, "title": conv.title}
 
 
@@ -46,6 +216,11 @@ def list_conversations(db: Session = Depends(get_db),
 @router.get("/conversations/{conversation_id}",
             response_model=ConversationWithMessages)
 def get_conversation(conversation_id: int,
+                     response: Response,
+                     since_id: int | None = Query(default=None, ge=0),
+                     before_id: int | None = Query(default=None, ge=1),
+                     limit: int | None = Query(default=None, ge=1, le=200),
+                     if_none_match: str | None = Header(default=None),
                      db: Session = Depends(get_db),
                      current_user=Depends(get_current_user)):
     conv = (
@@ -58,24 +233,23 @@ def get_conversation(conversation_id: int,
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND,
                             detail="Conversation not found")
 
-    msgs = (
-        db.query(m.Message)
-        .filter(m.Message.conversation_id == conv.id)
-        .order_by(m.Message.created_at.asc())
-        .all()
-    )
-    return {
-        "conversation": {"id": conv.id, "title": conv.title},
-        "messages": [{"id": m_.id,
-                      "role": m_.role,
-                      "content": m_.content} for m_ in msgs],
-    }
+    etag = _conversation_etag(db, conv, since_id, before_id, limit)
+    headers = {"ETag": etag, "Cache-Control": "private, no-cache"}
+    if if_none_match and etag in [tag.strip()
+                                  for tag in if_none_match.split(",")]:
+        return Response(status_code=status.HTTP_304_NOT_MODIFIED,
+                        headers=headers)
+    response.headers.update(headers)
+
+    msgs, has_more = _messages(db, conv.id, since_id, before_id, limit)
+    return _conversation_out(conv, msgs, has_more)
 
 
 @router.post("/conversations/{conversation_id}/messages",
              response_model=ConversationWithMessages)
 def send_message(conversation_id: int,
                  payload: MessageIn,
+                 since_id: int | None = None,
                  db: Session = Depends(get_db),
                  current_user=Depends(get_current_user)):
     conv = (
@@ -91,41 +265,70 @@ def send_message(conversation_id: int,
         raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST,
                             detail="Message content required")
 
-    user_msg = m.Message(conversation_id=conv.id,
-                         role="user",
-                         content=payload.content.strip())
-    db.add(user_msg)
+    history = load_history(db, conv.id, PROMPT_CONFIG.memory_span)
+    chat_fn = _get_chatbot(conv.id)
+    bot_reply = chat_fn(payload.content.strip(), history)
+    bots.set(conv.id, chat_fn)
+
+    _add_turn(db, conv, payload.content.strip(), bot_reply)
     db.commit()
 
-    if conv.id not in bots:
-        bots[conv.id] = create_agent(MODEL_CONFIG, PROMPT_CONFIG)
+    # With since_id only what the client has not seen yet comes back,
+    # normally just this turn's user/assistant pair.
+    msgs, _ = _messages(db, conv.id, since_id=since_id)
+    return _conversation_out(conv, msgs)
 
-    chat_fn = bots[conv.id]
-    bot_reply = chat_fn(payload.content.strip())
 
-    bot_msg = m.Message(conversation_id=conv.id,
-                        role="assistant",
-                        content=bot_reply)
-    db.add(bot_msg)
-    db.commit()
+@router.post("/conversations/{conversation_id}/messages/stream")
+def stream_message(conversation_id: int,
+                   payload: MessageIn,
+                   db: Session = Depends(get_db),
+                   current_user=Depends(get_current_user)):
+    conv = _owned_conversation(db, conversation_id, current_user.id)
+    if not conv:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND,
+                            detail="Conversation not found")
+    content = payload.content.strip()
+    if not content:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST,
+                            detail="Message content required")
 
-    if conv.title == "New conversation":
-        words = payload.content.strip().split()
-        conv.title = " ".join(words[:8]) if words else "New conversation"
-        db.commit()
+    async def event_source():
+        async for event in _stream_reply(conversation_id, content):
+            yield (f"event: {event['event']}\n"
+                   f"data: {json.dumps(event['data'])}\n\n")
+
+    return StreamingResponse(event_source(),
+                             media_type="text/event-stream",
+                             headers={"Cache-Control": "no-cache",
+                                      "X-Accel-Buffering": "no"})
+
+
+@router.websocket("/conversations/{conversation_id}/ws")
+async def conversation_socket(websocket: WebSocket,
+                              conversation_id: int,
+                              db: Session = Depends(get_db)):
+    current_user = await asyncio.to_thread(get_websocket_user, websocket, db)
+    conv = (await asyncio.to_thread(_release_owned, db, conversation_id,
+                                    current_user.id)
+            if current_user else None)
+    if not conv:
+        await websocket.close(code=status.WS_1008_POLICY_VIOLATION)
+        return
 
-    msgs = (
-        db.query(m.Message)
-        .filter(m.Message.conversation_id == conv.id)
-        .order_by(m.Message.created_at.asc())
-        .all()
-    )
-    return {
-        "conversation": {"id": conv.id, "title": conv.title},
-        "messages": [{"id": m_.id,
-                      "role": m_.role,
-                      "content": m_.content} for m_ in msgs],
-    }
+    await websocket.accept()
+    try:
+        while True:
+            message = await websocket.receive_json()
+            content = str(message.get("content") or "").strip()
+            if not content:
+                await websocket.send_json(
+                    {"event": "error", "data": "Message content required"})
+                continue
+            async for event in _stream_reply(conversation_id, content):
+                await websocket.send_json(event)
+    except WebSocketDisconnect:
+        return
 
 
 @router.delete("/conversations/{conversation_id}")
@@ -149,135 +352,194 @@ def delete_conversation(conversation_id: int,
     return
 
 
+async def _spool_upload(upload: UploadFile):
+    # Copied in chunks to a temp file on disk, so the audio never sits in
+    # memory as one buffer. UploadLimitMiddleware has already turned away
+    # bodies far over the limit; this enforces the exact file size.
+    suffix = Path(upload.filename or "audio.webm").suffix or ".webm"
+    spool = tempfile.NamedTemporaryFile(suffix=suffix)
+    size = 0
+    try:
+        while chunk := await upload.read(STT_CONFIG.chunk_size):
+            size += len(chunk)
+            if size > STT_CONFIG.max_upload_bytes:
+                raise HTTPException(
+                    status_code=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE,
+                    detail="Audio upload too large")
+            spool.write(chunk)
+        if not size:
+            raise HTTPException(status_code=400,
+                                detail="Empty audio upload")
+    except BaseException:
+        spool.close()
+        raise
+    finally:
+        await upload.close()
+    spool.flush()
+    spool.seek(0)
+    return spool
+
+
+async def _transcribe(client, audio) -> str:
+    # Both attempts share one latency budget: the primary model gets its
+    # share, the fallback only whatever is left of the budget.
+    deadline = time.monotonic() + STT_CONFIG.latency_budget_seconds
+    client = client.with_options(max_retries=0)
+    try:
+        res = await client.audio.transcriptions.create(
+            model=STT_CONFIG.model,
+            file=audio,
+            response_format="json",
+            timeout=min(CLIENT_CONFIG.stt_timeout,
+                        STT_CONFIG.latency_budget_seconds
+                        * STT_CONFIG.primary_share)
+        )
+        return (res.text or "").strip()
+    except Exception:
+        remaining = min(CLIENT_CONFIG.stt_timeout,
+                        deadline - time.monotonic())
+        if remaining < STT_CONFIG.min_fallback_seconds:
+            raise HTTPException(status_code=status.HTTP_504_GATEWAY_TIMEOUT,
+                                detail="Transcription timed out")
+        audio.seek(0)
+        res2 = await client.audio.transcriptions.create(
+            model=STT_CONFIG.fallback_model,
+            file=audio,
+            response_format="text",
+            timeout=remaining
+        )
+        return (res2.strip() if isinstance(res2, str)
+                else str(res2 or "").strip())
+
+
 @router.post("/conversations/{conversation_id}/stt",
              response_model=ConversationWithMessages)
 async def speech_to_text(conversation_id: int,
                          file: UploadFile = File(...),
+                         since_id: int | None = None,
                          db: Session = Depends(get_db),
+                         client=Depends(get_openai),
                          current_user=Depends(get_current_user)):
-    conv = (
-        db.query(m.Conversation)
-        .filter(m.Conversation.id == conversation_id,
-                m.Conversation.user_id == current_user.id)
-        .first()
-    )
+    conv = await asyncio.to_thread(_release_owned, db, conversation_id,
+                                   current_user.id)
     if not conv:
         raise HTTPException(status_code=404, detail="Conversation not found")
 
-    audio_bytes = await file.read()
-    await file.close()
-    if not audio_bytes:
-        raise HTTPException(status_code=400, detail="Empty audio upload")
-
-    client = OpenAI()
-
-    bio = BytesIO(audio_bytes)
-    bio.name = file.filename or "audio.webm"
-
-    transcript = ""
-    try:
-        res = client.audio.transcriptions.create(
-            model="gpt-4o-mini-transcribe",
-            file=bio,
-            response_format="json"
-        )
-        transcript = (res.text or "").strip()
-    except Exception:
-        bio.seek(0)
-        res2 = client.audio.transcriptions.create(
-            model="whisper-1",
-            file=bio,
-            response_format="text"
-        )
-        transcript = res2.strip() if isinstance(res2, str) else str(res2 or "").strip()
+    with await _spool_upload(file) as spool:
+        # The raw file object: the client streams it from disk, and its
+        # name keeps the extension the API uses to detect the format.
+        with timed("stt"):
+            transcript = await _transcribe(client, spool.file)
 
     if not transcript:
         raise HTTPException(status_code=400, detail="Empty transcript")
 
+    # The agent turn is synchronous; run it off the event loop so other
+    # requests on this worker keep being served meanwhile.
     payload = MessageIn(content=transcript)
-    return send_message(conversation_id=conversation_id,
-                        payload=payload,
-                        db=db,
-                        current_user=current_user)
+    return await asyncio.to_thread(send_message,
+                                   conversation_id=conversation_id,
+                                   payload=payload,
+                                   since_id=since_id,
+                                   db=db,
+                                   current_user=current_user)
 
 
-@router.get("/conversations/{conversation_id}/tts")
-def text_to_speech(conversation_id: int,
-                   db: Session = Depends(get_db),
-                   current_user=Depends(get_current_user)):
-
-    msg = (
-        db.query(m.Message)
-        .join(m.Conversation)
-        .filter(m.Conversation.id == conversation_id,
-                m.Conversation.user_id == current_user.id,
-                m.Message.role == "assistant")
-        .order_by(m.Message.created_at.desc())
-        .first()
+def _last_reply(db: Session, conversation_id: int, user_id: int) -> str:
+    try:
+        msg = (
+            db.query(m.Message)
+            .join(m.Conversation)
+            .filter(m.Conversation.id == conversation_id,
+                    m.Conversation.user_id == user_id,
+                    m.Message.role == "assistant")
+            .order_by(m.Message.created_at.desc())
+            .first()
+        )
+        return (msg.content or "").strip() if msg else ""
+    finally:
+        # Hand the connection back to the pool before waiting on the API.
+        db.close()
+
+
+def _speech(client, model: str, text: str):
+    return client.audio.speech.with_streaming_response.create(
+        model=model,
+        voice=TTS_VOICE,
+        input=text,
+        timeout=CLIENT_CONFIG.tts_timeout
     )
 
-    client = OpenAI()
-
-    text_input = (msg.content or "").strip()
-    if not text_input:
-        raise HTTPException(status_code=400, detail="No text to synthesize")
 
+async def _open_speech(client, stack: AsyncExitStack, text: str):
+    primary, fallback = TTS_MODELS
     try:
-        with client.audio.speech.with_streaming_response.create(
-            model="gpt-4o-mini-tts",
-            voice="alloy",
-            input=text_input
-        ) as resp:
-            audio_bytes = resp.read()
+        return primary, await stack.enter_async_context(
+            _speech(client, primary, text))
     except Exception:
-        with client.audio.speech.with_streaming_response.create(
-            model="gpt-4o-realtime-preview-2024-12-17",
-            voice="alloy",
-            input=text_input
-        ) as resp:
-            audio_bytes = resp.read()
+        return fallback, await stack.enter_async_context(
+            _speech(client, fallback, text))
 
-    return Response(content=audio_bytes, media_type="audio/mpeg")
 
+async def _relay_speech(resp, stack: AsyncExitStack, key: str,
+                        flight_key: tuple, flight):
+    # Chunks go to the client as the API produces them and are teed into
+    # the cache; only a complete file is published there, and requests
+    # for the same text that arrived meanwhile are then served from it.
+    writer = tts_cache.writer(key) if TTS_CACHE_CONFIG.enabled else None
+    try:
+        async for chunk in resp.iter_bytes(TTS_CACHE_CONFIG.chunk_size):
+            if writer:
+                writer.write(chunk)
+            yield chunk
+    except BaseException:
+        if writer:
+            writer.discard()
+        raise
+    else:
+        if writer:
+            await asyncio.to_thread(writer.commit)
+            if writer.target.exists():
+                tts_flights.land(flight_key, flight, result=writer.target)
+    finally:
+        tts_flights.land(flight_key, flight, error=Abandoned())
+        await stack.aclose()
 
-@router.get("/conversations/{conversation_id}/image")
-def image_generator(conversation_id: int,
-                    db: Session = Depends(get_db),
-                    current_user=Depends(get_current_user)):
-
-    msgs = (
-        db.query(m.Message)
-        .join(m.Conversation)
-        .filter(m.Conversation.id == conversation_id,
-                m.Conversation.user_id == current_user.id)
-        .order_by(m.Message.created_at.desc())
-        .limit(2)
-        .all()
-    )
-    if not msgs:
-        raise HTTPException(status_code=404, detail="No messages found")
-
-    prompt = "\n\n".join([(mm.content or "").strip() for mm in reversed(msgs)]).strip()
-    if not prompt:
-        raise HTTPException(status_code=400, detail="No text to turn into image")
 
-    client = OpenAI()
+@router.get("/conversations/{conversation_id}/tts")
+async def text_to_speech(conversation_id: int,
+                         db: Session = Depends(get_db),
+                         client=Depends(get_openai),
+                         current_user=Depends(get_current_user)):
+    text_input = await asyncio.to_thread(_last_reply, db, conversation_id,
+                                         current_user.id)
+    if not text_input:
+        raise HTTPException(status_code=400, detail="No text to synthesize")
 
+    cached = TTS_CACHE_CONFIG.enabled and tts_cache.get(
+        *(AudioCache.key(model, TTS_VOICE, text_input)
+          for model in TTS_MODELS))
+    flight_key = (TTS_VOICE, text_input)
+    flight = None
+    if not cached and TTS_CACHE_CONFIG.enabled:
+        shared, cached = await tts_flights.follow(
+            flight_key, CLIENT_CONFIG.tts_timeout)
+        if not shared:
+            flight = tts_flights.lead(flight_key)
+    if cached:
+        # FileResponse answers Range/If-Range requests itself.
+        return FileResponse(cached, media_type="audio/mpeg")
+
+    stack = AsyncExitStack()
     try:
-        img = client.images.generate(
-            model="gpt-image-1",
-            prompt=prompt,
-            size="512x512",
-        )
-        image_b64 = img.data[0].b64_json
-    except Exception:
-        img = client.images.generate(
-            model="gpt-image-1",
-            prompt=prompt,
-            size="1024x1024"
-        )
-        image_b64 = img.data[0].b64_json
-
-    image_bytes = base64.b64decode(image_b64)
-    return Response(content=image_bytes, media_type="image/png")
-
+        with timed("tts"):
+            model, resp = await _open_speech(client, stack, text_input)
+    except BaseException as error:
+        await stack.aclose()
+        tts_flights.land(flight_key, flight, error=error)
+        raise
+    return StreamingResponse(
+        _relay_speech(resp, stack,
+                      AudioCache.key(model, TTS_VOICE, text_input),
+                      flight_key, flight),
+        media_type="audio/mpeg")
@@ -0,0 +1,32 @@
+from fastapi import APIRouter, HTTPException, status
+from fastapi.responses import JSONResponse, PlainTextResponse
+from app.config.constants import METRICS_CONFIG
+from app.services.readiness import readiness
+from app.utils.metrics import registry
+
+
+router = APIRouter()
+
+
+@router.get("/healthz")
+def healthz():
+    return {"status": "ok"}
+
+
+@router.get("/readyz")
+def readyz():
+    state = readiness.status()
+    return JSONResponse(
+        state,
+        status_code=(status.HTTP_200_OK if state["ready"]
+                     else status.HTTP_503_SERVICE_UNAVAILABLE)
+    )
+
+
+@router.get("/metrics", include_in_schema=False)
+def metrics():
+    # Per process: with several workers, scrape each one (or every pod).
+    if not METRICS_CONFIG.enabled:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND)
+    return PlainTextResponse(registry.render(),
+                             media_type="text/plain; version=0.0.4")
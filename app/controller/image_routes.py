@@ -0,0 +1,119 @@
+import asyncio
+from fastapi import APIRouter, Depends, HTTPException, Response, status
+from fastapi.responses import FileResponse
+from sqlalchemy.orm import Session
+from app.auth.jwt_auth import get_current_user
+from app.config.constants import IMAGE_JOB_CONFIG
+from app.models import db_model as m
+from app.models.schemas import ImageJobOut
+from app.services.chat_service import RESPECT_NOTICE
+from app.services.image_jobs import image_jobs
+from app.utils.helpers import get_db
+from app.utils.validators import language_filter
+
+
+router = APIRouter()
+
+
+def _image_prompt(db: Session, conversation_id: int, user_id: int) -> str:
+    msgs = (
+        db.query(m.Message)
+        .join(m.Conversation)
+        .filter(m.Conversation.id == conversation_id,
+                m.Conversation.user_id == user_id)
+        .order_by(m.Message.created_at.desc(), m.Message.id.desc())
+        .limit(2)
+        .all()
+    )
+    if not msgs:
+        raise HTTPException(status_code=404, detail="No messages found")
+
+    prompt = "\n\n".join([(mm.content or "").strip()
+                          for mm in reversed(msgs)]).strip()
+    if not prompt:
+        raise HTTPException(status_code=400,
+                            detail="No text to turn into image")
+    if language_filter(prompt):
+        raise HTTPException(status_code=400, detail=RESPECT_NOTICE)
+    return prompt
+
+
+def _job_out(job: m.ImageJob) -> dict:
+    return {"id": job.id,
+            "status": job.status,
+            "error": job.error,
+            "result_url": (f"/image/jobs/{job.id}/result"
+                           if job.status == "done" else None)}
+
+
+def _submit(db: Session, conversation_id: int,
+            user_id: int) -> tuple[dict, bool]:
+    # Run in a worker thread; the job is scheduled back on the event loop.
+    try:
+        job, needs_run = image_jobs.submit(
+            db, _image_prompt(db, conversation_id, user_id), conversation_id)
+        return _job_out(job), needs_run
+    finally:
+        db.close()
+
+
+async def _submit_job(db: Session, conversation_id: int,
+                      user_id: int) -> dict:
+    job, needs_run = await asyncio.to_thread(_submit, db, conversation_id,
+                                             user_id)
+    if needs_run:
+        image_jobs.schedule(job["id"])
+    return job
+
+
+@router.post("/conversations/{conversation_id}/image/jobs",
+             response_model=ImageJobOut,
+             status_code=status.HTTP_202_ACCEPTED)
+async def create_image_job(conversation_id: int,
+                           response: Response,
+                           db: Session = Depends(get_db),
+                           current_user=Depends(get_current_user)):
+    job = await _submit_job(db, conversation_id, current_user.id)
+    if job["status"] == "done":
+        response.status_code = status.HTTP_200_OK
+    return job
+
+
+@router.get("/image/jobs/{job_id}", response_model=ImageJobOut)
+def get_image_job(job_id: str,
+                  current_user=Depends(get_current_user)):
+    job = image_jobs.owned(job_id, current_user.id)
+    if not job:
+        raise HTTPException(status_code=404, detail="Image job not found")
+    return _job_out(job)
+
+
+@router.get("/image/jobs/{job_id}/result")
+def get_image_job_result(job_id: str,
+                         current_user=Depends(get_current_user)):
+    job = image_jobs.owned(job_id, current_user.id)
+    path = image_jobs.result_path(job_id)
+    if not job or job.status != "done" or not path.exists():
+        raise HTTPException(status_code=404, detail="Image not ready")
+    return FileResponse(path, media_type="image/png",
+                        headers={"Cache-Control": "private, max-age=86400"})
+
+
+@router.get("/conversations/{conversation_id}/image")
+async def image_generator(conversation_id: int,
+                          db: Session = Depends(get_db),
+                          current_user=Depends(get_current_user)):
+    # Kept for existing clients: the same job queue, waited on in-line.
+    job = await _submit_job(db, conversation_id, current_user.id)
+    job = await image_jobs.wait(job["id"], IMAGE_JOB_CONFIG.wait_seconds)
+    if job is None:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND,
+                            detail="Image job not found")
+    if job.status == "failed":
+        raise HTTPException(status_code=status.HTTP_502_BAD_GATEWAY,
+                            detail="Image generation failed")
+    if job.status != "done":
+        raise HTTPException(status_code=status.HTTP_504_GATEWAY_TIMEOUT,
+                            detail="Image generation still running")
+    return FileResponse(image_jobs.result_path(job.id),
+                        media_type="image/png")
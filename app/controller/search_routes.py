@@ -0,0 +1,28 @@
+from fastapi import APIRouter, Depends, HTTPException, status
+from app.auth.jwt_auth import get_current_user
+from app.config.constants import RETRIEVAL_CONFIG
+from app.models.schemas import BatchSearchIn, BatchSearchOut
+from app.utils.retriever import search_books_batch, unique_titles
+
+
+router = APIRouter()
+
+
+@router.post("/search/batch", response_model=BatchSearchOut)
+def batch_search(data: BatchSearchIn,
+                 current_user=Depends(get_current_user)):
+    if len(data.queries) > RETRIEVAL_CONFIG.max_batch_queries:
+        raise HTTPException(
+            status_code=status.HTTP_422_UNPROCESSABLE_ENTITY,
+            detail=(f"At most {RETRIEVAL_CONFIG.max_batch_queries} "
+                    "queries per request")
+        )
+    queries = [query.strip() for query in data.queries]
+    if not all(queries):
+        raise HTTPException(
+            status_code=status.HTTP_422_UNPROCESSABLE_ENTITY,
+            detail="Queries must not be empty"
+        )
+    matches = search_books_batch(queries, data.k)
+    return {"results": [{"query": query, "titles": unique_titles(docs)}
+                        for query, docs in zip(queries, matches)]}
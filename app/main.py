@@ -1,9 +1,32 @@
+import asyncio
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi.staticfiles import StaticFiles
+from app.auth.auth_cache import auth_cache
 from app.controller.chatbot_routes import router as chatbot_router
+from app.controller.chatbot_routes import tts_cache
 from app.controller.auth_routes import router as auth_router
-from app.services.db_connection import init_db
+from app.controller.health_routes import router as health_router
+from app.controller.image_routes import router as image_router
+from app.controller.search_routes import router as search_router
+from app.services.db_connection import init_db, close_async_engine
+from app.services.chat_service import build_components
+from app.services.image_jobs import image_jobs
+from app.services.openai_client import get_async_client, close_async_client
+from app.services.readiness import readiness
+from app.config.constants import MODEL_CONFIG, PROMPT_CONFIG
+from app.config.constants import METRICS_CONFIG, SEMANTIC_CACHE_CONFIG
+from app.config.constants import STT_CONFIG
+from app.utils.catalog import catalog
+from app.utils.helpers import bots
+from app.utils.lexical import lexical_index
+from app.utils.memory import get_tokenizer
+from app.utils.metrics import MetricsMiddleware, registry
+from app.utils.retriever import get_backend, get_embedding_function
+from app.utils.semantic_cache import get_semantic_cache
+from app.utils.single_flight import flight_stats
+from app.utils.speculation import speculation_stats
+from app.utils.upload_limit import FORM_OVERHEAD, UploadLimitMiddleware
 
 
 app = FastAPI(title="Smart Librarian")
@@ -14,13 +37,69 @@ app.add_middleware(
     allow_methods=["*"],
     allow_headers=["*"],
 )
+app.add_middleware(UploadLimitMiddleware,
+                   path=r"/conversations/\d+/stt",
+                   max_bytes=STT_CONFIG.max_upload_bytes + FORM_OVERHEAD,
+                   detail="Audio upload too large")
+if METRICS_CONFIG.enabled:
+    app.add_middleware(MetricsMiddleware,
+                       server_timing=METRICS_CONFIG.server_timing)
 
 
+app.include_router(health_router)
 app.include_router(auth_router)
 app.include_router(chatbot_router)
+app.include_router(search_router)
+app.include_router(image_router)
 app.mount("/", StaticFiles(directory="app/view", html=True), name="view")
 
 
+def _embedding_cache_stats() -> dict:
+    stats = getattr(get_embedding_function(), "stats", None)
+    return stats() if stats else {}
+
+
+def _semantic_cache_stats() -> dict:
+    return (get_semantic_cache().stats() if SEMANTIC_CACHE_CONFIG.enabled
+            else {})
+
+
+for name, stats in (("agent_cache", bots.stats),
+                    ("auth_cache", auth_cache.stats),
+                    ("embedding_cache", _embedding_cache_stats),
+                    ("semantic_cache", _semantic_cache_stats),
+                    ("tts_cache", tts_cache.stats),
+                    ("image_jobs", image_jobs.stats),
+                    ("speculation", speculation_stats.stats),
+                    ("single_flight", flight_stats),
+                    ("readiness", readiness.status)):
+    registry.source(name, stats)
+
+
+WARMUP_STEPS = [
+    ("openai_client", get_async_client),
+    ("agent", lambda: build_components(MODEL_CONFIG, PROMPT_CONFIG)),
+    ("tokenizer", lambda: get_tokenizer(MODEL_CONFIG.model)),
+    ("catalog", catalog.refresh),
+    ("lexical_index", lexical_index.refresh),
+    ("vector_backend", get_backend),
+]
+
+
 @app.on_event("startup")
-def on_startup():
+async def on_startup():
     init_db()
+    await image_jobs.resume()
+    # Heavy clients are built off the event loop so the server accepts
+    # connections (and answers /healthz) straight away; /readyz flips once
+    # everything is warm.
+    app.state.warmup = asyncio.create_task(
+        asyncio.to_thread(readiness.run, WARMUP_STEPS))
+
+
+@app.on_event("shutdown")
+async def on_shutdown():
+    readiness.stop()
+    await image_jobs.shutdown()
+    await close_async_client()
+    await close_async_engine()
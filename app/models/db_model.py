@@ -40,6 +40,8 @@ class Conversation(Base):
     messages = relationship("Message",
                             back_populates="conversation",
                             cascade="all, delete-orphan")
+    image_jobs = relationship("ImageJobOwner",
+                              cascade="all, delete-orphan")
 
     __table_args__ = (
         Index("ix_conversations_user_updated", "user_id", "updated_at"),
@@ -68,3 +70,36 @@ class Message(Base):
               "conversation_id",
               "created_at"),
     )
+
+
+class ImageJob(Base):
+    __tablename__ = "image_jobs"
+
+    id = Column(String(64), primary_key=True)
+    status = Column(String(16), nullable=False, default="queued")
+    prompt = Column(Text, nullable=False)
+    error = Column(Text)
+    created_at = Column(DateTime(timezone=True),
+                        server_default=func.now())
+    updated_at = Column(DateTime(timezone=True),
+                        server_default=func.now(),
+                        onupdate=func.now())
+
+    __table_args__ = (
+        Index("ix_image_jobs_status_updated", "status", "updated_at"),
+    )
+
+
+class ImageJobOwner(Base):
+    # Jobs are shared by every conversation that asked for the same
+    # prompt; only the users of those conversations may read them.
+    __tablename__ = "image_job_owners"
+
+    job_id = Column(String(64),
+                    ForeignKey("image_jobs.id", ondelete="CASCADE"),
+                    primary_key=True)
+    conversation_id = Column(Integer,
+                             ForeignKey("conversations.id",
+                                        ondelete="CASCADE"),
+                             primary_key=True,
+                             index=True)
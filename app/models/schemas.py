@@ -32,3 +32,25 @@ class MessageOut(BaseModel):
 class ConversationWithMessages(BaseModel):
     conversation: ConversationOut
     messages: List[MessageOut]
+    has_more: bool = False
+
+
+class BatchSearchIn(BaseModel):
+    queries: List[str] = Field(min_length=1)
+    k: int = Field(default=5, ge=1, le=50)
+
+
+class BatchSearchResult(BaseModel):
+    query: str
+    titles: List[str]
+
+
+class BatchSearchOut(BaseModel):
+    results: List[BatchSearchResult]
+
+
+class ImageJobOut(BaseModel):
+    id: str
+    status: str
+    error: str | None = None
+    result_url: str | None = None
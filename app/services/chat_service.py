@@ -1,59 +1,348 @@
-from langchain.agents import create_openai_tools_agent, AgentExecutor
-from langchain.memory import ConversationBufferMemory
+import time
+import asyncio
+import logging
+import threading
+from typing import TYPE_CHECKING, AsyncIterator
+from langchain_core.callbacks import BaseCallbackHandler
 from app.config.classes import ModelConfig, PromptConfig
+from app.config.constants import CLIENT_CONFIG, SEMANTIC_CACHE_CONFIG
 from app.services.openai_client import build_prompt, build_llm
-from app.utils.tools import get_summary_by_title, search_relevant_books
+from app.utils.metrics import LLM_CALLS, LLM_TOKENS, TOOL_CALLS, record
+from app.utils.memory import (WindowedTokenMemory,
+                              count_tokens,
+                              summarize_exchanges)
+from app.utils.semantic_cache import SemanticCache, get_semantic_cache
+from app.utils.speculation import (Speculation,
+                                   current_speculation,
+                                   is_topic_request,
+                                   speculation_stats)
+from app.utils.tools import (TOOL_ERROR,
+                             get_summary_by_title,
+                             search_relevant_books,
+                             search_relevant_books_batch)
 from app.utils.validators import language_filter
 
+if TYPE_CHECKING:
+    from langchain.agents import AgentExecutor
+    from langchain_openai import ChatOpenAI
 
-def create_agent(
-    model: ModelConfig,
-    prompt: PromptConfig
-):
-    try:
-        prompt_template = build_prompt(prompt)
-        llm = build_llm(model)
-        tools = [get_summary_by_title, search_relevant_books]
-
-        agent = create_openai_tools_agent(
-            llm=llm,
-            tools=tools,
-            prompt=prompt_template
-        )
-
-        memory = ConversationBufferMemory(
-            memory_key="chat_history",
-            return_messages=True
-        )
-
-        executor = AgentExecutor(
-            agent=agent,
-            tools=tools,
-            memory=memory
-        )
-
-        def chat_with_agent(query: str) -> str:
+
+logger = logging.getLogger(__name__)
+
+RESPECT_NOTICE = ("Please use a respectful language. "
+                  "After you calm down, "
+                  "we may resume our conversation.")
+# What AgentExecutor returns instead of an answer when it hits its
+# iteration or time limit.
+STOPPED_PREFIX = "Agent stopped due to"
+
+
+def _completed(response: dict) -> bool:
+    if response["output"].strip().startswith(STOPPED_PREFIX):
+        return False
+    return not any(str(observation).startswith(TOOL_ERROR)
+                   for _, observation in response.get("intermediate_steps",
+                                                      ()))
+
+
+def _tool_progress(event: dict) -> dict:
+    name = event["name"]
+    if event["event"] == "on_tool_start":
+        return {"event": "tool_start",
+                "data": {"tool": name, "input": event["data"].get("input")}}
+
+    output = event["data"].get("output")
+    output = str(getattr(output, "content", output) or "")
+    if name in (search_relevant_books.name,
+                search_relevant_books_batch.name):
+        titles = [t for t in output.splitlines()
+                  if t.strip() and not t.startswith("# ")]
+        return {"event": "tool_end",
+                "data": {"tool": name, "titles": titles}}
+    return {"event": "tool_end",
+            "data": {"tool": name, "found": not output.startswith(
+                "There is no book entitled")}}
+
+
+class AgentMetrics(BaseCallbackHandler):
+    # One shared handler: runs are told apart by their run_id.
+    def __init__(self):
+        self._started: dict = {}
+
+    def _start(self, run_id, name: str):
+        self._started[run_id] = (name, time.perf_counter())
+
+    def _end(self, run_id) -> tuple[str, float] | None:
+        name, started = self._started.pop(run_id, (None, None))
+        if started is None:
+            return None
+        return name, time.perf_counter() - started
+
+    def on_chat_model_start(self, serialized, messages, *, run_id,
+                            metadata=None, **kwargs):
+        self._start(run_id, (metadata or {}).get("ls_model_name", "unknown"))
+
+    def on_llm_end(self, response, *, run_id, **kwargs):
+        ended = self._end(run_id)
+        if ended is None:
+            return
+        model, seconds = ended
+        record("llm", seconds)
+        LLM_CALLS.inc(model=model, status="ok")
+        message = getattr(response.generations[0][0], "message", None)
+        usage = getattr(message, "usage_metadata", None) or {}
+        for kind in ("input_tokens", "output_tokens"):
+            if usage.get(kind):
+                LLM_TOKENS.inc(usage[kind], model=model,
+                               kind=kind.removesuffix("_tokens"))
+
+    def on_llm_error(self, error, *, run_id, **kwargs):
+        ended = self._end(run_id)
+        if ended is not None:
+            record("llm", ended[1])
+            LLM_CALLS.inc(model=ended[0], status="error")
+
+    def on_tool_start(self, serialized, input_str, *, run_id, **kwargs):
+        self._start(run_id, (serialized or {}).get("name", "unknown"))
+
+    def _tool_end(self, run_id, status: str):
+        ended = self._end(run_id)
+        if ended is not None:
+            record(f"tool_{ended[0]}", ended[1])
+            TOOL_CALLS.inc(tool=ended[0], status=status)
+
+    def on_tool_end(self, output, *, run_id, **kwargs):
+        self._tool_end(run_id, "ok")
+
+    def on_tool_error(self, error, *, run_id, **kwargs):
+        self._tool_end(run_id, "error")
+
+
+agent_metrics = AgentMetrics()
+AGENT_RUN = {"callbacks": [agent_metrics]}
+
+
+class Chatbot:
+    def __init__(self, executor: "AgentExecutor | None" = None,
+                 memory: WindowedTokenMemory | None = None,
+                 system_tokens: int = 0,
+                 answer_cache: SemanticCache | None = None,
+                 error: Exception | None = None,
+                 speculate: bool = False):
+        self.executor = executor
+        self.memory = memory
+        self.system_tokens = system_tokens
+        self.answer_cache = answer_cache
+        self.error = error
+        self.speculate = speculate
+        self.last_prompt_tokens: int | None = None
+
+    def size_in_bytes(self) -> int:
+        return self.memory.size_in_bytes() if self.memory else 0
+
+    def _inputs(self, query: str) -> dict:
+        history = self.memory.load()
+        self.last_prompt_tokens = (self.system_tokens
+                                   + self.memory.history_tokens
+                                   + count_tokens(query, self.memory.model))
+        logger.info("chat turn prompt_tokens=%d history_tokens=%d "
+                    "history_messages=%d",
+                    self.last_prompt_tokens,
+                    self.memory.history_tokens,
+                    len(history))
+        return {"input": query, "chat_history": history}
+
+    def _restore(self, history: list[tuple[str, str]] | None):
+        if history is not None:
+            self.memory.restore(history)
+
+    def _remember(self, query: str, output: str):
+        self.memory.save(query, output)
+
+    def _cached_answer(self, query: str):
+        # Only first turns are answered from the cache: later turns depend
+        # on the conversation so far.
+        if not self.answer_cache or self.memory.exchanges:
+            return None, None
+        try:
+            return self.answer_cache.lookup(query)
+        except Exception as cacheError:
+            logger.warning("semantic cache lookup failed: %s", cacheError)
+            return None, None
+
+    def _cache_answer(self, vector, output: str, response: dict):
+        # Early stops and replies to a failed tool call are not repeated
+        # to every similar question.
+        if vector is not None and output and _completed(response):
+            self.answer_cache.put(vector, output)
+
+    def _start_speculation(self, query: str) -> Speculation | None:
+        # Topic requests always start with the mandated search, so it is
+        # run alongside the first LLM call; the tools use the result only
+        # when the agent asks for exactly one of the prefetched queries.
+        speculation = None
+        if self.speculate and is_topic_request(query):
+            speculation = Speculation(query)
+        elif self.speculate:
+            speculation_stats.skip()
+        current_speculation.set(speculation)
+        return speculation
+
+    def _end_speculation(self, speculation: Speculation | None):
+        current_speculation.set(None)
+        if speculation:
+            speculation.finish()
+
+    def _check(self, query: str) -> str | None:
+        if self.error:
+            return f"Error appeared at factory level: {self.error}."
+        if not query or not query.strip():
+            raise ValueError("Providing an empty input is not supported.")
+        if language_filter(query):
+            return RESPECT_NOTICE
+        return None
+
+    def __call__(self, query: str,
+                 history: list[tuple[str, str]] | None = None) -> str:
+        try:
+            notice = self._check(query)
+            if notice:
+                return notice
+            self._restore(history)
+
+            user_input = query.strip()
+            cached, vector = self._cached_answer(user_input)
+            if cached:
+                self._remember(user_input, cached)
+                return cached
+
+            speculation = self._start_speculation(user_input)
             try:
-                if not query or not query.strip():
-                    raise ValueError(
-                        "Providing an empty input is not supported.")
+                response = self.executor.invoke(self._inputs(user_input),
+                                                config=AGENT_RUN)
+            finally:
+                self._end_speculation(speculation)
+            output = response["output"].strip()
+            self._remember(user_input, output)
+            self._cache_answer(vector, output, response)
+            return output
+
+        except Exception as chatError:
+            return f"Error appeared at conversation level: {chatError}."
+
+    async def astream(self, query: str,
+                      history: list[tuple[str, str]] | None = None
+                      ) -> AsyncIterator[dict]:
+        started = time.perf_counter()
+        ttft_ms = None
+        output = ""
+        response = {}
+        cached = None
+        try:
+            notice = self._check(query)
+            user_input = query.strip()
+            if not notice:
+                self._restore(history)
+                cached, vector = await asyncio.to_thread(self._cached_answer,
+                                                         user_input)
+            if notice or cached:
+                output = notice or cached
+                ttft_ms = (time.perf_counter() - started) * 1000
+                yield {"event": "token", "data": output}
+                if cached:
+                    await asyncio.to_thread(self._remember, user_input,
+                                            cached)
+            else:
+                speculation = self._start_speculation(user_input)
+                try:
+                    async for event in self.executor.astream_events(
+                            self._inputs(user_input), config=AGENT_RUN,
+                            version="v2"):
+                        kind = event["event"]
+                        if kind == "on_chat_model_stream":
+                            text = event["data"]["chunk"].content
+                            if not text:
+                                continue
+                            if ttft_ms is None:
+                                ttft_ms = ((time.perf_counter() - started)
+                                           * 1000)
+                            yield {"event": "token", "data": text}
+                        elif kind in ("on_tool_start", "on_tool_end"):
+                            yield _tool_progress(event)
+                        elif (kind == "on_chain_end"
+                              and not event.get("parent_ids")):
+                            response = event["data"]["output"]
+                            output = response["output"].strip()
+                finally:
+                    self._end_speculation(speculation)
+                # An overflowing window is summarized by the LLM; that
+                # round trip must not hold up the other streams.
+                await asyncio.to_thread(self._remember, user_input, output)
+                self._cache_answer(vector, output, response)
+
+        except Exception as chatError:
+            output = f"Error appeared at conversation level: {chatError}."
+            yield {"event": "error", "data": output}
+
+        total_ms = (time.perf_counter() - started) * 1000
+        logger.info("chat stream ttft_ms=%s total_ms=%.1f",
+                    f"{ttft_ms:.1f}" if ttft_ms is not None else None,
+                    total_ms)
+        yield {"event": "done",
+               "data": {"content": output,
+                        "cached": bool(cached),
+                        "prompt_tokens": self.last_prompt_tokens,
+                        "ttft_ms": ttft_ms,
+                        "total_ms": total_ms}}
 
-                if language_filter(query):
-                    return ("Please use a respectful language. "
-                            "After you calm down, "
-                            "we may resume our conversation.")
 
-                user_input = query.strip()
+_components: dict[tuple[str, str],
+                  tuple["ChatOpenAI", "AgentExecutor", int]] = {}
+_components_lock = threading.Lock()
 
-                response = executor.invoke({"input": user_input})
-                return response["output"].strip()
 
-            except Exception as chatError:
-                return f"Error appeared at conversation level: {chatError}."
+def build_components(model: ModelConfig,
+                     prompt: PromptConfig
+                     ) -> tuple["ChatOpenAI", "AgentExecutor", int]:
+    # The LLM, prompt and tool-calling agent hold no conversation state, so
+    # one set per configuration is shared by every conversation.
+    key = (model.model_dump_json(), prompt.model_dump_json())
+    with _components_lock:
+        if key not in _components:
+            from langchain.agents import (AgentExecutor,
+                                          create_openai_tools_agent)
 
-        return chat_with_agent
+            llm = build_llm(model, CLIENT_CONFIG)
+            tools = [get_summary_by_title,
+                     search_relevant_books,
+                     search_relevant_books_batch]
+            agent = create_openai_tools_agent(
+                llm=llm,
+                tools=tools,
+                prompt=build_prompt(prompt)
+            )
+            _components[key] = (
+                llm,
+                AgentExecutor(agent=agent, tools=tools,
+                              return_intermediate_steps=True),
+                count_tokens(prompt.instructions, model.model),
+            )
+        return _components[key]
+
+
+def create_agent(
+    model: ModelConfig,
+    prompt: PromptConfig
+) -> Chatbot:
+    try:
+        llm, executor, system_tokens = build_components(model, prompt)
+        memory = WindowedTokenMemory(prompt,
+                                     model.model,
+                                     summarize_exchanges(llm))
+        answer_cache = (get_semantic_cache() if SEMANTIC_CACHE_CONFIG.enabled
+                        else None)
+        return Chatbot(executor, memory, system_tokens, answer_cache,
+                       speculate=prompt.speculative_prefetch)
 
     except Exception as factoryError:
-        def dead_chatbot(_: str, err=factoryError):
-            return f"Error appeared at factory level: {err}."
-        return dead_chatbot
+        return Chatbot(error=factoryError)
@@ -1,11 +1,129 @@
-from sqlalchemy import create_engine
+import time
+import threading
+from typing import TYPE_CHECKING
+from sqlalchemy import create_engine, event
+from sqlalchemy.engine import URL, Engine, make_url
 from sqlalchemy.orm import sessionmaker
 from app.models.db_model import Base
-from app.config.constants import DATABASE_URL
+from app.config.classes import DatabaseConfig
+from app.config.constants import DATABASE_CONFIG
+from app.utils.metrics import record
 
-engine = create_engine(DATABASE_URL, connect_args={"check_same_thread": False})
+if TYPE_CHECKING:
+    from sqlalchemy.ext.asyncio import AsyncEngine, AsyncSession
+
+ASYNC_DRIVERS = {
+    "sqlite": "sqlite+aiosqlite",
+    "postgresql": "postgresql+asyncpg",
+    "mysql": "mysql+aiomysql",
+}
+
+
+def _sqlite_pragmas(config: DatabaseConfig):
+    def on_connect(dbapi_connection, connection_record):
+        # WAL lets readers run alongside the single writer, and with
+        # synchronous=NORMAL a commit no longer waits on an fsync; only
+        # checkpoints do. busy_timeout makes a second writer wait for the
+        # lock instead of failing with "database is locked".
+        cursor = dbapi_connection.cursor()
+        cursor.execute(f"PRAGMA journal_mode={config.sqlite_journal_mode}")
+        cursor.execute(f"PRAGMA synchronous={config.sqlite_synchronous}")
+        cursor.execute(
+            f"PRAGMA busy_timeout={config.sqlite_busy_timeout_ms}")
+        cursor.execute(
+            f"PRAGMA cache_size=-{config.sqlite_cache_size_kib}")
+        cursor.execute(f"PRAGMA mmap_size={config.sqlite_mmap_size}")
+        cursor.execute("PRAGMA temp_store=MEMORY")
+        cursor.close()
+    return on_connect
+
+
+def _time_queries(engine: Engine):
+    # The start time lives on the statement's execution context, so a
+    # statement that raises leaves nothing behind on the pooled connection.
+    def before(conn, cursor, statement, parameters, context, executemany):
+        if context is not None:
+            context._query_started = time.perf_counter()
+
+    def after(conn, cursor, statement, parameters, context, executemany):
+        started = getattr(context, "_query_started", None)
+        if started is not None:
+            record("db_query", time.perf_counter() - started)
+
+    event.listen(engine, "before_cursor_execute", before)
+    event.listen(engine, "after_cursor_execute", after)
+
+
+def _engine_options(url: URL, config: DatabaseConfig) -> dict:
+    if url.get_backend_name() == "sqlite":
+        return {"connect_args": {"check_same_thread": False}}
+    return {"pool_size": config.pool_size,
+            "max_overflow": config.max_overflow,
+            "pool_pre_ping": True}
+
+
+def build_engine(config: DatabaseConfig) -> Engine:
+    url = make_url(config.url)
+    engine = create_engine(url, **_engine_options(url, config))
+    if url.get_backend_name() == "sqlite":
+        event.listen(engine, "connect", _sqlite_pragmas(config))
+    _time_queries(engine)
+    return engine
+
+
+def async_url(url: str) -> URL:
+    url = make_url(url)
+    driver = ASYNC_DRIVERS.get(url.get_backend_name())
+    if driver is None or url.drivername == driver:
+        return url
+    return url.set(drivername=driver)
+
+
+def build_async_engine(config: DatabaseConfig) -> "AsyncEngine":
+    from sqlalchemy.ext.asyncio import create_async_engine
+
+    url = async_url(config.url)
+    options = _engine_options(url, config)
+    options.pop("connect_args", None)
+    engine = create_async_engine(url, **options)
+    if url.get_backend_name() == "sqlite":
+        event.listen(engine.sync_engine, "connect", _sqlite_pragmas(config))
+    _time_queries(engine.sync_engine)
+    return engine
+
+
+engine = build_engine(DATABASE_CONFIG)
 SessionLocal = sessionmaker(bind=engine, autocommit=False, autoflush=False)
 
+_async_sessions = None
+_async_engine: "AsyncEngine | None" = None
+_async_engine_lock = threading.Lock()
+
+
+def get_async_sessionmaker():
+    global _async_engine, _async_sessions
+    with _async_engine_lock:
+        if _async_sessions is None:
+            from sqlalchemy.ext.asyncio import async_sessionmaker
+
+            _async_engine = build_async_engine(DATABASE_CONFIG)
+            _async_sessions = async_sessionmaker(bind=_async_engine,
+                                                autoflush=False,
+                                                expire_on_commit=False)
+        return _async_sessions
+
+
+def async_session() -> "AsyncSession":
+    return get_async_sessionmaker()()
+
+
+async def close_async_engine():
+    global _async_engine, _async_sessions
+    with _async_engine_lock:
+        closing, _async_engine, _async_sessions = _async_engine, None, None
+    if closing is not None:
+        await closing.dispose()
+
 
 def init_db():
     Base.metadata.create_all(bind=engine)
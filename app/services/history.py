@@ -0,0 +1,36 @@
+from sqlalchemy import select
+from app.models import db_model as m
+
+
+def history_statement(conversation_id: int, span: int):
+    # The newest 2 * span rows come straight off ix_messages_conv_created,
+    # so a turn reads the same amount however long the conversation is.
+    return (
+        select(m.Message.role, m.Message.content)
+        .where(m.Message.conversation_id == conversation_id)
+        .order_by(m.Message.created_at.desc(), m.Message.id.desc())
+        .limit(2 * span)
+    )
+
+
+def to_exchanges(rows) -> list[tuple[str, str]]:
+    exchanges, human = [], None
+    for role, content in reversed(rows):
+        if role == "user":
+            human = content
+        elif role == "assistant" and human is not None:
+            exchanges.append((human, content))
+            human = None
+    return exchanges
+
+
+def load_history(db, conversation_id: int,
+                 span: int) -> list[tuple[str, str]]:
+    return to_exchanges(
+        db.execute(history_statement(conversation_id, span)).all())
+
+
+async def load_history_async(db, conversation_id: int,
+                             span: int) -> list[tuple[str, str]]:
+    result = await db.execute(history_statement(conversation_id, span))
+    return to_exchanges(result.all())
@@ -0,0 +1,221 @@
+import os
+import base64
+import asyncio
+import hashlib
+import logging
+import tempfile
+from datetime import datetime, timezone
+from pathlib import Path
+from sqlalchemy import update
+from sqlalchemy.exc import IntegrityError
+from app.config.classes import ImageJobConfig
+from app.config.constants import (CLIENT_CONFIG,
+                                  IMAGE_JOB_CONFIG,
+                                  IMAGE_STORE_PATH)
+from app.models.db_model import Conversation, ImageJob, ImageJobOwner
+from app.services.db_connection import SessionLocal
+from app.services.openai_client import get_async_client
+from app.utils.metrics import timed
+
+
+logger = logging.getLogger(__name__)
+
+FINISHED = ("done", "failed")
+
+
+def job_key(prompt: str, config: ImageJobConfig) -> str:
+    return hashlib.sha256(
+        f"{config.model}\0{config.size}\0{prompt}".encode()).hexdigest()
+
+
+class ImageJobs:
+    def __init__(self, path: Path, config: ImageJobConfig):
+        self.path = Path(path)
+        self.config = config
+        self._semaphore: asyncio.Semaphore | None = None
+        self._tasks: dict[str, asyncio.Task] = {}
+        self.submitted = 0
+        self.deduplicated = 0
+        self.completed = 0
+        self.failed = 0
+
+    def result_path(self, job_id: str) -> Path:
+        return self.path / f"{job_id}.png"
+
+    def _stale(self, job: ImageJob) -> bool:
+        updated = job.updated_at or job.created_at
+        if updated is None:
+            return False
+        if updated.tzinfo is None:
+            updated = updated.replace(tzinfo=timezone.utc)
+        age = (datetime.now(timezone.utc) - updated).total_seconds()
+        return age > self.config.stale_after_seconds
+
+    def _needs_run(self, job: ImageJob) -> bool:
+        if job.status == "failed":
+            return True
+        if job.status == "done":
+            return not self.result_path(job.id).exists()
+        # Queued or running, but nobody has touched it for a long time:
+        # the process that owned it is gone.
+        return job.id not in self._tasks and self._stale(job)
+
+    def _link(self, db, job_id: str, conversation_id: int):
+        if db.get(ImageJobOwner, (job_id, conversation_id)) is not None:
+            return
+        db.add(ImageJobOwner(job_id=job_id, conversation_id=conversation_id))
+        try:
+            db.commit()
+        except IntegrityError:
+            # The same conversation asked twice at once.
+            db.rollback()
+
+    def submit(self, db, prompt: str,
+               conversation_id: int) -> tuple[ImageJob, bool]:
+        key = job_key(prompt, self.config)
+        job = db.get(ImageJob, key)
+        if job is None:
+            db.add(ImageJob(id=key, status="queued", prompt=prompt))
+            db.add(ImageJobOwner(job_id=key,
+                                 conversation_id=conversation_id))
+            try:
+                db.commit()
+                self.submitted += 1
+                return db.get(ImageJob, key), True
+            except IntegrityError:
+                # Another request inserted the same prompt first.
+                db.rollback()
+                job = db.get(ImageJob, key)
+        self._link(db, key, conversation_id)
+        if self._needs_run(job):
+            job.status, job.error = "queued", None
+            db.commit()
+            self.submitted += 1
+            return job, True
+        self.deduplicated += 1
+        return job, False
+
+    def schedule(self, job_id: str):
+        if job_id in self._tasks:
+            return
+        task = asyncio.get_running_loop().create_task(self._run(job_id))
+        self._tasks[job_id] = task
+        task.add_done_callback(lambda _: self._tasks.pop(job_id, None))
+
+    def _claim(self, job_id: str) -> str | None:
+        # Only one worker (in any process) moves a job out of "queued".
+        with SessionLocal() as db:
+            claimed = db.execute(
+                update(ImageJob)
+                .where(ImageJob.id == job_id, ImageJob.status == "queued")
+                .values(status="running")
+            ).rowcount
+            db.commit()
+            return db.get(ImageJob, job_id).prompt if claimed else None
+
+    def _finish(self, job_id: str, status: str, error: str | None = None):
+        with SessionLocal() as db:
+            db.execute(update(ImageJob)
+                       .where(ImageJob.id == job_id)
+                       .values(status=status, error=error))
+            db.commit()
+
+    def _store(self, job_id: str, image: bytes):
+        self.path.mkdir(parents=True, exist_ok=True)
+        handle, name = tempfile.mkstemp(dir=self.path, prefix=".part-")
+        with os.fdopen(handle, "wb") as f:
+            f.write(image)
+        os.replace(name, self.result_path(job_id))
+
+    async def _run(self, job_id: str):
+        if self._semaphore is None:
+            self._semaphore = asyncio.Semaphore(self.config.max_concurrency)
+        async with self._semaphore:
+            prompt = await asyncio.to_thread(self._claim, job_id)
+            if prompt is None:
+                return
+            try:
+                with timed("image"):
+                    img = await get_async_client().images.generate(
+                        model=self.config.model,
+                        prompt=prompt,
+                        size=self.config.size,
+                        timeout=CLIENT_CONFIG.image_timeout
+                    )
+                image = base64.b64decode(img.data[0].b64_json)
+                await asyncio.to_thread(self._store, job_id, image)
+                await asyncio.to_thread(self._finish, job_id, "done")
+                self.completed += 1
+            except asyncio.CancelledError:
+                await asyncio.to_thread(self._finish, job_id, "queued")
+                raise
+            except Exception as imageError:
+                logger.warning("image job %s failed: %s", job_id, imageError)
+                await asyncio.to_thread(self._finish, job_id, "failed",
+                                        str(imageError))
+                self.failed += 1
+
+    def get(self, job_id: str) -> ImageJob | None:
+        with SessionLocal() as db:
+            return db.get(ImageJob, job_id)
+
+    def owned(self, job_id: str, user_id: int) -> ImageJob | None:
+        with SessionLocal() as db:
+            return (
+                db.query(ImageJob)
+                .join(ImageJobOwner, ImageJobOwner.job_id == ImageJob.id)
+                .join(Conversation,
+                      Conversation.id == ImageJobOwner.conversation_id)
+                .filter(ImageJob.id == job_id,
+                        Conversation.user_id == user_id)
+                .first()
+            )
+
+    async def wait(self, job_id: str, timeout: float) -> ImageJob | None:
+        loop = asyncio.get_running_loop()
+        deadline = loop.time() + timeout
+        while True:
+            task = self._tasks.get(job_id)
+            remaining = deadline - loop.time()
+            if task and remaining > 0:
+                await asyncio.wait({task}, timeout=remaining)
+            job = await asyncio.to_thread(self.get, job_id)
+            if (job is None or job.status in FINISHED
+                    or loop.time() >= deadline):
+                return job
+            # Run by another worker: poll the shared database.
+            await asyncio.sleep(0.5)
+
+    def _pending(self) -> list[str]:
+        with SessionLocal() as db:
+            jobs = (db.query(ImageJob)
+                    .filter(ImageJob.status.in_(("queued", "running")))
+                    .all())
+            pending = []
+            for job in jobs:
+                if job.status == "running" and not self._stale(job):
+                    continue
+                job.status = "queued"
+                pending.append(job.id)
+            db.commit()
+            return pending
+
+    async def resume(self):
+        for job_id in await asyncio.to_thread(self._pending):
+            self.schedule(job_id)
+
+    async def shutdown(self):
+        tasks = list(self._tasks.values())
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+
+    def stats(self) -> dict:
+        return {"in_flight": len(self._tasks),
+                "submitted": self.submitted,
+                "deduplicated": self.deduplicated,
+                "completed": self.completed,
+                "failed": self.failed}
+
+
+image_jobs = ImageJobs(IMAGE_STORE_PATH, IMAGE_JOB_CONFIG)
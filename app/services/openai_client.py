@@ -1,6 +1,12 @@
+import threading
+from typing import TYPE_CHECKING
 from langchain_core.prompts import ChatPromptTemplate, MessagesPlaceholder
-from langchain_openai import ChatOpenAI
-from app.config.classes import PromptConfig, ModelConfig
+from app.config.classes import PromptConfig, ModelConfig, ClientConfig
+from app.config.constants import MODEL_CONFIG, CLIENT_CONFIG
+
+if TYPE_CHECKING:
+    from openai import AsyncOpenAI
+    from langchain_openai import ChatOpenAI
 
 
 def build_prompt(prompt_config: PromptConfig) -> ChatPromptTemplate:
@@ -14,7 +20,32 @@ def build_prompt(prompt_config: PromptConfig) -> ChatPromptTemplate:
     )
 
 
-def build_llm(model_config: ModelConfig) -> ChatOpenAI:
+def build_async_client(model_config: ModelConfig,
+                       client_config: ClientConfig) -> "AsyncOpenAI":
+    import httpx
+    from openai import AsyncOpenAI
+
+    http_client = httpx.AsyncClient(
+        limits=httpx.Limits(
+            max_connections=client_config.max_connections,
+            max_keepalive_connections=client_config.max_keepalive_connections,
+            keepalive_expiry=client_config.keepalive_expiry,
+        ),
+        timeout=httpx.Timeout(60.0, connect=client_config.connect_timeout),
+    )
+    api_key = model_config.api_key
+    return AsyncOpenAI(
+        api_key=api_key.get_secret_value() if api_key else None,
+        base_url=client_config.base_url,
+        max_retries=client_config.max_retries,
+        http_client=http_client,
+    )
+
+
+def build_llm(model_config: ModelConfig,
+              client_config: ClientConfig | None = None) -> "ChatOpenAI":
+    from langchain_openai import ChatOpenAI
+
     return ChatOpenAI(
         model=model_config.model,
         temperature=model_config.temperature,
@@ -23,6 +54,28 @@ def build_llm(model_config: ModelConfig) -> ChatOpenAI:
         presence_penalty=model_config.presence_penalty,
         frequency_penalty=model_config.frequency_penalty,
         api_key=model_config.api_key,
+        base_url=client_config.base_url if client_config else None,
         timeout=60.0,  # Set a timeout to avoid long waits
+        stream_usage=True,  # Token usage for streamed calls too
         max_retries=2  # Retry up to max_retries times in case of errors
     )
+
+
+_async_client: "AsyncOpenAI | None" = None
+_async_client_lock = threading.Lock()
+
+
+def get_async_client() -> "AsyncOpenAI":
+    global _async_client
+    with _async_client_lock:
+        if _async_client is None:
+            _async_client = build_async_client(MODEL_CONFIG, CLIENT_CONFIG)
+        return _async_client
+
+
+async def close_async_client():
+    global _async_client
+    with _async_client_lock:
+        client, _async_client = _async_client, None
+    if client is not None:
+        await client.close()
@@ -0,0 +1,67 @@
+import time
+import logging
+import threading
+from typing import Callable
+from app.config.classes import ReadinessConfig
+from app.config.constants import READINESS_CONFIG
+
+
+logger = logging.getLogger(__name__)
+
+
+class Readiness:
+    def __init__(self, config: ReadinessConfig):
+        self.config = config
+        self._lock = threading.Lock()
+        self._stopped = threading.Event()
+        self.started_at = time.monotonic()
+        self.ready = False
+        self.error: str | None = None
+        self.retries = 0
+        self.steps: dict[str, float] = {}
+
+    def _attempt(self, name: str, step: Callable[[], object]) -> bool:
+        started = time.perf_counter()
+        try:
+            step()
+        except Exception as warmupError:
+            logger.exception("warm-up step %s failed", name)
+            with self._lock:
+                self.error = f"{name}: {warmupError}"
+            return False
+        with self._lock:
+            self.error = None
+            self.steps[name] = round(
+                (time.perf_counter() - started) * 1000, 1)
+        return True
+
+    def run(self, steps: list[tuple[str, Callable[[], object]]]):
+        # A failed step (often a transient OpenAI or Chroma error) is
+        # retried with capped exponential backoff until it succeeds or the
+        # app shuts down, so the pod never stays unready for good.
+        for name, step in steps:
+            delay = self.config.retry_initial_seconds
+            while not self._attempt(name, step):
+                if self._stopped.wait(delay):
+                    return
+                with self._lock:
+                    self.retries += 1
+                delay = min(delay * 2, self.config.retry_max_seconds)
+        with self._lock:
+            self.ready = True
+        logger.info("warm-up finished in %.1f ms",
+                    (time.monotonic() - self.started_at) * 1000)
+
+    def stop(self):
+        self._stopped.set()
+
+    def status(self) -> dict:
+        with self._lock:
+            return {"ready": self.ready,
+                    "error": self.error,
+                    "retries": self.retries,
+                    "uptime_s": round(time.monotonic() - self.started_at, 1),
+                    "steps_ms": dict(self.steps)}
+
+
+readiness = Readiness(READINESS_CONFIG)
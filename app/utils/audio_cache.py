@@ -0,0 +1,107 @@
+import os
+import hashlib
+import tempfile
+import threading
+from pathlib import Path
+
+
+class AudioCache:
+    def __init__(self, path: Path, max_bytes: int):
+        self.path = Path(path)
+        self.max_bytes = max_bytes
+        self._lock = threading.Lock()
+        self._bytes: int | None = None
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    @staticmethod
+    def key(model: str, voice: str, text: str) -> str:
+        return hashlib.sha256(f"{model}\0{voice}\0{text}".encode()
+                              ).hexdigest()
+
+    def _file(self, key: str) -> Path:
+        return self.path / key[:2] / f"{key}.mp3"
+
+    def get(self, *keys: str) -> Path | None:
+        for key in keys:
+            file = self._file(key)
+            try:
+                # The mtime doubles as the last-used time for LRU eviction.
+                os.utime(file)
+            except FileNotFoundError:
+                continue
+            with self._lock:
+                self.hits += 1
+            return file
+        with self._lock:
+            self.misses += 1
+        return None
+
+    def writer(self, key: str) -> "AudioWriter":
+        return AudioWriter(self, key)
+
+    def _entries(self) -> list[tuple[float, int, Path]]:
+        entries = []
+        for file in self.path.glob("*/*.mp3"):
+            try:
+                stat = file.stat()
+            except FileNotFoundError:
+                continue
+            entries.append((stat.st_mtime, stat.st_size, file))
+        return entries
+
+    def _added(self, size: int):
+        with self._lock:
+            if self._bytes is None:
+                self._bytes = sum(size for _, size, _ in self._entries())
+            else:
+                self._bytes += size
+            if self._bytes <= self.max_bytes:
+                return
+            # Over budget: rescan (other workers share the directory) and
+            # drop least recently played files down to 90% of the limit.
+            entries = sorted(self._entries())
+            total = sum(size for _, size, _ in entries)
+            for _, size, file in entries:
+                if total <= self.max_bytes * 0.9:
+                    break
+                file.unlink(missing_ok=True)
+                total -= size
+                self.evictions += 1
+            self._bytes = total
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {"bytes": self._bytes,
+                    "hits": self.hits,
+                    "misses": self.misses,
+                    "evictions": self.evictions}
+
+
+class AudioWriter:
+    def __init__(self, cache: AudioCache, key: str):
+        self.cache = cache
+        self.target = cache._file(key)
+        self.target.parent.mkdir(parents=True, exist_ok=True)
+        handle, name = tempfile.mkstemp(dir=self.target.parent,
+                                        prefix=".part-")
+        self._file = os.fdopen(handle, "wb")
+        self._name = name
+        self.size = 0
+
+    def write(self, chunk: bytes):
+        self._file.write(chunk)
+        self.size += len(chunk)
+
+    def commit(self):
+        self._file.close()
+        if not self.size:
+            self.discard()
+            return
+        os.replace(self._name, self.target)
+        self.cache._added(self.size)
+
+    def discard(self):
+        self._file.close()
+        Path(self._name).unlink(missing_ok=True)
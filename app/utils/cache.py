@@ -0,0 +1,98 @@
+import time
+import threading
+from collections import OrderedDict
+from typing import Any, Callable, Hashable
+
+
+class BoundedCache:
+    def __init__(self,
+                 max_entries: int,
+                 ttl_seconds: float | None = None,
+                 max_bytes: int | None = None,
+                 sizeof: Callable[[Any], int] | None = None):
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self.max_bytes = max_bytes
+        self.sizeof = sizeof or (lambda _: 0)
+        self._lock = threading.RLock()
+        self._items: OrderedDict[Hashable, tuple[Any, float, int]] = (
+            OrderedDict())
+        self._bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = {"capacity": 0, "bytes": 0, "ttl": 0}
+
+    def _expired(self, stored_at: float, now: float) -> bool:
+        return (self.ttl_seconds is not None
+                and now - stored_at > self.ttl_seconds)
+
+    def _drop(self, key: Hashable, reason: str | None = None):
+        _, _, size = self._items.pop(key)
+        self._bytes -= size
+        if reason:
+            self.evictions[reason] += 1
+
+    def _evict(self, now: float):
+        for key, (_, stored_at, _) in list(self._items.items()):
+            if not self._expired(stored_at, now):
+                break
+            self._drop(key, "ttl")
+        while len(self._items) > self.max_entries:
+            self._drop(next(iter(self._items)), "capacity")
+        while (self.max_bytes is not None
+               and self._bytes > self.max_bytes
+               and len(self._items) > 1):
+            self._drop(next(iter(self._items)), "bytes")
+
+    def get(self, key: Hashable, default: Any = None) -> Any:
+        with self._lock:
+            entry = self._items.get(key)
+            if entry is None:
+                self.misses += 1
+                return default
+            now = time.monotonic()
+            if self._expired(entry[1], now):
+                self._drop(key, "ttl")
+                self.misses += 1
+                return default
+            # The TTL is an idle timeout, so access order and timestamp
+            # order stay identical and the TTL sweep can stop early.
+            self._items[key] = (entry[0], now, entry[2])
+            self._items.move_to_end(key)
+            self.hits += 1
+            return entry[0]
+
+    def set(self, key: Hashable, value: Any):
+        now = time.monotonic()
+        size = self.sizeof(value)
+        with self._lock:
+            if key in self._items:
+                self._drop(key)
+            self._items[key] = (value, now, size)
+            self._bytes += size
+            self._evict(now)
+
+    def pop(self, key: Hashable, default: Any = None) -> Any:
+        with self._lock:
+            if key not in self._items:
+                return default
+            value = self._items[key][0]
+            self._drop(key)
+            return value
+
+    def __contains__(self, key: Hashable) -> bool:
+        with self._lock:
+            entry = self._items.get(key)
+            return (entry is not None
+                    and not self._expired(entry[1], time.monotonic()))
+
+    def __len__(self) -> int:
+        return len(self._items)
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {"entries": len(self._items),
+                    "bytes": self._bytes,
+                    "hits": self.hits,
+                    "misses": self.misses,
+                    "evictions": dict(self.evictions)}
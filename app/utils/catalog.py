@@ -0,0 +1,139 @@
+import re
+import threading
+from collections import defaultdict
+from collections.abc import Mapping
+from pathlib import Path
+from app.utils.catalog_store import catalog_path, load_books
+
+
+_NON_WORD = re.compile(r"[^\w\s]")
+
+
+def normalize_title(title: str) -> str:
+    return " ".join(_NON_WORD.sub(" ", title.casefold()).split())
+
+
+def trigrams(text: str) -> set[str]:
+    padded = f"  {text} "
+    return {padded[i:i + 3] for i in range(len(padded) - 2)}
+
+
+def edit_distance(a: str, b: str, limit: int) -> int:
+    # Levenshtein distance restricted to a diagonal band of width `limit`;
+    # anything beyond the band is reported as `limit + 1`.
+    if abs(len(a) - len(b)) > limit:
+        return limit + 1
+    over = limit + 1
+    previous = [j if j <= limit else over for j in range(len(b) + 1)]
+    for i, ca in enumerate(a, 1):
+        lo, hi = max(1, i - limit), min(len(b), i + limit)
+        current = [over] * (len(b) + 1)
+        current[0] = i if i <= limit else over
+        for j in range(lo, hi + 1):
+            current[j] = min(previous[j] + 1,
+                             current[j - 1] + 1,
+                             previous[j - 1] + (ca != b[j - 1]))
+        if min(current[lo - 1:hi + 1]) > limit:
+            return over
+        previous = current
+    return min(previous[-1], over)
+
+
+class CatalogIndex:
+    def __init__(self,
+                 path: Path | None = None,
+                 min_overlap: float = 0.5,
+                 max_distance_ratio: float = 0.25,
+                 max_candidates: int = 25):
+        self.path = Path(path or catalog_path())
+        self.min_overlap = min_overlap
+        self.max_distance_ratio = max_distance_ratio
+        self.max_candidates = max_candidates
+        self._lock = threading.Lock()
+        self._mtime: int | None = None
+        self._books: dict[str, Mapping] = {}
+        self._grams: dict[str, set[str]] = {}
+        self._postings: dict[str, list[str]] = {}
+
+    def _load(self):
+        books = load_books(self.path)
+
+        by_key: dict[str, Mapping] = {}
+        grams: dict[str, set[str]] = {}
+        postings: dict[str, list[str]] = defaultdict(list)
+        for book in books:
+            key = normalize_title(book["title"])
+            if not key or key in by_key:
+                continue
+            by_key[key] = book
+            grams[key] = trigrams(key)
+            for gram in grams[key]:
+                postings[gram].append(key)
+
+        self._books = by_key
+        self._grams = grams
+        self._postings = dict(postings)
+
+    def refresh(self):
+        mtime = self.path.stat().st_mtime_ns
+        if mtime == self._mtime:
+            return
+        with self._lock:
+            if mtime != self._mtime:
+                self._load()
+                self._mtime = mtime
+
+    def __len__(self) -> int:
+        self.refresh()
+        return len(self._books)
+
+    def get(self, title: str) -> Mapping | None:
+        self.refresh()
+        return self._books.get(normalize_title(title))
+
+    def closest(self, title: str) -> Mapping | None:
+        self.refresh()
+        key = normalize_title(title)
+        if not key:
+            return None
+
+        query_grams = trigrams(key)
+        required = max(1, int(len(query_grams) * self.min_overlap + 0.5))
+        # Prefix filtering: a candidate sharing `required` trigrams must
+        # appear in at least one of the rarest (n - required + 1) postings.
+        rarest = sorted(query_grams,
+                        key=lambda g: len(self._postings.get(g, ())))
+        candidates = set()
+        for gram in rarest[:len(rarest) - required + 1]:
+            candidates.update(self._postings.get(gram, ()))
+
+        scored = []
+        for candidate in candidates:
+            if abs(len(candidate) - len(key)) > (
+                    max(len(key), len(candidate)) * self.max_distance_ratio):
+                continue
+            shared = len(query_grams & self._grams[candidate])
+            if shared >= required:
+                scored.append((shared, candidate))
+        scored.sort(reverse=True)
+
+        best, best_distance = None, None
+        for _, candidate in scored[:self.max_candidates]:
+            limit = int(max(len(key), len(candidate))
+                        * self.max_distance_ratio)
+            distance = edit_distance(key, candidate, limit)
+            if distance <= limit and (best_distance is None
+                                      or distance < best_distance):
+                best, best_distance = candidate, distance
+                if distance <= 1:
+                    break
+        return self._books[best] if best else None
+
+    def lookup(self, title: str) -> tuple[Mapping | None, bool]:
+        book = self.get(title)
+        if book:
+            return book, True
+        return self.closest(title), False
+
+
+catalog = CatalogIndex()
@@ -0,0 +1,188 @@
+"""Convert the book catalog into the compact on-disk store.
+
+    python -m app.utils.catalog_store [--source data/book_summaries.json]
+                                      [--output data/catalog.bin]
+
+The source (a JSON array or JSONL, one book per line) is read as a
+stream. The store holds every full summary back to back, then an index
+with each book's title, short summary and the offset/length of its full
+summary, then a fixed footer. Readers keep only the index in memory and
+read full summaries on demand from a memory map, so every worker on a
+host shares those pages. Once the store exists the app uses it instead
+of the JSON file (restart to switch).
+"""
+import os
+import json
+import mmap
+import time
+import struct
+import argparse
+import tempfile
+import threading
+from collections.abc import Iterable, Iterator, Mapping
+from pathlib import Path
+from app.config.constants import CATALOG_STORE_PATH, DATA_PATH
+
+
+MAGIC = b"SLCAT01\n"
+FOOTER = struct.Struct("<QQ")
+FIELDS = ("title", "summary", "full_summary")
+
+
+def catalog_path() -> Path:
+    return CATALOG_STORE_PATH if CATALOG_STORE_PATH.exists() else DATA_PATH
+
+
+class Book(Mapping):
+    # Reads like the dicts of the JSON catalog, but the full summary stays
+    # on disk until someone asks for it.
+    __slots__ = ("_store", "title", "summary", "_offset", "_length")
+
+    def __init__(self, store: "CatalogStore", title: str, summary: str,
+                 offset: int, length: int):
+        self._store = store
+        self.title = title
+        self.summary = summary
+        self._offset = offset
+        self._length = length
+
+    def __getitem__(self, key: str):
+        if key == "title":
+            return self.title
+        if key == "summary":
+            return self.summary
+        if key == "full_summary":
+            return self._store.read(self._offset, self._length)
+        raise KeyError(key)
+
+    def __iter__(self):
+        return iter(FIELDS)
+
+    def __len__(self) -> int:
+        return len(FIELDS)
+
+    def __repr__(self) -> str:
+        return f"Book({self.title!r})"
+
+
+class CatalogStore:
+    def __init__(self, path: Path):
+        self.path = Path(path)
+        with open(self.path, "rb") as f:
+            self._map = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        tail = len(self._map) - FOOTER.size - len(MAGIC)
+        if (tail < len(MAGIC) or self._map[:len(MAGIC)] != MAGIC
+                or self._map[tail + FOOTER.size:] != MAGIC):
+            raise ValueError(f"{self.path} is not a catalog store")
+        start, count = FOOTER.unpack(self._map[tail:tail + FOOTER.size])
+        self.books = [Book(self, *json.loads(line))
+                      for line in self._map[start:tail].splitlines()]
+        if len(self.books) != count:
+            raise ValueError(f"{self.path}: index holds {len(self.books)} "
+                             f"books, footer says {count}")
+
+    def read(self, offset: int, length: int) -> str:
+        return self._map[offset:offset + length].decode("utf-8")
+
+
+_stores: dict[Path, tuple[int, CatalogStore]] = {}
+_stores_lock = threading.Lock()
+
+
+def open_store(path: Path) -> CatalogStore:
+    # The title index and the lexical index load the same version once.
+    path = Path(path)
+    mtime = path.stat().st_mtime_ns
+    with _stores_lock:
+        cached = _stores.get(path)
+        if cached is None or cached[0] != mtime:
+            cached = _stores[path] = (mtime, CatalogStore(path))
+        return cached[1]
+
+
+def _json_array(f, chunk_size: int = 1 << 16) -> Iterator[dict]:
+    decoder = json.JSONDecoder()
+    buffer = f.read(chunk_size).lstrip()
+    if not buffer.startswith("["):
+        raise ValueError("expected a JSON array of books")
+    buffer, eof = buffer[1:], False
+    while True:
+        buffer = buffer.lstrip().removeprefix(",").lstrip()
+        if buffer.startswith("]"):
+            return
+        try:
+            book, end = decoder.raw_decode(buffer)
+        except json.JSONDecodeError:
+            if eof:
+                raise
+            more = f.read(chunk_size)
+            eof = not more
+            buffer += more
+            continue
+        yield book
+        buffer = buffer[end:]
+
+
+def iter_books(path: Path) -> Iterator[Mapping]:
+    path = Path(path)
+    if path.suffix == ".bin":
+        yield from open_store(path).books
+        return
+    with open(path, "r", encoding="utf-8") as f:
+        if path.suffix == ".jsonl":
+            yield from (json.loads(line) for line in f if line.strip())
+        else:
+            yield from _json_array(f)
+
+
+def load_books(path: Path = DATA_PATH) -> list[Mapping]:
+    path = Path(path)
+    if path.suffix == ".bin":
+        return open_store(path).books
+    return list(iter_books(path))
+
+
+def write_store(books: Iterable[Mapping], path: Path) -> int:
+    path = Path(path)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    handle, name = tempfile.mkstemp(dir=path.parent, prefix=".catalog-")
+    index = []
+    try:
+        with os.fdopen(handle, "wb") as f:
+            f.write(MAGIC)
+            offset = len(MAGIC)
+            for book in books:
+                full = (book.get("full_summary") or "").encode("utf-8")
+                f.write(full)
+                index.append(json.dumps([book["title"], book["summary"],
+                                         offset, len(full)],
+                                        ensure_ascii=False).encode("utf-8"))
+                offset += len(full)
+            for line in index:
+                f.write(line + b"\n")
+            f.write(FOOTER.pack(offset, len(index)) + MAGIC)
+        # Replaced in one step: readers map either the old or the new file.
+        os.replace(name, path)
+    except BaseException:
+        Path(name).unlink(missing_ok=True)
+        raise
+    return len(index)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--source", type=Path, default=DATA_PATH)
+    parser.add_argument("--output", type=Path, default=CATALOG_STORE_PATH)
+    args = parser.parse_args()
+
+    started = time.perf_counter()
+    count = write_store(iter_books(args.source), args.output)
+    print(json.dumps({"books": count,
+                      "source_bytes": args.source.stat().st_size,
+                      "store_bytes": args.output.stat().st_size,
+                      "seconds": round(time.perf_counter() - started, 3)},
+                     indent=2))
+
+
+if __name__ == "__main__":
+    main()
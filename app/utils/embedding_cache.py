@@ -0,0 +1,158 @@
+import time
+import asyncio
+import sqlite3
+import hashlib
+import threading
+import numpy as np
+from pathlib import Path
+from langchain_core.embeddings import Embeddings
+from app.utils.cache import BoundedCache
+from app.utils.metrics import timed
+from app.utils.single_flight import single_flight
+
+
+embedding_flights = single_flight("embeddings")
+
+
+def normalize_text(text: str) -> str:
+    return " ".join(text.split())
+
+
+class EmbeddingStore:
+    def __init__(self, path: Path, max_entries: int,
+                 touch_interval: float = 3600.0):
+        self.max_entries = max_entries
+        self.touch_interval = touch_interval
+        self._lock = threading.Lock()
+        path.parent.mkdir(parents=True, exist_ok=True)
+        self._conn = sqlite3.connect(str(path), check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS embeddings ("
+            " key TEXT PRIMARY KEY,"
+            " vector BLOB NOT NULL,"
+            " last_used REAL NOT NULL)")
+        self._conn.execute(
+            "CREATE INDEX IF NOT EXISTS ix_embeddings_last_used"
+            " ON embeddings (last_used)")
+        self._conn.commit()
+
+    def get_many(self, keys: list[str]) -> dict[str, list[float]]:
+        found = {}
+        now = time.time()
+        stale = []
+        with self._lock:
+            for start in range(0, len(keys), 500):
+                chunk = keys[start:start + 500]
+                rows = self._conn.execute(
+                    "SELECT key, vector, last_used FROM embeddings"
+                    f" WHERE key IN ({','.join('?' * len(chunk))})",
+                    chunk).fetchall()
+                for key, blob, last_used in rows:
+                    found[key] = np.frombuffer(blob,
+                                               dtype=np.float32).tolist()
+                    if now - last_used >= self.touch_interval:
+                        stale.append(key)
+            # Eviction only needs a coarse recency, so a hit writes (and
+            # commits) only when its timestamp is older than the interval.
+            if stale:
+                self._conn.executemany(
+                    "UPDATE embeddings SET last_used = ? WHERE key = ?",
+                    [(now, key) for key in stale])
+                self._conn.commit()
+        return found
+
+    def put_many(self, items: dict[str, list[float]]):
+        now = time.time()
+        with self._lock:
+            self._conn.executemany(
+                "INSERT OR REPLACE INTO embeddings (key, vector, last_used)"
+                " VALUES (?, ?, ?)",
+                [(key, np.asarray(vector, dtype=np.float32).tobytes(), now)
+                 for key, vector in items.items()])
+            count = self._conn.execute(
+                "SELECT COUNT(*) FROM embeddings").fetchone()[0]
+            if count > self.max_entries:
+                # Trim to 90% so eviction is amortised over many inserts.
+                excess = count - int(self.max_entries * 0.9)
+                self._conn.execute(
+                    "DELETE FROM embeddings WHERE key IN ("
+                    " SELECT key FROM embeddings"
+                    " ORDER BY last_used LIMIT ?)", (excess,))
+            self._conn.commit()
+
+
+class CachedEmbeddings(Embeddings):
+    def __init__(self,
+                 embeddings: Embeddings,
+                 model: str,
+                 store: EmbeddingStore,
+                 memory_entries: int = 1024):
+        self.embeddings = embeddings
+        self.model = model
+        self.store = store
+        self.memory = BoundedCache(max_entries=memory_entries)
+        self.upstream_calls = 0
+
+    def key(self, text: str) -> str:
+        return hashlib.sha256(
+            f"{self.model}\0{normalize_text(text)}".encode()).hexdigest()
+
+    def embed_documents(self, texts: list[str]) -> list[list[float]]:
+        keys = [self.key(text) for text in texts]
+        vectors: dict[str, list[float]] = {}
+        for key in keys:
+            vector = self.memory.get(key)
+            if vector is not None:
+                vectors[key] = vector
+
+        pending = [key for key in dict.fromkeys(keys) if key not in vectors]
+        if pending:
+            vectors.update(self.store.get_many(pending))
+
+        missing: dict[str, str] = {}
+        for key, text in zip(keys, texts):
+            if key not in vectors:
+                missing.setdefault(key, text)
+        if missing:
+            self.upstream_calls += 1
+            with timed("embeddings"):
+                fresh = self.embeddings.embed_documents(
+                    list(missing.values()))
+            fresh = dict(zip(missing, fresh))
+            self.store.put_many(fresh)
+            vectors.update(fresh)
+
+        for key in pending:
+            self.memory.set(key, vectors[key])
+        return [vectors[key] for key in keys]
+
+    def _load_query(self, key: str, text: str) -> list[float]:
+        vector = self.store.get_many([key]).get(key)
+        if vector is None:
+            self.upstream_calls += 1
+            with timed("embeddings"):
+                vector = self.embeddings.embed_query(text)
+            self.store.put_many({key: vector})
+        return vector
+
+    def embed_query(self, text: str) -> list[float]:
+        key = self.key(text)
+        vector = self.memory.get(key)
+        if vector is not None:
+            return vector
+        # A burst of identical queries waits for one lookup/upstream call.
+        vector = embedding_flights.do(key, self._load_query, key, text)
+        self.memory.set(key, vector)
+        return vector
+
+    async def aembed_documents(self, texts: list[str]) -> list[list[float]]:
+        return await asyncio.to_thread(self.embed_documents, texts)
+
+    async def aembed_query(self, text: str) -> list[float]:
+        return await asyncio.to_thread(self.embed_query, text)
+
+    def stats(self) -> dict:
+        return {"memory": self.memory.stats(),
+                "upstream_calls": self.upstream_calls}
@@ -1,14 +1,29 @@
-from typing import Callable
+from app.config.constants import AGENT_CACHE_CONFIG
 from app.services.db_connection import SessionLocal
+from app.services.openai_client import get_async_client
+from app.utils.cache import BoundedCache
+from app.utils.metrics import timed
 
 
 def get_db():
-    db = SessionLocal()
-    try:
-        yield db
-    finally:
-        db.close()
+    # Covers the whole time the request holds the session, including a
+    # streamed response that saves its turn at the end.
+    with timed("db_session"):
+        db = SessionLocal()
+        try:
+            yield db
+        finally:
+            db.close()
 
 
-bots: dict[int, Callable] = {}
+def get_openai():
+    return get_async_client()
+
+
+bots = BoundedCache(
+    max_entries=AGENT_CACHE_CONFIG.max_entries,
+    ttl_seconds=AGENT_CACHE_CONFIG.ttl_seconds,
+    max_bytes=AGENT_CACHE_CONFIG.max_bytes,
+    sizeof=lambda bot: bot.size_in_bytes(),
+)
 
@@ -0,0 +1,180 @@
+"""Sync the Chroma store with the book catalog.
+
+    python -m app.utils.ingest [--batch-size 64] [--concurrency 4]
+
+Only added or changed books are embedded; removed titles are deleted.
+Every stored document carries the hash of the content it was embedded
+from, so each committed batch doubles as a checkpoint: an interrupted run
+simply resumes with whatever is still missing or stale.
+"""
+import sys
+import json
+import time
+import random
+import hashlib
+import logging
+import argparse
+import threading
+from pathlib import Path
+from concurrent.futures import ThreadPoolExecutor, as_completed
+import openai
+from langchain_core.embeddings import Embeddings
+from app.utils.catalog import normalize_title
+from app.utils.catalog_store import catalog_path, load_books
+
+
+logger = logging.getLogger(__name__)
+
+COLLECTION_NAME = "langchain"
+RETRYABLE_ERRORS = (openai.RateLimitError,
+                    openai.APIConnectionError,
+                    openai.APITimeoutError,
+                    openai.InternalServerError)
+
+
+# Raised once every batch has been tried. The batches that succeeded are
+# stored, so the next sync only embeds the rest.
+class IncompleteSync(RuntimeError):
+    def __init__(self, report: dict):
+        super().__init__(f"{report['failed']} of {report['to_embed']} "
+                         f"documents could not be embedded")
+        self.report = report
+
+
+def document_id(title: str) -> str:
+    return hashlib.sha256(normalize_title(title).encode()).hexdigest()[:32]
+
+
+def content_hash(book: dict) -> str:
+    return hashlib.sha256(
+        json.dumps([book["title"], book["summary"]]).encode()).hexdigest()
+
+
+def plan_sync(books: list[dict], collection):
+    existing = collection.get(include=["metadatas"])
+    stored = {doc_id: (meta or {}).get("content_hash")
+              for doc_id, meta in zip(existing["ids"],
+                                      existing["metadatas"])}
+    desired = {document_id(book["title"]): book for book in books}
+
+    upserts = [(doc_id, book, content_hash(book))
+               for doc_id, book in desired.items()
+               if stored.get(doc_id) != content_hash(book)]
+    deletes = [doc_id for doc_id in stored if doc_id not in desired]
+    return upserts, deletes, len(desired) - len(upserts)
+
+
+def _retry_after(error: Exception) -> float | None:
+    response = getattr(error, "response", None)
+    header = response.headers.get("retry-after") if response else None
+    try:
+        return float(header) if header else None
+    except ValueError:
+        return None
+
+
+def embed_with_retry(embeddings: Embeddings,
+                     texts: list[str],
+                     max_retries: int) -> list[list[float]]:
+    for attempt in range(max_retries + 1):
+        try:
+            return embeddings.embed_documents(texts)
+        except RETRYABLE_ERRORS as error:
+            if attempt == max_retries:
+                raise
+            delay = _retry_after(error) or (
+                min(30.0, 2.0 ** attempt) * random.uniform(0.5, 1.5))
+            logger.warning("embedding batch failed (%s); retrying in %.1fs",
+                           type(error).__name__, delay)
+            time.sleep(delay)
+
+
+def sync_catalog(books: list[dict],
+                 collection,
+                 embeddings: Embeddings,
+                 batch_size: int = 64,
+                 concurrency: int = 4,
+                 max_retries: int = 5,
+                 dry_run: bool = False) -> dict:
+    started = time.perf_counter()
+    upserts, deletes, unchanged = plan_sync(books, collection)
+    report = {"to_embed": len(upserts),
+              "to_delete": len(deletes),
+              "unchanged": unchanged}
+    if dry_run:
+        return report
+
+    if deletes:
+        collection.delete(ids=deletes)
+
+    write_lock = threading.Lock()
+
+    def run(batch) -> int:
+        vectors = embed_with_retry(embeddings,
+                                   [book["summary"] for _, book, _ in batch],
+                                   max_retries)
+        with write_lock:
+            collection.upsert(
+                ids=[doc_id for doc_id, _, _ in batch],
+                embeddings=vectors,
+                documents=[book["summary"] for _, book, _ in batch],
+                metadatas=[{"title": book["title"], "content_hash": digest}
+                           for _, book, digest in batch])
+        return len(batch)
+
+    batches = [upserts[i:i + batch_size]
+               for i in range(0, len(upserts), batch_size)]
+    embedded = failed = 0
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        futures = {pool.submit(run, batch): len(batch) for batch in batches}
+        for future in as_completed(futures):
+            try:
+                embedded += future.result()
+            except Exception as batchError:
+                failed += futures[future]
+                logger.error("embedding batch failed for good: %s",
+                             batchError)
+
+    elapsed = time.perf_counter() - started
+    report.update(embedded=embedded,
+                  deleted=len(deletes),
+                  failed=failed,
+                  seconds=round(elapsed, 3),
+                  docs_per_sec=round(embedded / elapsed, 1) if elapsed else 0)
+    if failed:
+        raise IncompleteSync(report)
+    return report
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--data", type=Path, default=catalog_path())
+    parser.add_argument("--batch-size", type=int, default=64)
+    parser.add_argument("--concurrency", type=int, default=4)
+    parser.add_argument("--max-retries", type=int, default=5)
+    parser.add_argument("--dry-run", action="store_true")
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.INFO)
+
+    import chromadb
+    from app.config.constants import CHROMA_PATH
+    from app.utils.retriever import get_embedding_function
+
+    collection = chromadb.PersistentClient(
+        path=str(CHROMA_PATH)).get_or_create_collection(COLLECTION_NAME)
+    try:
+        report = sync_catalog(load_books(args.data),
+                              collection,
+                              get_embedding_function(),
+                              batch_size=args.batch_size,
+                              concurrency=args.concurrency,
+                              max_retries=args.max_retries,
+                              dry_run=args.dry_run)
+    except IncompleteSync as syncError:
+        print(json.dumps(syncError.report, indent=2))
+        sys.exit(str(syncError))
+    print(json.dumps(report, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,119 @@
+import math
+import re
+import threading
+from collections import Counter, defaultdict
+from collections.abc import Mapping
+from pathlib import Path
+from app.utils.catalog import normalize_title
+from app.utils.catalog_store import catalog_path, load_books
+
+
+_WORD = re.compile(r"\w+")
+STOPWORDS = frozenset(
+    "a about an and are as at be by for from i in is it me my of on or "
+    "that the this to with".split())
+
+
+def tokenize(text: str) -> list[str]:
+    return [word for word in _WORD.findall(text.casefold())
+            if word not in STOPWORDS]
+
+
+class LexicalIndex:
+    def __init__(self,
+                 path: Path | None = None,
+                 k1: float = 1.2,
+                 b: float = 0.75,
+                 title_weight: float = 3.0):
+        self.path = Path(path or catalog_path())
+        self.k1 = k1
+        self.b = b
+        self.title_weight = title_weight
+        self._lock = threading.Lock()
+        self._mtime: int | None = None
+        self._books: list[Mapping] = []
+        self._postings: dict[str, list[tuple[int, float]]] = {}
+        self._idf: dict[str, float] = {}
+
+    def _load(self):
+        books = load_books(self.path)
+
+        postings: dict[str, list[tuple[int, float]]] = defaultdict(list)
+        lengths = []
+        for doc, book in enumerate(books):
+            # Titles, the short summaries and the full summaries are folded
+            # into one weighted bag of words (title terms count triple).
+            weights = Counter(tokenize(book["summary"]))
+            weights.update(tokenize(book.get("full_summary", "")))
+            for word in tokenize(book["title"]):
+                weights[word] += self.title_weight
+            lengths.append(sum(weights.values()))
+            for word, weight in weights.items():
+                postings[word].append((doc, weight))
+
+        average = sum(lengths) / len(lengths) if lengths else 1.0
+        self._postings = {
+            word: [(doc, weight * (self.k1 + 1) / (
+                weight + self.k1 * (1 - self.b
+                                    + self.b * lengths[doc] / average)))
+                   for doc, weight in entries]
+            for word, entries in postings.items()
+        }
+        self._idf = {word: math.log(1 + (len(books) - len(entries) + 0.5)
+                                    / (len(entries) + 0.5))
+                     for word, entries in postings.items()}
+        self._books = books
+
+    def refresh(self):
+        mtime = self.path.stat().st_mtime_ns
+        if mtime == self._mtime:
+            return
+        with self._lock:
+            if mtime != self._mtime:
+                self._load()
+                self._mtime = mtime
+
+    def search(self,
+               query: str,
+               matches: int = 5) -> list[tuple[Mapping, float]]:
+        self.refresh()
+        scores: dict[int, float] = defaultdict(float)
+        for word in set(tokenize(query)):
+            idf = self._idf.get(word)
+            if idf is None:
+                continue
+            for doc, weight in self._postings[word]:
+                scores[doc] += idf * weight
+        ranked = sorted(scores.items(), key=lambda item: item[1],
+                        reverse=True)[:matches]
+        return [(self._books[doc], score) for doc, score in ranked]
+
+    def covers(self, query: str, book: Mapping) -> bool:
+        words = set(tokenize(query))
+        if not words:
+            return False
+        present = set(tokenize(book["title"]))
+        present.update(tokenize(book["summary"]))
+        present.update(tokenize(book.get("full_summary", "")))
+        return words <= present
+
+    def is_strong(self,
+                  query: str,
+                  hits: list[tuple[Mapping, float]],
+                  margin: float) -> bool:
+        # A query that names a catalog title, or whose every term lands in
+        # one clearly dominant book, needs no semantic search.
+        if not hits:
+            return False
+        padded = f" {normalize_title(query)} "
+        top, score = hits[0]
+        if f" {normalize_title(top['title'])} " in padded:
+            return True
+        # A lone hit has no runner-up to dominate: a topic word that only
+        # one summary mentions says nothing about the other matches.
+        if len(hits) < 2:
+            return False
+        return score >= margin * hits[1][1] and self.covers(query, top)
+
+
+lexical_index = LexicalIndex()
@@ -0,0 +1,145 @@
+import logging
+import tiktoken
+from dataclasses import dataclass
+from functools import lru_cache
+from typing import Callable
+from langchain_core.messages import AIMessage, BaseMessage, HumanMessage
+from langchain_core.messages import SystemMessage
+from app.config.classes import PromptConfig
+
+
+logger = logging.getLogger(__name__)
+
+TRIM_MARKER = " [...]"
+
+
+@lru_cache(maxsize=8)
+def get_tokenizer(model: str):
+    try:
+        try:
+            return tiktoken.encoding_for_model(model)
+        except KeyError:
+            return tiktoken.get_encoding("o200k_base")
+    except Exception as tokenizerError:
+        logger.warning("tiktoken unavailable (%s); "
+                       "estimating tokens from text length", tokenizerError)
+        return None
+
+
+def count_tokens(text: str, model: str) -> int:
+    tokenizer = get_tokenizer(model)
+    if tokenizer is None:
+        return (len(text) + 3) // 4
+    return len(tokenizer.encode(text, disallowed_special=()))
+
+
+def truncate_tokens(text: str, limit: int, model: str) -> str:
+    tokenizer = get_tokenizer(model)
+    if tokenizer is None:
+        return text if len(text) <= limit * 4 else (
+            text[:limit * 4] + TRIM_MARKER)
+    tokens = tokenizer.encode(text, disallowed_special=())
+    if len(tokens) <= limit:
+        return text
+    return tokenizer.decode(tokens[:limit]) + TRIM_MARKER
+
+
+@dataclass
+class Exchange:
+    human: str
+    ai: str
+    tokens: int
+    trimmed_ai: str
+    trimmed_tokens: int
+
+
+class WindowedTokenMemory:
+    def __init__(self,
+                 config: PromptConfig,
+                 model: str,
+                 summarizer: Callable[[str, list[Exchange]], str]
+                 | None = None):
+        self.config = config
+        self.model = model
+        self.summarizer = summarizer if config.rolling_summary else None
+        self.exchanges: list[Exchange] = []
+        self.summary = ""
+        self.history_tokens = 0
+
+    def _exchange(self, human: str, ai: str) -> Exchange:
+        trimmed_ai = truncate_tokens(ai,
+                                     self.config.trimmed_reply_tokens,
+                                     self.model)
+        human_tokens = count_tokens(human, self.model)
+        return Exchange(human=human,
+                        ai=ai,
+                        tokens=human_tokens + count_tokens(ai, self.model),
+                        trimmed_ai=trimmed_ai,
+                        trimmed_tokens=(human_tokens
+                                        + count_tokens(trimmed_ai,
+                                                       self.model)))
+
+    def save(self, human: str, ai: str):
+        self.exchanges.append(self._exchange(human, ai))
+        overflow = self.exchanges[:-self.config.memory_span]
+        self.exchanges = self.exchanges[-self.config.memory_span:]
+        if overflow and self.summarizer:
+            try:
+                self.summary = truncate_tokens(
+                    self.summarizer(self.summary, overflow),
+                    self.config.summary_token_budget,
+                    self.model)
+            except Exception as summaryError:
+                logger.warning("rolling summary failed: %s", summaryError)
+
+    def restore(self, exchanges: list[tuple[str, str]]):
+        # The stored conversation is the source of truth; exchanges this
+        # process already measured are reused instead of re-tokenized.
+        known = {(e.human, e.ai): e for e in self.exchanges}
+        self.exchanges = [known.get(pair) or self._exchange(*pair)
+                          for pair in exchanges[-self.config.memory_span:]]
+
+    def load(self) -> list[BaseMessage]:
+        budget = self.config.history_token_budget
+        summary = []
+        if self.summary:
+            summary = [SystemMessage(
+                content=f"Summary of the earlier conversation: "
+                        f"{self.summary}")]
+            budget -= count_tokens(self.summary, self.model)
+
+        # Newest exchanges are kept verbatim; older assistant replies
+        # (mostly full book summaries) are cut down to their opening,
+        # which still carries the ranked title list.
+        kept: list[BaseMessage] = []
+        full_turns = self.config.full_reply_turns
+        for age, exchange in enumerate(reversed(self.exchanges)):
+            verbatim = age < full_turns
+            cost = exchange.tokens if verbatim else exchange.trimmed_tokens
+            if cost > budget:
+                break
+            budget -= cost
+            kept[:0] = [HumanMessage(content=exchange.human),
+                        AIMessage(content=exchange.ai if verbatim
+                                  else exchange.trimmed_ai)]
+        self.history_tokens = self.config.history_token_budget - budget
+        return summary + kept
+
+    def size_in_bytes(self) -> int:
+        return len(self.summary.encode()) + sum(
+            len(e.human.encode()) + len(e.ai.encode())
+            + len(e.trimmed_ai.encode())
+            for e in self.exchanges)
+
+
+def summarize_exchanges(llm) -> Callable[[str, list[Exchange]], str]:
+    def summarize(previous: str, exchanges: list[Exchange]) -> str:
+        transcript = "\n".join(f"User: {e.human}\nAssistant: {e.trimmed_ai}"
+                               for e in exchanges)
+        reply = llm.invoke(
+            "Fold these earlier chat turns into the running summary. Keep "
+            "book titles that were listed or recommended and the user's "
+            "stated preferences; be brief.\n\n"
+            f"Running summary: {previous or '(none)'}\n\n{transcript}")
+        return str(reply.content).strip()
+    return summarize
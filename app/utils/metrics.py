@@ -0,0 +1,248 @@
+import time
+import logging
+import threading
+from bisect import bisect_left
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Callable
+
+
+logger = logging.getLogger(__name__)
+
+PREFIX = "librarian_"
+LATENCY_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25,
+                   0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+
+# Phase totals of the request being served, for the Server-Timing header.
+# Threadpool endpoints and dependencies run in a copy of the request's
+# context, so they all add to the same dict.
+request_timings: ContextVar[dict[str, list] | None] = ContextVar(
+    "request_timings", default=None)
+_timings_lock = threading.Lock()
+
+
+def _escape(value: str) -> str:
+    return (value.replace("\\", "\\\\")
+            .replace("\n", "\\n")
+            .replace('"', '\\"'))
+
+
+def _labels(pairs) -> str:
+    if not pairs:
+        return ""
+    return "{" + ",".join(f'{name}="{_escape(str(value))}"'
+                          for name, value in pairs) + "}"
+
+
+def _number(value: float) -> str:
+    return repr(float(value)) if value != int(value) else str(int(value))
+
+
+class Counter:
+    kind = "counter"
+
+    def __init__(self, name: str, help: str, labelnames=()):
+        self.name = PREFIX + name
+        self.help = help
+        self.labelnames = tuple(labelnames)
+        self._lock = threading.Lock()
+        self._values: dict[tuple, float] = {}
+
+    def inc(self, amount: float = 1.0, **labels):
+        key = tuple(str(labels[name]) for name in self.labelnames)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0.0) + amount
+
+    def lines(self) -> list[str]:
+        with self._lock:
+            values = dict(self._values)
+        return [f"{self.name}_total"
+                f"{_labels(zip(self.labelnames, key))} {_number(value)}"
+                for key, value in sorted(values.items())]
+
+
+class Histogram:
+    kind = "histogram"
+
+    def __init__(self, name: str, help: str, labelnames=(),
+                 buckets=LATENCY_BUCKETS):
+        self.name = PREFIX + name
+        self.help = help
+        self.labelnames = tuple(labelnames)
+        self.buckets = tuple(buckets)
+        self._lock = threading.Lock()
+        self._values: dict[tuple, list] = {}
+
+    def observe(self, value: float, **labels):
+        key = tuple(str(labels[name]) for name in self.labelnames)
+        index = bisect_left(self.buckets, value)
+        with self._lock:
+            entry = self._values.setdefault(
+                key, [[0] * (len(self.buckets) + 1), 0.0])
+            entry[0][index] += 1
+            entry[1] += value
+
+    def lines(self) -> list[str]:
+        with self._lock:
+            values = {key: (list(counts), total)
+                      for key, (counts, total) in self._values.items()}
+        lines = []
+        for key, (counts, total) in sorted(values.items()):
+            pairs = list(zip(self.labelnames, key))
+            cumulative = 0
+            for bound, count in zip((*self.buckets, "+Inf"), counts):
+                cumulative += count
+                le = bound if bound == "+Inf" else _number(bound)
+                lines.append(f"{self.name}_bucket"
+                             f"{_labels([*pairs, ('le', le)])} {cumulative}")
+            lines.append(f"{self.name}_sum{_labels(pairs)} {total!r}")
+            lines.append(f"{self.name}_count{_labels(pairs)} {cumulative}")
+        return lines
+
+
+def _flatten(prefix: str, stats: dict) -> list[tuple[str, float]]:
+    samples = []
+    for key, value in stats.items():
+        name = f"{prefix}_{key}"
+        if isinstance(value, dict):
+            samples.extend(_flatten(name, value))
+        elif isinstance(value, (bool, int, float)):
+            samples.append((name, float(value)))
+    return samples
+
+
+class Registry:
+    def __init__(self):
+        self.metrics: list[Counter | Histogram] = []
+        self.sources: list[tuple[str, Callable[[], dict]]] = []
+
+    def counter(self, name: str, help: str, labelnames=()) -> Counter:
+        self.metrics.append(Counter(name, help, labelnames))
+        return self.metrics[-1]
+
+    def histogram(self, name: str, help: str, labelnames=(),
+                  buckets=LATENCY_BUCKETS) -> Histogram:
+        self.metrics.append(Histogram(name, help, labelnames, buckets))
+        return self.metrics[-1]
+
+    def source(self, name: str, stats: Callable[[], dict]):
+        # Existing `stats()` dicts are exposed as gauges, one per numeric
+        # leaf, e.g. auth_cache -> librarian_auth_cache_tokens_hits.
+        self.sources.append((name, stats))
+
+    def render(self) -> str:
+        lines = []
+        for metric in self.metrics:
+            lines.append(f"# HELP {metric.name} {metric.help}")
+            lines.append(f"# TYPE {metric.name} {metric.kind}")
+            lines.extend(metric.lines())
+        for name, stats in self.sources:
+            try:
+                samples = _flatten(PREFIX + name, stats())
+            except Exception as statsError:
+                logger.warning("metrics source %s failed: %s",
+                               name, statsError)
+                continue
+            for sample, value in samples:
+                lines.append(f"# TYPE {sample} gauge")
+                lines.append(f"{sample} {_number(value)}")
+        return "\n".join(lines) + "\n"
+
+
+registry = Registry()
+
+HTTP_REQUESTS = registry.counter(
+    "http_requests", "HTTP requests by route template and status.",
+    ("method", "route", "status"))
+HTTP_SECONDS = registry.histogram(
+    "http_request_duration_seconds",
+    "Time until the response body was sent.",
+    ("method", "route"))
+PHASE_SECONDS = registry.histogram(
+    "phase_duration_seconds",
+    "Time spent in one step of a request: auth, db_session, db_query, "
+    "search_books, vector_search, embeddings, llm, tool_<name>, stt, tts, "
+    "image.",
+    ("phase",))
+LLM_CALLS = registry.counter(
+    "llm_calls", "Chat model calls by model and outcome.",
+    ("model", "status"))
+LLM_TOKENS = registry.counter(
+    "llm_tokens", "Tokens reported by the chat model.",
+    ("model", "kind"))
+TOOL_CALLS = registry.counter(
+    "tool_calls", "Agent tool calls by tool and outcome.",
+    ("tool", "status"))
+
+
+def record(phase: str, seconds: float):
+    PHASE_SECONDS.observe(seconds, phase=phase)
+    timings = request_timings.get()
+    if timings is not None:
+        with _timings_lock:
+            entry = timings.setdefault(phase, [0.0, 0])
+            entry[0] += seconds
+            entry[1] += 1
+
+
+@contextmanager
+def timed(phase: str):
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        record(phase, time.perf_counter() - started)
+
+
+def server_timing(timings: dict[str, list], total: float) -> str:
+    with _timings_lock:
+        entries = [(phase, seconds, count)
+                   for phase, (seconds, count) in timings.items()]
+    parts = []
+    for phase, seconds, count in entries:
+        part = f"{phase};dur={seconds * 1000:.1f}"
+        if count > 1:
+            part += f';desc="{count}x"'
+        parts.append(part)
+    parts.append(f"app;dur={total * 1000:.1f}")
+    return ", ".join(parts)
+
+
+class MetricsMiddleware:
+    def __init__(self, app, server_timing: bool = False):
+        self.app = app
+        self.server_timing = server_timing
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        timings: dict[str, list] = {}
+        token = request_timings.set(timings)
+        started = time.perf_counter()
+        status = 500
+
+        async def send_with_timing(message):
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+                if self.server_timing:
+                    # Only phases finished before the headers go out: a
+                    # streamed reply reports its setup, not the LLM.
+                    value = server_timing(timings,
+                                          time.perf_counter() - started)
+                    message["headers"] = [
+                        *message.get("headers", []),
+                        (b"server-timing", value.encode("latin-1"))]
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_with_timing)
+        finally:
+            request_timings.reset(token)
+            route = getattr(scope.get("route"), "path", "other")
+            HTTP_REQUESTS.inc(method=scope["method"], route=route,
+                              status=status)
+            HTTP_SECONDS.observe(time.perf_counter() - started,
+                                 method=scope["method"], route=route)
@@ -1,36 +1,210 @@
-from langchain_chroma import Chroma
-from langchain.schema import Document
+import threading
 from typing import List
-import json
-from langchain_openai import OpenAIEmbeddings
-
-from app.config.constants import CHROMA_PATH, DATA_PATH, MODEL_CONFIG
-
-embedding_function = OpenAIEmbeddings(
-    model=MODEL_CONFIG.embedding_model
-)
-
-if CHROMA_PATH.exists() and any(CHROMA_PATH.iterdir()):
-    vectorstore = Chroma(
-        embedding_function=embedding_function,
-        persist_directory=str(CHROMA_PATH)
-    )
-else:
-    with open(DATA_PATH, "r", encoding="utf-8") as f:
-        books = json.load(f)
-
-    docs = [
-        Document(page_content=book["summary"],
-                 metadata={"title": book["title"]})
-        for book in books
-    ]
-
-    vectorstore = Chroma.from_documents(
-        documents=docs,
-        embedding=embedding_function,
-        persist_directory=str(CHROMA_PATH)
-    )
-
-
-def search_books(inquiry: str, matches: int = 5) -> List[Document]:
-    return vectorstore.similarity_search(inquiry, k=matches)
+from langchain_core.documents import Document
+from langchain_core.embeddings import Embeddings
+from app.utils.catalog import normalize_title
+from app.utils.catalog_store import catalog_path, load_books
+from app.utils.lexical import lexical_index
+from app.utils.metrics import timed
+from app.config.classes import RetrievalConfig
+from app.config.constants import (CHROMA_PATH,
+                                  CLIENT_CONFIG,
+                                  EMBEDDING_CACHE_CONFIG,
+                                  EMBEDDING_CACHE_PATH,
+                                  MODEL_CONFIG,
+                                  RETRIEVAL_CONFIG,
+                                  VECTOR_INDEX_PATH,
+                                  VECTOR_STORE_CONFIG)
+
+# Chroma, the OpenAI embeddings client and the store itself are only
+# touched on first use (or by the startup warm-up), so importing this
+# module stays cheap and a missing store never blocks application boot.
+_lock = threading.RLock()
+_embedding_function: Embeddings | None = None
+_client = None
+_collection = None
+_vectorstore = None
+_backend = None
+
+
+def get_embedding_function() -> Embeddings:
+    global _embedding_function
+    with _lock:
+        if _embedding_function is None:
+            from langchain_openai import OpenAIEmbeddings
+            from app.utils.embedding_cache import (CachedEmbeddings,
+                                                   EmbeddingStore)
+
+            embeddings = OpenAIEmbeddings(
+                model=MODEL_CONFIG.embedding_model,
+                base_url=CLIENT_CONFIG.base_url
+            )
+            if EMBEDDING_CACHE_CONFIG.enabled:
+                embeddings = CachedEmbeddings(
+                    embeddings,
+                    model=MODEL_CONFIG.embedding_model,
+                    store=EmbeddingStore(
+                        EMBEDDING_CACHE_PATH,
+                        EMBEDDING_CACHE_CONFIG.max_entries,
+                        EMBEDDING_CACHE_CONFIG.touch_interval_seconds),
+                    memory_entries=EMBEDDING_CACHE_CONFIG.memory_entries
+                )
+            _embedding_function = embeddings
+        return _embedding_function
+
+
+def get_collection():
+    global _client, _collection
+    with _lock:
+        if _collection is None:
+            import chromadb
+            from app.utils.ingest import COLLECTION_NAME, sync_catalog
+
+            _client = chromadb.PersistentClient(path=str(CHROMA_PATH))
+            collection = _client.get_or_create_collection(COLLECTION_NAME)
+            books = load_books(catalog_path())
+            # An empty store, or one a failed first sync left partial, is
+            # completed here; IncompleteSync propagates and nothing is
+            # cached, so the next call resumes it. Edits and removals are
+            # left to `python -m app.utils.ingest`.
+            if collection.count() < len(books):
+                sync_catalog(books, collection, get_embedding_function())
+            _collection = collection
+        return _collection
+
+
+def get_vectorstore():
+    global _vectorstore
+    with _lock:
+        if _vectorstore is None:
+            from langchain_chroma import Chroma
+            from app.utils.ingest import COLLECTION_NAME
+
+            get_collection()
+            _vectorstore = Chroma(
+                client=_client,
+                collection_name=COLLECTION_NAME,
+                embedding_function=get_embedding_function()
+            )
+        return _vectorstore
+
+
+def get_backend():
+    global _backend
+    with _lock:
+        if _backend is None:
+            from app.utils.vector_backends import (ChromaBackend,
+                                                   load_numpy_backend)
+
+            if VECTOR_STORE_CONFIG.backend == "numpy":
+                _backend = load_numpy_backend(VECTOR_INDEX_PATH,
+                                              load_books(catalog_path()),
+                                              get_embedding_function(),
+                                              MODEL_CONFIG.embedding_model,
+                                              VECTOR_STORE_CONFIG.dtype)
+            else:
+                _backend = ChromaBackend(get_vectorstore(), get_collection())
+        return _backend
+
+
+def reciprocal_rank_fusion(rankings: list[List[Document]],
+                           k: int = 60) -> List[Document]:
+    scores: dict[str, float] = {}
+    documents: dict[str, Document] = {}
+    for ranking in rankings:
+        for rank, doc in enumerate(ranking, 1):
+            key = normalize_title(doc.metadata.get("title", ""))
+            scores[key] = scores.get(key, 0.0) + 1.0 / (k + rank)
+            documents.setdefault(key, doc)
+    return [documents[key]
+            for key in sorted(scores, key=scores.get, reverse=True)]
+
+
+def _lexical_search(inquiry: str,
+                    config: RetrievalConfig
+                    ) -> tuple[List[Document], bool]:
+    hits = lexical_index.search(inquiry, config.candidates)
+    documents = [Document(page_content=book["summary"],
+                          metadata={"title": book["title"]})
+                 for book, _ in hits]
+    strong = config.fast_path and lexical_index.is_strong(
+        inquiry, hits, config.fast_path_margin)
+    return documents, strong
+
+
+def _pad(lexical: List[Document],
+         dense: List[Document],
+         matches: int) -> List[Document]:
+    # A strong lexical list keeps its order; dense results fill the rest
+    # of the ranking.
+    seen = {normalize_title(doc.metadata.get("title", "")) for doc in lexical}
+    extra = [doc for doc in dense
+             if normalize_title(doc.metadata.get("title", "")) not in seen]
+    return (lexical + extra)[:matches]
+
+
+def _fuse(lexical: List[Document],
+          strong: bool,
+          dense: List[Document],
+          matches: int,
+          config: RetrievalConfig) -> List[Document]:
+    if strong:
+        return _pad(lexical, dense, matches)
+    return reciprocal_rank_fusion([lexical, dense], config.rrf_k)[:matches]
+
+
+def _dense_search(inquiry: str, matches: int) -> List[Document]:
+    with timed("vector_search"):
+        return get_backend().search(inquiry, matches)
+
+
+def _dense_search_batch(inquiries: list[str],
+                        matches: int) -> List[List[Document]]:
+    with timed("vector_search"):
+        return get_backend().search_batch(inquiries, matches)
+
+
+@timed("search_books")
+def search_books(inquiry: str,
+                 matches: int = 5,
+                 config: RetrievalConfig = RETRIEVAL_CONFIG
+                 ) -> List[Document]:
+    if config.mode == "vector":
+        return _dense_search(inquiry, matches)
+
+    lexical, strong = _lexical_search(inquiry, config)
+    # The fast path only skips the embedding call when the lexical list
+    # fills the whole ranking on its own.
+    if strong and len(lexical) >= matches:
+        return lexical[:matches]
+    dense = _dense_search(inquiry, config.candidates)
+    return _fuse(lexical, strong, dense, matches, config)
+
+
+@timed("search_books")
+def search_books_batch(inquiries: list[str],
+                       matches: int = 5,
+                       config: RetrievalConfig = RETRIEVAL_CONFIG
+                       ) -> List[List[Document]]:
+    if config.mode == "vector":
+        return _dense_search_batch(inquiries, matches)
+
+    lexical = [_lexical_search(inquiry, config) for inquiry in inquiries]
+    pending = [i for i, (documents, strong) in enumerate(lexical)
+               if not strong or len(documents) < matches]
+    dense = dict(zip(pending, _dense_search_batch(
+        [inquiries[i] for i in pending], config.candidates)))
+    return [_fuse(documents, strong, dense[i], matches, config)
+            if i in dense else documents[:matches]
+            for i, (documents, strong) in enumerate(lexical)]
+
+
+def unique_titles(documents: List[Document]) -> list[str]:
+    seen = set()
+    titles = []
+    for doc in documents:
+        title = doc.metadata.get("title", "").strip()
+        if title and title not in seen:
+            seen.add(title)
+            titles.append(title)
+    return titles
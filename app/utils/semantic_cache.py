@@ -0,0 +1,114 @@
+import time
+import threading
+import numpy as np
+from pathlib import Path
+from langchain_core.embeddings import Embeddings
+from app.config.classes import SemanticCacheConfig
+from app.config.constants import (CHROMA_PATH,
+                                  SEMANTIC_CACHE_CONFIG,
+                                  VECTOR_INDEX_PATH,
+                                  VECTOR_STORE_CONFIG)
+from app.utils.catalog_store import catalog_path
+from app.utils.retriever import get_embedding_function
+
+
+def _mtime(path: Path) -> int:
+    try:
+        return path.stat().st_mtime_ns
+    except FileNotFoundError:
+        return 0
+
+
+def _index_version() -> tuple:
+    if VECTOR_STORE_CONFIG.backend == "numpy":
+        # One directory per index version; a rebuild adds a new one and
+        # removes the old ones.
+        try:
+            return tuple(sorted(entry.name
+                                for entry in VECTOR_INDEX_PATH.iterdir()
+                                if not entry.name.startswith(".")))
+        except FileNotFoundError:
+            return ()
+    return (_mtime(CHROMA_PATH / "chroma.sqlite3"),)
+
+
+def catalog_fingerprint() -> tuple:
+    return _mtime(catalog_path()), *_index_version()
+
+
+class SemanticCache:
+    def __init__(self, embeddings: Embeddings, config: SemanticCacheConfig):
+        self.embeddings = embeddings
+        self.config = config
+        self._lock = threading.Lock()
+        self._fingerprint = catalog_fingerprint()
+        self._vectors = np.empty((0, 0), dtype=np.float32)
+        self._answers: list[str] = []
+        self._stored_at: list[float] = []
+        self.hits = 0
+        self.misses = 0
+        self.invalidations = 0
+
+    def _embed(self, query: str) -> np.ndarray:
+        vector = np.asarray(self.embeddings.embed_query(query.strip().lower()),
+                            dtype=np.float32)
+        return vector / (np.linalg.norm(vector) or 1.0)
+
+    def _reset_if_stale(self):
+        fingerprint = catalog_fingerprint()
+        if fingerprint != self._fingerprint:
+            self.clear()
+            self._fingerprint = fingerprint
+            self.invalidations += 1
+
+    def clear(self):
+        with self._lock:
+            self._vectors = np.empty((0, 0), dtype=np.float32)
+            self._answers = []
+            self._stored_at = []
+
+    def lookup(self, query: str) -> tuple[str | None, np.ndarray]:
+        self._reset_if_stale()
+        vector = self._embed(query)
+        now = time.time()
+        with self._lock:
+            if self._answers:
+                scores = self._vectors @ vector
+                best = int(np.argmax(scores))
+                fresh = now - self._stored_at[best] <= self.config.ttl_seconds
+                if fresh and scores[best] >= self.config.threshold:
+                    self.hits += 1
+                    return self._answers[best], vector
+        self.misses += 1
+        return None, vector
+
+    def put(self, vector: np.ndarray, answer: str):
+        now = time.time()
+        with self._lock:
+            keep = [i for i, stored_at in enumerate(self._stored_at)
+                    if now - stored_at <= self.config.ttl_seconds]
+            keep = keep[-(self.config.max_entries - 1):] if (
+                self.config.max_entries > 1) else []
+            vectors = [self._vectors[i] for i in keep] + [vector]
+            self._vectors = np.vstack(vectors)
+            self._answers = [self._answers[i] for i in keep] + [answer]
+            self._stored_at = [self._stored_at[i] for i in keep] + [now]
+
+    def stats(self) -> dict:
+        return {"entries": len(self._answers),
+                "hits": self.hits,
+                "misses": self.misses,
+                "invalidations": self.invalidations}
+
+
+_semantic_cache: SemanticCache | None = None
+_semantic_cache_lock = threading.Lock()
+
+
+def get_semantic_cache() -> SemanticCache:
+    global _semantic_cache
+    with _semantic_cache_lock:
+        if _semantic_cache is None:
+            _semantic_cache = SemanticCache(get_embedding_function(),
+                                            SEMANTIC_CACHE_CONFIG)
+        return _semantic_cache
@@ -0,0 +1,131 @@
+import asyncio
+import threading
+from typing import Any, Callable, Hashable
+from app.config.constants import SINGLE_FLIGHT_CONFIG
+
+
+# The leading call went away without a result; its followers retry.
+class Abandoned(Exception):
+    pass
+
+
+class _Call:
+    def __init__(self):
+        self.done = threading.Event()
+        self.result: Any = None
+        self.error: BaseException | None = None
+
+
+class SingleFlight:
+    # Concurrent calls with the same key share the first caller's upstream
+    # call and its result or error; nothing is kept once it has finished.
+    def __init__(self, name: str, enabled: bool = True):
+        self.name = name
+        self.enabled = enabled
+        self._lock = threading.Lock()
+        self._calls: dict[Hashable, _Call] = {}
+        self._futures: dict[Hashable, asyncio.Future] = {}
+        self.leaders = 0
+        self.shared = 0
+        self.abandoned = 0
+
+    def do(self, key: Hashable, function: Callable, *args, **kwargs):
+        if not self.enabled:
+            return function(*args, **kwargs)
+        with self._lock:
+            call = self._calls.get(key)
+            leader = call is None
+            if leader:
+                call = self._calls[key] = _Call()
+                self.leaders += 1
+            else:
+                self.shared += 1
+        if not leader:
+            call.done.wait()
+            if call.error is not None:
+                raise call.error
+            return call.result
+        try:
+            call.result = function(*args, **kwargs)
+            return call.result
+        except BaseException as error:
+            call.error = error
+            raise
+        finally:
+            with self._lock:
+                del self._calls[key]
+            call.done.set()
+
+    def join(self, key: Hashable) -> asyncio.Future | None:
+        future = self._futures.get(key)
+        if future is not None:
+            with self._lock:
+                self.shared += 1
+        return future
+
+    def lead(self, key: Hashable) -> asyncio.Future | None:
+        if not self.enabled:
+            return None
+        future = asyncio.get_running_loop().create_future()
+        # Followers that never await it must not log "exception was never
+        # retrieved".
+        future.add_done_callback(
+            lambda done: done.cancelled() or done.exception())
+        self._futures[key] = future
+        with self._lock:
+            self.leaders += 1
+        return future
+
+    def land(self, key: Hashable, future: asyncio.Future | None,
+             result: Any = None, error: BaseException | None = None):
+        if future is None or future.done():
+            return
+        if error is not None and not isinstance(error, Exception):
+            # A cancelled leader must not cancel the requests following it.
+            error = Abandoned()
+        if self._futures.get(key) is future:
+            del self._futures[key]
+        if isinstance(error, Abandoned):
+            with self._lock:
+                self.abandoned += 1
+        if error is not None:
+            future.set_exception(error)
+        else:
+            future.set_result(result)
+
+    async def follow(self, key: Hashable, timeout: float | None = None):
+        # Waits for a call already in flight. Returns (True, result), or
+        # (False, None) when the caller has to make the call itself.
+        while (future := self.join(key)) is not None:
+            try:
+                return True, await asyncio.wait_for(asyncio.shield(future),
+                                                    timeout)
+            except Abandoned:
+                with self._lock:
+                    self.shared -= 1
+            except asyncio.TimeoutError:
+                # A leader that never lands (its response was never
+                # started) is replaced by this caller.
+                with self._lock:
+                    self.shared -= 1
+                break
+        return False, None
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {"in_flight": len(self._calls) + len(self._futures),
+                    "leaders": self.leaders,
+                    "shared": self.shared,
+                    "abandoned": self.abandoned}
+
+
+flights: dict[str, SingleFlight] = {}
+
+
+def single_flight(name: str) -> SingleFlight:
+    return flights.setdefault(
+        name, SingleFlight(name, SINGLE_FLIGHT_CONFIG.enabled))
+
+
+def flight_stats() -> dict:
+    return {name: flight.stats() for name, flight in flights.items()}
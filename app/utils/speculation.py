@@ -0,0 +1,173 @@
+import re
+import time
+import logging
+import threading
+from contextvars import ContextVar
+from concurrent.futures import ThreadPoolExecutor
+from typing import List
+from langchain_core.documents import Document
+from app.utils.catalog import catalog, normalize_title
+from app.utils.retriever import search_books_batch, unique_titles
+
+
+logger = logging.getLogger(__name__)
+
+SEARCH_MATCHES = 5
+
+_REQUEST_WORDS = re.compile(
+    r"\b(?:can|could|would|will|you|please|i|im|i'm|me|my|we|us|want|"
+    r"wanna|need|like|love|looking|look|for|recommend|recommendation|"
+    r"recommendations|suggest|suggestion|suggestions|give|show|find|get|"
+    r"tell|about|some|something|any|anything|a|an|the|good|great|best|"
+    r"nice|new|book|books|novel|novels|story|stories|title|titles|read|"
+    r"reading|to|of|on|with|in)\b",
+    re.IGNORECASE)
+
+# Words that mark a topic or recommendation request, the turns whose
+# first tool call is the mandated search.
+_TOPIC_REQUEST = re.compile(
+    r"\b(?:recommend\w*|suggest\w*|looking for|books?|novels?|"
+    r"stor(?:y|ies)|genres?|topics?|themes?)\b",
+    re.IGNORECASE)
+
+current_speculation: ContextVar["Speculation | None"] = ContextVar(
+    "current_speculation", default=None)
+
+_pool = ThreadPoolExecutor(max_workers=4,
+                           thread_name_prefix="speculation")
+
+
+def _topic(text: str) -> str:
+    return " ".join(_REQUEST_WORDS.sub(" ", text).split()).strip(" ?.!,")
+
+
+def candidate_queries(text: str) -> list[str]:
+    # The agent usually searches for either the user's words verbatim or
+    # just the topic left once the request phrasing is stripped.
+    raw = " ".join(text.split())
+    return list(dict.fromkeys(query for query in (raw, _topic(raw))
+                              if query))
+
+
+def is_topic_request(text: str) -> bool:
+    # Greetings, thanks and questions about a book already discussed do
+    # not start with a search; prefetching for them only takes pool
+    # threads from turns that do.
+    return bool(_TOPIC_REQUEST.search(text)) and bool(_topic(text))
+
+
+class SpeculationStats:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.turns = 0
+        self.search_hits = 0
+        self.summary_hits = 0
+        self.misses = 0
+        self.unused = 0
+        self.cancelled = 0
+        self.skipped = 0
+        self.saved_ms = 0.0
+
+    def skip(self):
+        with self._lock:
+            self.skipped += 1
+
+    def record(self, speculation: "Speculation"):
+        with self._lock:
+            self.turns += 1
+            self.search_hits += speculation.search_hits
+            self.summary_hits += speculation.summary_hits
+            self.misses += speculation.misses
+            self.cancelled += speculation.cancelled
+            self.unused += not (speculation.search_hits or speculation.misses)
+            self.saved_ms += speculation.saved_ms
+
+    def stats(self) -> dict:
+        with self._lock:
+            hit_rate = (self.search_hits / (self.search_hits + self.misses)
+                        if self.search_hits + self.misses else 0.0)
+            return {"turns": self.turns,
+                    "search_hits": self.search_hits,
+                    "summary_hits": self.summary_hits,
+                    "misses": self.misses,
+                    "unused": self.unused,
+                    "cancelled": self.cancelled,
+                    "skipped": self.skipped,
+                    "hit_rate": round(hit_rate, 3),
+                    "saved_ms": round(self.saved_ms, 1)}
+
+
+speculation_stats = SpeculationStats()
+
+
+class Speculation:
+    def __init__(self, query: str):
+        self.queries = candidate_queries(query)
+        self.keys = [normalize_title(query) for query in self.queries]
+        self.search_hits = 0
+        self.summary_hits = 0
+        self.misses = 0
+        self.cancelled = 0
+        self.saved_ms = 0.0
+        self.duration_ms: float | None = None
+        self._future = _pool.submit(self._prefetch)
+
+    def _prefetch(self):
+        started = time.perf_counter()
+        results = dict(zip(self.keys, search_books_batch(self.queries,
+                                                         SEARCH_MATCHES)))
+        summaries = {}
+        for documents in results.values():
+            titles = unique_titles(documents)
+            if titles:
+                summaries[normalize_title(titles[0])] = catalog.lookup(
+                    titles[0])
+        self.duration_ms = (time.perf_counter() - started) * 1000
+        return results, summaries
+
+    def _result(self):
+        waited = time.perf_counter()
+        try:
+            result = self._future.result()
+        except Exception as prefetchError:
+            logger.warning("speculative prefetch failed: %s", prefetchError)
+            return None, 0.0
+        return result, (time.perf_counter() - waited) * 1000
+
+    def search(self, query: str) -> List[Document] | None:
+        key = normalize_title(query)
+        if key not in self.keys:
+            self.misses += 1
+            return None
+        if self._future.cancel():
+            # Still queued behind other turns' prefetches: searching now
+            # beats waiting for a thread to free up.
+            self.cancelled += 1
+            return None
+        result, waited_ms = self._result()
+        if result is None:
+            return None
+        self.search_hits += 1
+        # Running the search now would have taken as long as the prefetch
+        # did; only the part we still had to wait for is not saved.
+        self.saved_ms += max(0.0, self.duration_ms - waited_ms)
+        return result[0][key]
+
+    def summary(self, title: str) -> tuple[dict | None, bool] | None:
+        if not self._future.done() or self._future.cancelled():
+            return None
+        result, _ = self._result()
+        if result is None:
+            return None
+        found = result[1].get(normalize_title(title))
+        if found is not None:
+            self.summary_hits += 1
+        return found
+
+    def finish(self):
+        if not self._future.done():
+            self._future.cancel()
+        speculation_stats.record(self)
+        logger.info("speculation search_hits=%d summary_hits=%d misses=%d "
+                    "saved_ms=%.1f", self.search_hits, self.summary_hits,
+                    self.misses, self.saved_ms)
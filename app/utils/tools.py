@@ -1,28 +1,40 @@
-import json
 from langchain_core.tools import tool
-from app.config.constants import DATA_PATH
-from app.utils.retriever import search_books
+from app.utils.catalog import catalog, normalize_title
+from app.utils.retriever import (search_books,
+                                 search_books_batch,
+                                 unique_titles)
+from app.utils.single_flight import single_flight
+from app.utils.speculation import SEARCH_MATCHES, current_speculation
+
+
+# Identical lookups from concurrent turns share one execution.
+tool_flights = single_flight("tools")
+
+TOOL_ERROR = "We have encountered this error"
 
 
 @tool
 def get_summary_by_title(title: str) -> str:
     """
-        Return the full summary of a book based on its exact title.
+        Return the full summary of a book based on its title.
         Example: get_summary_by_title("The Hobbit")
         will return the full summary of "The Hobbit".
+        Slightly misspelled titles resolve to the closest library title.
     """
     try:
-        with open(DATA_PATH, "r", encoding="utf-8") as f:
-            books = json.load(f)
-
-        for book in books:
-            if book["title"].strip().lower() == title.strip().lower():
-                return book["full_summary"]
-
-        return f"There is no book entitled: '{title}'."
+        speculation = current_speculation.get()
+        found = speculation.summary(title) if speculation else None
+        book, exact = found or tool_flights.do(
+            ("summary", normalize_title(title)), catalog.lookup, title)
+        if not book:
+            return f"There is no book entitled: '{title}'."
+        if exact:
+            return book["full_summary"]
+        return (f"Closest library title: '{book['title']}'.\n"
+                f"{book['full_summary']}")
 
     except Exception as e:
-        return f"We have encountered this error: {e}"
+        return f"{TOOL_ERROR}: {e}"
 
 
 @tool
@@ -31,17 +43,30 @@ def search_relevant_books(query: str) -> str:
         Search the library's book collection for relevant books by genre.
         Returns a string with unique book titles in order.
     """
-    matches = search_books(query, matches=5)
+    speculation = current_speculation.get()
+    matches = speculation.search(query) if speculation else None
+    if matches is None:
+        matches = tool_flights.do(("search", " ".join(query.split())),
+                                  search_books, query,
+                                  matches=SEARCH_MATCHES)
 
     if not matches:
         return ""
 
-    seen = set()
-    results = []
-    for doc in matches:
-        title = doc.metadata.get("title", "").strip()
-        if title and title not in seen:
-            seen.add(title)
-            results.append(title)
+    return "\n".join(unique_titles(matches))
 
-    return "\n".join(results)
+
+@tool
+def search_relevant_books_batch(queries: list[str]) -> str:
+    """
+        Search the library for several topics or genres at once.
+        Returns, for every query, a "# <query>" line followed by
+        its unique book titles in order.
+    """
+    blocks = []
+    results = tool_flights.do(("batch", tuple(queries)),
+                              search_books_batch, queries,
+                              matches=SEARCH_MATCHES)
+    for query, matches in zip(queries, results):
+        blocks.append("\n".join([f"# {query}", *unique_titles(matches)]))
+    return "\n\n".join(blocks)
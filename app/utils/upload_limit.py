@@ -0,0 +1,66 @@
+import re
+from starlette.responses import JSONResponse
+
+
+# Multipart boundaries, part headers and the other form fields.
+FORM_OVERHEAD = 64 * 1024
+
+
+class _TooLarge(Exception):
+    pass
+
+
+class UploadLimitMiddleware:
+    # Starlette reads and spools a whole multipart body before the route
+    # runs, so oversized uploads are turned away here: at once when the
+    # Content-Length says so, otherwise as soon as the body passes the
+    # limit.
+    def __init__(self, app, path: str, max_bytes: int,
+                 detail: str = "Upload too large"):
+        self.app = app
+        self.path = re.compile(path)
+        self.max_bytes = max_bytes
+        self.detail = detail
+
+    async def _reject(self, scope, receive, send):
+        response = JSONResponse({"detail": self.detail}, status_code=413,
+                                headers={"Connection": "close"})
+        await response(scope, receive, send)
+
+    async def __call__(self, scope, receive, send):
+        if (scope["type"] != "http" or scope["method"] != "POST"
+                or not self.path.fullmatch(scope["path"])):
+            await self.app(scope, receive, send)
+            return
+
+        length = dict(scope["headers"]).get(b"content-length", b"")
+        if length.isdigit() and int(length) > self.max_bytes:
+            await self._reject(scope, receive, send)
+            return
+
+        received = 0
+        rejected = False
+
+        async def limited_receive():
+            nonlocal received, rejected
+            message = await receive()
+            if message["type"] == "http.request":
+                received += len(message.get("body", b""))
+                if received > self.max_bytes:
+                    rejected = True
+                    raise _TooLarge()
+            return message
+
+        async def guarded_send(message):
+            # Whatever the app makes of the aborted body is replaced by
+            # the 413.
+            if not rejected:
+                await send(message)
+
+        try:
+            await self.app(scope, limited_receive, guarded_send)
+        except Exception:
+            if not rejected:
+                raise
+        if rejected:
+            await self._reject(scope, receive, send)
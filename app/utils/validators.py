@@ -1,12 +1,67 @@
+import re
+import unicodedata
 from app.config.constants import FORBIDDEN_WORDS
 
 
+_COMBINING_MARKS = re.compile(
+    "[\u0300-\u036f\u1ab0-\u1aff\u1dc0-\u1dff\u20d0-\u20ff\ufe20-\ufe2f]")
+_SEPARATORS = re.compile(r"[\W_]+")
+
+
+def normalize_text(text: str) -> str:
+    # NFKD splits "ă", "ș", "ț" into a base letter plus a combining mark;
+    # dropping the marks lets one plain-ASCII entry cover every variant.
+    text = unicodedata.normalize("NFKD", text)
+    return _COMBINING_MARKS.sub("", text).casefold()
+
+
+def _trie_pattern(phrases: list[list[str]]) -> str:
+    # Entries sharing a prefix share a branch ("fuck(?:ed|er|ing)?"), so
+    # the regex engine never re-scans the same characters per entry.
+    trie: dict = {}
+    for words in phrases:
+        node = trie
+        for i, word in enumerate(words):
+            for char in word:
+                node = node.setdefault(char, {})
+            if i < len(words) - 1:
+                node = node.setdefault(" ", {})
+        node[""] = {}
+
+    def build(node: dict) -> str:
+        branches = []
+        for key in sorted(node, reverse=True):
+            if key == "":
+                continue
+            head = r"[\W_]+" if key == " " else re.escape(key)
+            branches.append(head + build(node[key]))
+        if not branches:
+            return ""
+        pattern = (branches[0] if len(branches) == 1
+                   else "(?:" + "|".join(branches) + ")")
+        if "" in node:
+            return f"(?:{pattern})?"
+        return pattern
+
+    return build(trie)
+
+
+class ProfanityMatcher:
+    def __init__(self, entries: list[str]):
+        phrases = {tuple(_SEPARATORS.sub(" ", normalize_text(entry)).split())
+                   for entry in entries}
+        phrases.discard(())
+        self.pattern = re.compile(
+            r"(?<!\w)" + _trie_pattern(sorted(map(list, phrases)))
+            + r"(?!\w)")
+
+    def search(self, text: str) -> str | None:
+        match = self.pattern.search(normalize_text(text))
+        return match.group(0) if match else None
+
+
+profanity = ProfanityMatcher(FORBIDDEN_WORDS)
+
+
 def language_filter(text: str) -> bool:
-    text = text.lower()
-    words = text.split()
-
-    for word in words:
-        clean_word = word.strip(".,!?")
-        if clean_word in FORBIDDEN_WORDS:
-            return True
-    return False
+    return profanity.search(text) is not None
@@ -0,0 +1,238 @@
+import os
+import shutil
+import hashlib
+import tempfile
+import numpy as np
+from abc import ABC, abstractmethod
+from pathlib import Path
+from typing import List
+from langchain_core.documents import Document
+from langchain_core.embeddings import Embeddings
+from app.utils.ingest import content_hash, embed_with_retry
+
+
+class VectorBackend(ABC):
+    embeddings: Embeddings | None = None
+
+    @abstractmethod
+    def search(self, inquiry: str, matches: int = 5) -> List[Document]:
+        ...
+
+    @abstractmethod
+    def search_by_vector(self,
+                         vector: list[float],
+                         matches: int = 5) -> List[Document]:
+        ...
+
+    def search_by_vectors(self,
+                          vectors: list[list[float]],
+                          matches: int = 5) -> List[List[Document]]:
+        return [self.search_by_vector(vector, matches) for vector in vectors]
+
+    def search_batch(self,
+                     inquiries: list[str],
+                     matches: int = 5) -> List[List[Document]]:
+        if not inquiries:
+            return []
+        # One embeddings request for the whole batch.
+        return self.search_by_vectors(
+            self.embeddings.embed_documents(inquiries), matches)
+
+
+class ChromaBackend(VectorBackend):
+    def __init__(self, vectorstore, collection=None):
+        self.vectorstore = vectorstore
+        self.collection = collection
+        self.embeddings = vectorstore.embeddings
+
+    def search(self, inquiry: str, matches: int = 5) -> List[Document]:
+        return self.vectorstore.similarity_search(inquiry, k=matches)
+
+    def search_by_vector(self,
+                         vector: list[float],
+                         matches: int = 5) -> List[Document]:
+        return self.vectorstore.similarity_search_by_vector(vector,
+                                                            k=matches)
+
+    def search_by_vectors(self,
+                          vectors: list[list[float]],
+                          matches: int = 5) -> List[List[Document]]:
+        if self.collection is None:
+            return super().search_by_vectors(vectors, matches)
+        result = self.collection.query(query_embeddings=vectors,
+                                       n_results=matches,
+                                       include=["documents", "metadatas"])
+        return [[Document(page_content=document or "",
+                          metadata=metadata or {})
+                 for document, metadata in zip(documents, metadatas)]
+                for documents, metadatas in zip(result["documents"],
+                                                result["metadatas"])]
+
+
+def normalize_rows(vectors) -> np.ndarray:
+    matrix = np.asarray(vectors, dtype=np.float32)
+    norms = np.linalg.norm(matrix, axis=-1, keepdims=True)
+    norms[norms == 0] = 1.0
+    return matrix / norms
+
+
+def quantize(matrix: np.ndarray,
+             dtype: str) -> tuple[np.ndarray, np.ndarray | None]:
+    if dtype == "int8":
+        scale = np.abs(matrix).max(axis=1) / 127.0
+        scale[scale == 0] = 1.0
+        quantized = np.round(matrix / scale[:, None]).astype(np.int8)
+        return quantized, scale.astype(np.float32)
+    return matrix.astype(dtype), None
+
+
+def pack_strings(values: list[str]) -> tuple[np.ndarray, np.ndarray]:
+    encoded = [value.encode() for value in values]
+    offsets = np.zeros(len(encoded) + 1, dtype=np.int64)
+    np.cumsum([len(item) for item in encoded], out=offsets[1:])
+    return offsets, np.frombuffer(b"".join(encoded), dtype=np.uint8)
+
+
+class PackedStrings:
+    def __init__(self, offsets: np.ndarray, blob: np.ndarray):
+        self.offsets = offsets
+        self.blob = blob
+
+    def __len__(self) -> int:
+        return len(self.offsets) - 1
+
+    def __getitem__(self, index: int) -> str:
+        start, end = self.offsets[index], self.offsets[index + 1]
+        return self.blob[start:end].tobytes().decode()
+
+
+class NumpyBackend(VectorBackend):
+    # Rows are scored in slices so a float16/int8 index never needs a full
+    # float32 copy of the matrix.
+    chunk_rows = 8192
+
+    def __init__(self, path: Path, embeddings: Embeddings | None = None):
+        self.path = path
+        self.embeddings = embeddings
+        # Every array is memory-mapped read-only, so uvicorn workers on the
+        # same host share one copy of the index through the page cache.
+        self.vectors = np.load(path / "vectors.npy", mmap_mode="r")
+        self.scale = (np.load(path / "scale.npy", mmap_mode="r")
+                      if (path / "scale.npy").exists() else None)
+        self.titles = PackedStrings(
+            np.load(path / "titles_offsets.npy", mmap_mode="r"),
+            np.load(path / "titles.npy", mmap_mode="r"))
+        self.documents = PackedStrings(
+            np.load(path / "documents_offsets.npy", mmap_mode="r"),
+            np.load(path / "documents.npy", mmap_mode="r"))
+
+    def __len__(self) -> int:
+        return len(self.vectors)
+
+    @staticmethod
+    def write(path: Path,
+              vectors,
+              titles: list[str],
+              documents: list[str],
+              dtype: str = "float32"):
+        path.parent.mkdir(parents=True, exist_ok=True)
+        building = Path(tempfile.mkdtemp(dir=path.parent, prefix=".build-"))
+        matrix, scale = quantize(normalize_rows(vectors), dtype)
+        np.save(building / "vectors.npy", matrix)
+        if scale is not None:
+            np.save(building / "scale.npy", scale)
+        for name, values in (("titles", titles), ("documents", documents)):
+            offsets, blob = pack_strings(values)
+            np.save(building / f"{name}_offsets.npy", offsets)
+            np.save(building / f"{name}.npy", blob)
+        try:
+            os.rename(building, path)
+        except OSError:
+            # Another worker published the same index first.
+            shutil.rmtree(building, ignore_errors=True)
+
+    def scores(self, queries: np.ndarray) -> np.ndarray:
+        # queries: (n, dimensions) -> scores: (n, rows). Each slice of the
+        # matrix is read once for the whole batch.
+        scores = np.empty((len(queries), len(self.vectors)),
+                          dtype=np.float32)
+        for start in range(0, len(self.vectors), self.chunk_rows):
+            rows = self.vectors[start:start + self.chunk_rows]
+            if rows.dtype != np.float32:
+                rows = rows.astype(np.float32)
+            chunk = queries @ rows.T
+            if self.scale is not None:
+                chunk *= self.scale[start:start + self.chunk_rows]
+            scores[:, start:start + len(rows)] = chunk
+        return scores
+
+    def top_k(self, vectors, matches: int) -> tuple[np.ndarray, np.ndarray]:
+        scores = self.scores(normalize_rows(np.atleast_2d(vectors)))
+        k = min(matches, scores.shape[1])
+        if k <= 0:
+            empty = np.empty((len(scores), 0), dtype=np.int64)
+            return empty, scores[:, :0]
+        top = np.argpartition(-scores, k - 1, axis=1)[:, :k]
+        top_scores = np.take_along_axis(scores, top, axis=1)
+        order = np.argsort(-top_scores, axis=1)
+        return (np.take_along_axis(top, order, axis=1),
+                np.take_along_axis(top_scores, order, axis=1))
+
+    def _documents(self, top: np.ndarray,
+                   scores: np.ndarray) -> List[Document]:
+        return [Document(page_content=self.documents[i],
+                         metadata={"title": self.titles[i],
+                                   "score": float(score)})
+                for i, score in zip(top.tolist(), scores.tolist())]
+
+    def search_by_vector(self,
+                         vector: list[float],
+                         matches: int = 5) -> List[Document]:
+        return self.search_by_vectors([vector], matches)[0]
+
+    def search_by_vectors(self,
+                          vectors: list[list[float]],
+                          matches: int = 5) -> List[List[Document]]:
+        if not len(vectors):
+            return []
+        top, scores = self.top_k(vectors, matches)
+        return [self._documents(row, row_scores)
+                for row, row_scores in zip(top, scores)]
+
+    def search(self, inquiry: str, matches: int = 5) -> List[Document]:
+        return self.search_by_vector(self.embeddings.embed_query(inquiry),
+                                     matches)
+
+
+def index_fingerprint(books: list[dict], model: str, dtype: str) -> str:
+    digest = hashlib.sha256(f"{model}\0{dtype}".encode())
+    for book in books:
+        digest.update(content_hash(book).encode())
+    return digest.hexdigest()[:16]
+
+
+def load_numpy_backend(root: Path,
+                       books: list[dict],
+                       embeddings: Embeddings,
+                       model: str,
+                       dtype: str = "float32",
+                       batch_size: int = 64) -> NumpyBackend:
+    # Each catalog version gets its own directory, so a rebuild never
+    # touches files another worker still has mapped.
+    path = root / index_fingerprint(books, model, dtype)
+    if not path.exists():
+        texts = [book["summary"] for book in books]
+        vectors = []
+        for start in range(0, len(texts), batch_size):
+            vectors.extend(embed_with_retry(embeddings,
+                                            texts[start:start + batch_size],
+                                            max_retries=5))
+        NumpyBackend.write(path,
+                           vectors,
+                           [book["title"] for book in books],
+                           texts,
+                           dtype)
+        for stale in root.iterdir():
+            if stale != path and not stale.name.startswith("."):
+                shutil.rmtree(stale, ignore_errors=True)
+    return NumpyBackend(path, embeddings)
@@ -1,5 +1,8 @@
 let token = null;
 let currentConversationId = null;
+let lastMessageId = 0;
+let oldestMessageId = null;
+const PAGE_SIZE = 50;
 let busy = false;
 let recording = false;
 let mediaRecorder;
@@ -96,8 +99,7 @@ document.getElementById("login-form").addEventListener("submit", async (e) => {
 document.getElementById("logout-button").addEventListener("click", () => {
   localStorage.removeItem("token");
   token = null;
-  currentConversationId = null;
-  document.getElementById("messages").innerHTML = "";
+  resetConversation();
   document.querySelector(".main-page").classList.add("hidden");
   document.querySelector(".auth-box").classList.remove("hidden");
   showLogin();
@@ -123,6 +125,17 @@ function renderMessage(role, content, isMedia = false) {
   msgDiv.scrollIntoView();
 }
 
+function trackMessages(messages) {
+  messages.forEach(m => { lastMessageId = Math.max(lastMessageId, m.id); });
+}
+
+function resetConversation(id = null) {
+  currentConversationId = id;
+  lastMessageId = 0;
+  oldestMessageId = null;
+  document.getElementById("messages").innerHTML = "";
+}
+
 function addDownloadLink(containerEl, blob, filename) {
   const link = document.createElement("a");
   link.href = URL.createObjectURL(blob);
@@ -154,8 +167,7 @@ async function loadConversations() {
       await apiFetch(`/conversations/${c.id}`, { method: "DELETE" });
       loadConversations();
       if (currentConversationId === c.id) {
-        currentConversationId = null;
-        document.getElementById("messages").innerHTML = "";
+        resetConversation();
       }
     };
 
@@ -165,18 +177,48 @@ async function loadConversations() {
 }
 
 async function openConversation(id) {
-  const res = await apiFetch(`/conversations/${id}`);
+  const res = await apiFetch(`/conversations/${id}?limit=${PAGE_SIZE}`);
   if (!res.ok) return;
   const data = await res.json();
 
-  currentConversationId = data.conversation.id;
-  document.getElementById("messages").innerHTML = "";
+  resetConversation(data.conversation.id);
+  if (data.has_more) renderLoadOlder();
   data.messages.forEach(m => renderMessage(m.role, m.content));
+  trackMessages(data.messages);
+  if (data.messages.length) oldestMessageId = data.messages[0].id;
+}
+
+function renderLoadOlder() {
+  const btn = document.createElement("button");
+  btn.textContent = "Load older messages";
+  btn.classList.add("load-older");
+  btn.onclick = loadOlderMessages;
+  document.getElementById("messages").prepend(btn);
+}
+
+async function loadOlderMessages() {
+  if (!currentConversationId || oldestMessageId === null) return;
+  const res = await apiFetch(
+    `/conversations/${currentConversationId}` +
+    `?before_id=${oldestMessageId}&limit=${PAGE_SIZE}`);
+  if (!res.ok) return;
+  const data = await res.json();
+
+  const container = document.getElementById("messages");
+  container.querySelector(".load-older")?.remove();
+  const first = container.firstChild;
+  data.messages.forEach(m => {
+    const msgDiv = document.createElement("div");
+    msgDiv.classList.add("message", m.role);
+    msgDiv.textContent = m.content;
+    container.insertBefore(msgDiv, first);
+  });
+  if (data.messages.length) oldestMessageId = data.messages[0].id;
+  if (data.has_more) renderLoadOlder();
 }
 
 document.getElementById("new-chat").addEventListener("click", () => {
-  currentConversationId = null;
-  document.getElementById("messages").innerHTML = "";
+  resetConversation();
 });
 
 document.getElementById("send-btn").addEventListener("click", async () => {
@@ -198,15 +240,19 @@ document.getElementById("send-btn").addEventListener("click", async () => {
       loadConversations();
     }
 
-    const res = await apiFetch(`/conversations/${currentConversationId}/messages`, {
+    const res = await apiFetch(
+      `/conversations/${currentConversationId}/messages?since_id=${lastMessageId}`, {
       method: "POST",
       headers: { "Content-Type": "application/json" },
       body: JSON.stringify({ content: text })
     });
     if (!res.ok) throw new Error("Message send failed");
     const data = await res.json();
-    const lastMsg = data.messages[data.messages.length - 1];
-    if (lastMsg) renderMessage("assistant", lastMsg.content);
+    // The user message is already on screen; render everything else new.
+    data.messages
+      .filter(m => m.role !== "user" || m.content !== text)
+      .forEach(m => renderMessage(m.role, m.content));
+    trackMessages(data.messages);
   } catch (err) {
     console.error(err);
     renderMessage("assistant", "Something went wrong sending your message.");
@@ -231,14 +277,15 @@ document.getElementById("stt-btn").addEventListener("click", async () => {
       const form = new FormData();
       form.append("file", audioBlob, "audio.webm");
 
-      const res = await apiFetch(`/conversations/${currentConversationId}/stt`, {
+      const res = await apiFetch(
+        `/conversations/${currentConversationId}/stt?since_id=${lastMessageId}`, {
         method: "POST",
         body: form
       });
       if (res.ok) {
         const data = await res.json();
-        const lastTwo = data.messages.slice(-2);
-        lastTwo.forEach(m => renderMessage(m.role, m.content));
+        data.messages.forEach(m => renderMessage(m.role, m.content));
+        trackMessages(data.messages);
       }
       setBusy(false);
       document.getElementById("stt-btn").classList.remove("recording");
@@ -285,7 +332,18 @@ document.getElementById("img-btn").addEventListener("click", async () => {
   if (!currentConversationId || busy) return;
   setBusy(true);
   try {
-    const res = await apiFetch(`/conversations/${currentConversationId}/image`);
+    const jobRes = await apiFetch(
+      `/conversations/${currentConversationId}/image/jobs`, { method: "POST" });
+    if (!jobRes.ok) throw new Error("Image generation failed");
+    let job = await jobRes.json();
+    while (job.status === "queued" || job.status === "running") {
+      await new Promise(resolve => setTimeout(resolve, 1000));
+      const pollRes = await apiFetch(`/image/jobs/${job.id}`);
+      if (!pollRes.ok) throw new Error("Image generation failed");
+      job = await pollRes.json();
+    }
+    if (job.status !== "done") throw new Error(job.error || "Image generation failed");
+    const res = await apiFetch(job.result_url);
     if (!res.ok) throw new Error("Image generation failed");
     const blob = await res.blob();
     const img = document.createElement("img");
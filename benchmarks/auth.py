@@ -0,0 +1,116 @@
+"""Authentication benchmark: per-request JWT decode + user query vs cache.
+
+    python -m benchmarks.auth [--users 10000] [--requests 2000] [--save]
+
+Seeds a throwaway SQLite database with `--users` accounts, then times
+`get_current_user` on its own and a full authenticated request
+(`GET /conversations` through the ASGI app) with the auth cache disabled
+(the previous behaviour) and enabled. SQL statements issued per request
+are counted from engine events. `--save` writes
+benchmarks/results/auth.json.
+"""
+import os
+import json
+import time
+import argparse
+import tempfile
+import statistics
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parents[1]
+RESULTS = ROOT / "benchmarks" / "results" / "auth.json"
+
+
+def timed(function, rounds: int) -> list[float]:
+    latencies = []
+    for _ in range(rounds):
+        started = time.perf_counter()
+        function()
+        latencies.append((time.perf_counter() - started) * 1000)
+    return latencies
+
+
+def summary(latencies: list[float]) -> dict:
+    latencies = sorted(latencies)
+    return {"mean_ms": round(statistics.fmean(latencies), 4),
+            "p50_ms": round(statistics.median(latencies), 4),
+            "p95_ms": round(latencies[int(len(latencies) * 0.95) - 1], 4)}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--users", type=int, default=10_000)
+    parser.add_argument("--requests", type=int, default=2000)
+    parser.add_argument("--save", action="store_true")
+    args = parser.parse_args()
+
+    tmp = tempfile.TemporaryDirectory()
+    os.environ["DATABASE_URL"] = f"sqlite:///{Path(tmp.name) / 'auth.db'}"
+    os.environ.setdefault("OPENAI_API_KEY", "sk-fake")
+
+    from fastapi.testclient import TestClient
+    from sqlalchemy import event, insert
+    from app.auth.auth_cache import auth_cache
+    from app.auth.jwt_auth import get_current_user
+    from app.auth.jwt_handler import create_token
+    from app.main import app
+    from app.models.db_model import User
+    from app.services.db_connection import SessionLocal, engine, init_db
+
+    init_db()
+    with SessionLocal() as db:
+        db.execute(insert(User), [{"username": f"user{i}",
+                                   "hashed_password": "x"}
+                                  for i in range(args.users)])
+        db.commit()
+    username = f"user{args.users // 2}"
+    token = create_token({"sub": username})
+    headers = {"Authorization": f"Bearer {token}"}
+
+    statements = [0]
+    event.listen(engine, "before_cursor_execute",
+                 lambda *_: statements.__setitem__(0, statements[0] + 1))
+
+    client = TestClient(app)
+    report = {}
+    for mode, enabled in (("uncached", False), ("cached", True)):
+        auth_cache.enabled = enabled
+        auth_cache.tokens.pop(token)
+
+        def dependency():
+            with SessionLocal() as db:
+                get_current_user(token, db)
+
+        def authenticated_request():
+            response = client.get("/conversations", headers=headers)
+            assert response.status_code == 200, response.text
+
+        dependency()
+        authenticated_request()
+        statements[0] = 0
+        dependency_latency = timed(dependency, args.requests)
+        dependency_statements = statements[0] / args.requests
+        statements[0] = 0
+        request_latency = timed(authenticated_request, args.requests)
+        report[mode] = {
+            "get_current_user": dict(summary(dependency_latency),
+                                     sql_statements=dependency_statements),
+            "get_conversations": dict(summary(request_latency),
+                                      sql_statements=statements[0]
+                                      / args.requests),
+        }
+        print(mode, report[mode], flush=True)
+
+    results = {"users": args.users,
+               "requests": args.requests,
+               "modes": report,
+               "cache": auth_cache.stats()}
+    print(json.dumps(results, indent=2))
+    if args.save:
+        RESULTS.parent.mkdir(parents=True, exist_ok=True)
+        RESULTS.write_text(json.dumps(results, indent=2) + "\n")
+    tmp.cleanup()
+
+
+if __name__ == "__main__":
+    main()
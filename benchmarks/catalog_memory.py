@@ -0,0 +1,129 @@
+"""Catalog memory: JSON array vs the offset-indexed catalog store.
+
+    python -m benchmarks.catalog_memory [--books 100000] [--lexical] [--save]
+
+Writes a synthetic catalog of `--books` books (short summaries of ~150
+characters, full summaries of ~1,200) as a JSON array, converts it with
+app.utils.catalog_store, then loads each format in a fresh process and
+reports the time to build the title index (plus the BM25 index with
+`--lexical`), the resident memory it added (total and anonymous, i.e.
+not file-backed pages another worker could share), and the latency of
+reading one full summary by title. `--save` writes
+benchmarks/results/catalog_memory.json.
+"""
+import os
+import sys
+import json
+import time
+import random
+import argparse
+import tempfile
+import statistics
+import subprocess
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parents[1]
+RESULTS = ROOT / "benchmarks" / "results" / "catalog_memory.json"
+
+
+def memory() -> dict:
+    fields = {}
+    with open("/proc/self/status") as f:
+        for line in f:
+            name, _, value = line.partition(":")
+            if name in ("VmRSS", "RssAnon"):
+                fields[name] = int(value.split()[0]) / 1024
+    return fields
+
+
+def generate(path: Path, books: int, seed: int = 7):
+    rng = random.Random(seed)
+    vocabulary = ["".join(rng.choices("abcdefghijklmnopqrstuvwxyz",
+                                      k=rng.randint(3, 9)))
+                  for _ in range(20_000)]
+
+    def words(count: int) -> str:
+        return " ".join(rng.choices(vocabulary, k=count))
+
+    with open(path, "w", encoding="utf-8") as f:
+        f.write("[\n")
+        for i in range(books):
+            book = {"title": f"{words(3).title()} {i}",
+                    "summary": words(25),
+                    "full_summary": words(200)}
+            f.write(("," if i else "") + json.dumps(book) + "\n")
+        f.write("]\n")
+
+
+def measure(path: Path, lexical: bool, lookups: int) -> dict:
+    from app.utils.catalog import CatalogIndex
+    from app.utils.lexical import LexicalIndex
+
+    before = memory()
+    started = time.perf_counter()
+    catalog = CatalogIndex(path)
+    catalog.refresh()
+    if lexical:
+        LexicalIndex(path).refresh()
+    seconds = time.perf_counter() - started
+    after = memory()
+
+    titles = [book["title"] for book in catalog._books.values()]
+    latencies = []
+    for title in random.Random(1).choices(titles, k=lookups):
+        started = time.perf_counter()
+        catalog.get(title)["full_summary"]
+        latencies.append((time.perf_counter() - started) * 1e6)
+    return {"load_seconds": round(seconds, 2),
+            "rss_mb": round(after["VmRSS"] - before["VmRSS"], 1),
+            "anon_mb": round(after["RssAnon"] - before["RssAnon"], 1),
+            "full_summary_p50_us": round(statistics.median(latencies), 1)}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--books", type=int, default=100_000)
+    parser.add_argument("--lexical", action="store_true")
+    parser.add_argument("--lookups", type=int, default=2000)
+    parser.add_argument("--measure", type=Path, help=argparse.SUPPRESS)
+    parser.add_argument("--save", action="store_true")
+    args = parser.parse_args()
+
+    if args.measure:
+        print(json.dumps(measure(args.measure, args.lexical, args.lookups)))
+        return
+
+    env = dict(os.environ, OPENAI_API_KEY="sk-fake")
+    with tempfile.TemporaryDirectory() as tmp:
+        source, store = Path(tmp) / "books.json", Path(tmp) / "catalog.bin"
+        generate(source, args.books)
+        started = time.perf_counter()
+        subprocess.run([sys.executable, "-m", "app.utils.catalog_store",
+                        "--source", str(source), "--output", str(store)],
+                       cwd=ROOT, env=env, check=True,
+                       stdout=subprocess.DEVNULL)
+        convert_seconds = time.perf_counter() - started
+        results = {"books": args.books,
+                   "lexical": args.lexical,
+                   "json_mb": round(source.stat().st_size / 2**20, 1),
+                   "store_mb": round(store.stat().st_size / 2**20, 1),
+                   "convert_seconds": round(convert_seconds, 2)}
+        for mode, path in (("json", source), ("store", store)):
+            command = [sys.executable, "-m", "benchmarks.catalog_memory",
+                       "--measure", str(path),
+                       "--lookups", str(args.lookups)]
+            if args.lexical:
+                command.append("--lexical")
+            output = subprocess.run(command, cwd=ROOT, env=env, check=True,
+                                    capture_output=True, text=True).stdout
+            results[mode] = json.loads(output.splitlines()[-1])
+            print(mode, results[mode], flush=True)
+
+    print(json.dumps(results, indent=2))
+    if args.save:
+        RESULTS.parent.mkdir(parents=True, exist_ok=True)
+        RESULTS.write_text(json.dumps(results, indent=2) + "\n")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,183 @@
+"""Chat-turn write benchmark: legacy SQLite setup vs WAL + one transaction.
+
+    python -m benchmarks.db_writes [--writers 8] [--turns 200] [--save]
+
+Each writer thread owns a conversation and stores `--turns` chat turns
+(user message, assistant reply, title update) as fast as it can, the way
+`send_message` does. Modes:
+
+- legacy: the previous engine (rollback journal, synchronous=FULL) with
+  three commits per turn
+- wal_three_commits: the tuned engine, still three commits per turn
+- wal_single_txn: the tuned engine with the whole turn in one commit
+- async_single_txn: the same through an async session (aiosqlite), with
+  the writers as asyncio tasks
+
+Reports turns/s, per-turn latency and how many turns failed with
+"database is locked". `--save` writes benchmarks/results/db_writes.json.
+"""
+import json
+import time
+import asyncio
+import argparse
+import tempfile
+import statistics
+import threading
+from pathlib import Path
+from sqlalchemy import create_engine
+from sqlalchemy.exc import OperationalError
+from sqlalchemy.orm import sessionmaker
+from app.config.classes import DatabaseConfig
+from app.controller.chatbot_routes import _add_turn
+from app.models import db_model as m
+from app.services.db_connection import build_async_engine, build_engine
+
+ROOT = Path(__file__).resolve().parents[1]
+RESULTS = ROOT / "benchmarks" / "results" / "db_writes.json"
+
+REPLY = "Here are the best titles related to your request: " * 8
+
+
+def legacy_turn(db, conv, content: str, reply: str):
+    db.add(m.Message(conversation_id=conv.id, role="user", content=content))
+    db.commit()
+    db.add(m.Message(conversation_id=conv.id,
+                     role="assistant",
+                     content=reply))
+    db.commit()
+    conv.title = content
+    db.commit()
+
+
+def single_turn(db, conv, content: str, reply: str):
+    conv.title = "New conversation"
+    _add_turn(db, conv, content, reply)
+    db.commit()
+
+
+def seed(engine, writers: int) -> list[int]:
+    m.Base.metadata.create_all(bind=engine)
+    with sessionmaker(bind=engine)() as db:
+        user = m.User(username="bench", hashed_password="x")
+        db.add(user)
+        db.flush()
+        conversations = [m.Conversation(user_id=user.id,
+                                        title="New conversation")
+                         for _ in range(writers)]
+        db.add_all(conversations)
+        db.commit()
+        return [conv.id for conv in conversations]
+
+
+def summarize(latencies: list[float], failed: int, elapsed: float) -> dict:
+    latencies.sort()
+    return {"turns_per_s": round(len(latencies) / elapsed, 1),
+            "p50_ms": round(statistics.median(latencies), 2),
+            "p95_ms": round(latencies[int(len(latencies) * 0.95) - 1], 2),
+            "locked_errors": failed}
+
+
+def run_threads(engine, turn, writers: int, turns: int) -> dict:
+    conversation_ids = seed(engine, writers)
+    sessions = sessionmaker(bind=engine, autocommit=False, autoflush=False)
+    latencies, failed = [], [0]
+    lock = threading.Lock()
+
+    def writer(conversation_id: int):
+        with sessions() as db:
+            conv = db.get(m.Conversation, conversation_id)
+            for i in range(turns):
+                started = time.perf_counter()
+                try:
+                    turn(db, conv, f"turn {i}", REPLY)
+                except OperationalError:
+                    db.rollback()
+                    with lock:
+                        failed[0] += 1
+                    continue
+                elapsed = (time.perf_counter() - started) * 1000
+                with lock:
+                    latencies.append(elapsed)
+
+    threads = [threading.Thread(target=writer, args=(conversation_id,))
+               for conversation_id in conversation_ids]
+    started = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return summarize(latencies, failed[0], time.perf_counter() - started)
+
+
+async def run_tasks(config: DatabaseConfig, writers: int, turns: int) -> dict:
+    from sqlalchemy.ext.asyncio import async_sessionmaker
+
+    conversation_ids = seed(build_engine(config), writers)
+    engine = build_async_engine(config)
+    sessions = async_sessionmaker(bind=engine, autoflush=False,
+                                  expire_on_commit=False)
+    latencies, failed = [], 0
+
+    async def writer(conversation_id: int):
+        nonlocal failed
+        async with sessions() as db:
+            conv = await db.get(m.Conversation, conversation_id)
+            for i in range(turns):
+                started = time.perf_counter()
+                try:
+                    conv.title = "New conversation"
+                    _add_turn(db, conv, f"turn {i}", REPLY)
+                    await db.commit()
+                except OperationalError:
+                    await db.rollback()
+                    failed += 1
+                    continue
+                latencies.append((time.perf_counter() - started) * 1000)
+
+    started = time.perf_counter()
+    await asyncio.gather(*(writer(conversation_id)
+                           for conversation_id in conversation_ids))
+    elapsed = time.perf_counter() - started
+    await engine.dispose()
+    return summarize(latencies, failed, elapsed)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--writers", type=int, default=8)
+    parser.add_argument("--turns", type=int, default=200)
+    parser.add_argument("--save", action="store_true")
+    args = parser.parse_args()
+
+    report = {}
+    with tempfile.TemporaryDirectory() as tmp:
+        def url(name: str) -> str:
+            return f"sqlite:///{Path(tmp) / name}.db"
+
+        legacy = create_engine(url("legacy"),
+                               connect_args={"check_same_thread": False})
+        report["legacy"] = run_threads(legacy, legacy_turn,
+                                       args.writers, args.turns)
+        report["wal_three_commits"] = run_threads(
+            build_engine(DatabaseConfig(url=url("wal_three_commits"))),
+            legacy_turn, args.writers, args.turns)
+        report["wal_single_txn"] = run_threads(
+            build_engine(DatabaseConfig(url=url("wal_single_txn"))),
+            single_turn, args.writers, args.turns)
+        report["async_single_txn"] = asyncio.run(run_tasks(
+            DatabaseConfig(url=url("async_single_txn")),
+            args.writers, args.turns))
+        for mode, result in report.items():
+            print(mode, result, flush=True)
+
+    results = {"writers": args.writers,
+               "turns_per_writer": args.turns,
+               "modes": report}
+    print(json.dumps(results, indent=2))
+    if args.save:
+        RESULTS.parent.mkdir(parents=True, exist_ok=True)
+        RESULTS.write_text(json.dumps(results, indent=2) + "\n")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,368 @@
+"""Local OpenAI-compatible stand-in for benchmarks.
+
+    python -m benchmarks.fake_openai --port 8765 --latency 0.05
+
+then point the app at it with OPENAI_BASE_URL=http://127.0.0.1:8765/v1.
+Serves chat completions (plain or streamed, with `--tool-calls` a
+search-then-summary tool chain for messages that mention books),
+embeddings, transcriptions, speech and image generations.
+"""
+import re
+import sys
+import json
+import time
+import base64
+import random
+import socket
+import hashlib
+import argparse
+import threading
+import subprocess
+import numpy as np
+from functools import lru_cache
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+FAKE_MP3 = b"ID3" + bytes(16 * 1024)
+FAKE_PNG = b"\x89PNG\r\n\x1a\n" + bytes(1024)
+
+
+class FakeOpenAI:
+    def __init__(self,
+                 latency: float = 0.0,
+                 jitter: float = 0.0,
+                 dimensions: int = 256,
+                 rate_limit: float | None = None,
+                 bag_of_words: bool = False,
+                 recall: bool = False,
+                 endpoint_latency: dict[str, float] | None = None,
+                 tool_calls: bool = False,
+                 failures: dict[str, int] | None = None):
+        self.latency = latency
+        self.jitter = jitter
+        self.dimensions = dimensions
+        self.rate_limit = rate_limit
+        self.bag_of_words = bag_of_words
+        self.recall = recall
+        self.endpoint_latency = endpoint_latency or {}
+        self.tool_calls = tool_calls
+        self.failures = dict(failures or {})
+        self.requests = 0
+        self.throttled = 0
+        self.endpoints: dict[str, int] = {}
+        self._lock = threading.Lock()
+        self._window_start = time.monotonic()
+        self._window_count = 0
+
+    def fail(self, endpoint: str) -> bool:
+        with self._lock:
+            if self.failures.get(endpoint, 0) <= 0:
+                return False
+            self.failures[endpoint] -= 1
+            return True
+
+    def delay(self, endpoint: str = ""):
+        pause = (self.endpoint_latency.get(endpoint, self.latency)
+                 + random.uniform(0.0, self.jitter))
+        if pause > 0:
+            time.sleep(pause)
+
+    def admit(self, endpoint: str = "") -> bool:
+        with self._lock:
+            self.requests += 1
+            self.endpoints[endpoint] = self.endpoints.get(endpoint, 0) + 1
+            if self.rate_limit is None:
+                return True
+            now = time.monotonic()
+            if now - self._window_start >= 1.0:
+                self._window_start, self._window_count = now, 0
+            self._window_count += 1
+            if self._window_count > self.rate_limit:
+                self.throttled += 1
+                return False
+            return True
+
+    @lru_cache(maxsize=65536)
+    def random_vector(self, text: str) -> np.ndarray:
+        seed = int.from_bytes(hashlib.sha256(text.encode()).digest()[:8])
+        return np.random.default_rng(seed).standard_normal(
+            self.dimensions, dtype=np.float32)
+
+    def vector(self, text: str) -> np.ndarray:
+        if not self.bag_of_words:
+            return self.random_vector(text)
+        # Sum of per-word vectors: texts sharing words end up close, which
+        # is enough of a "semantic" signal to compare retrieval strategies.
+        words = re.findall(r"\w+", text.casefold())
+        if not words:
+            return self.random_vector(text)
+        return np.sum([self.random_vector(word) for word in words], axis=0)
+
+    def embeddings(self, body: dict) -> dict:
+        inputs = body["input"]
+        inputs = inputs if isinstance(inputs, list) else [inputs]
+        as_base64 = body.get("encoding_format") == "base64"
+        data = []
+        for i, text in enumerate(inputs):
+            vector = self.vector(str(text))
+            data.append({"object": "embedding",
+                         "index": i,
+                         "embedding": (base64.b64encode(vector.tobytes())
+                                       .decode() if as_base64
+                                       else vector.tolist())})
+        return {"object": "list",
+                "model": body.get("model", "fake"),
+                "data": data,
+                "usage": {"prompt_tokens": len(inputs),
+                          "total_tokens": len(inputs)}}
+
+    def chat_reply(self, body: dict) -> str:
+        last = body["messages"][-1]
+        if last.get("role") == "tool":
+            return f"From the library: {str(last.get('content'))[:80]}"
+        reply = f"Fake reply to: {str(last.get('content'))[:80]}"
+        if self.recall:
+            # Lets a client check which chat history reached the model.
+            earlier = sum(message.get("role") == "user"
+                          for message in body["messages"][:-1])
+            reply += f" (earlier user messages: {earlier})"
+        return reply
+
+    def tool_call(self, body: dict) -> dict | None:
+        # The same chain a real model tends to pick: search the library,
+        # then fetch the summary of the first title found.
+        if not self.tool_calls or not body.get("tools"):
+            return None
+        messages = body["messages"]
+        last = messages[-1]
+        if last.get("role") == "user":
+            if "book" not in str(last.get("content")).casefold():
+                return None
+            name, arguments = "search_relevant_books", {
+                "query": last["content"]}
+        elif last.get("role") == "tool":
+            previous = (messages[-2].get("tool_calls") or [{}])[0]
+            if previous.get("function", {}).get("name") != (
+                    "search_relevant_books"):
+                return None
+            titles = str(last.get("content")).splitlines()
+            if not titles:
+                return None
+            name, arguments = "get_summary_by_title", {"title": titles[0]}
+        else:
+            return None
+        return {"id": f"call_{len(messages)}",
+                "type": "function",
+                "function": {"name": name,
+                             "arguments": json.dumps(arguments)}}
+
+    def chat_completion(self, body: dict) -> dict:
+        call = self.tool_call(body)
+        message = ({"role": "assistant", "content": None,
+                    "tool_calls": [call]} if call
+                   else {"role": "assistant",
+                         "content": self.chat_reply(body)})
+        return {"id": "chatcmpl-fake",
+                "object": "chat.completion",
+                "created": int(time.time()),
+                "model": body.get("model", "fake"),
+                "choices": [{"index": 0,
+                             "message": message,
+                             "finish_reason": ("tool_calls" if call
+                                               else "stop")}],
+                "usage": {"prompt_tokens": 10,
+                          "completion_tokens": 10,
+                          "total_tokens": 20}}
+
+    def chat_chunks(self, body: dict):
+        base = {"id": "chatcmpl-fake",
+                "object": "chat.completion.chunk",
+                "created": int(time.time()),
+                "model": body.get("model", "fake")}
+        call = self.tool_call(body)
+        if call:
+            yield dict(base, choices=[{"index": 0,
+                                       "delta": {"role": "assistant",
+                                                 "tool_calls": [
+                                                     dict(call, index=0)]},
+                                       "finish_reason": None}])
+            yield dict(base, choices=[{"index": 0,
+                                       "delta": {},
+                                       "finish_reason": "tool_calls"}])
+            yield from self.usage_chunk(body, base)
+            return
+        for word in self.chat_reply(body).split(" "):
+            yield dict(base, choices=[{"index": 0,
+                                       "delta": {"role": "assistant",
+                                                 "content": word + " "},
+                                       "finish_reason": None}])
+        yield dict(base, choices=[{"index": 0,
+                                   "delta": {},
+                                   "finish_reason": "stop"}])
+        yield from self.usage_chunk(body, base)
+
+    def usage_chunk(self, body: dict, base: dict):
+        if (body.get("stream_options") or {}).get("include_usage"):
+            yield dict(base, choices=[],
+                       usage={"prompt_tokens": 10,
+                              "completion_tokens": 10,
+                              "total_tokens": 20})
+
+    def transcription(self, raw: bytes) -> tuple[bytes, str]:
+        text = f"Fake transcript of {len(raw)} bytes"
+        if b'name="response_format"\r\n\r\ntext' in raw:
+            return text.encode(), "text/plain"
+        return json.dumps({"text": text}).encode(), "application/json"
+
+    def image(self) -> dict:
+        return {"created": int(time.time()),
+                "data": [{"b64_json": base64.b64encode(FAKE_PNG).decode()}]}
+
+    def handler(self):
+        fake = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+
+            def log_message(self, *args):
+                pass
+
+            def reply(self, status: int, body: bytes,
+                      content_type: str = "application/json",
+                      headers: dict | None = None):
+                self.send_response(status)
+                self.send_header("Content-Type", content_type)
+                self.send_header("Content-Length", str(len(body)))
+                for name, value in (headers or {}).items():
+                    self.send_header(name, value)
+                self.end_headers()
+                self.wfile.write(body)
+
+            def reply_json(self, status: int, payload: dict, **kwargs):
+                self.reply(status, json.dumps(payload).encode(), **kwargs)
+
+            def reply_events(self, events):
+                self.send_response(200)
+                self.send_header("Content-Type", "text/event-stream")
+                self.send_header("Transfer-Encoding", "chunked")
+                self.end_headers()
+                frames = [f"data: {json.dumps(event)}\n\n".encode()
+                          for event in events] + [b"data: [DONE]\n\n"]
+                for frame in frames:
+                    self.wfile.write(b"%x\r\n%s\r\n" % (len(frame), frame))
+                self.wfile.write(b"0\r\n\r\n")
+
+            def do_GET(self):
+                # Request counts, for benchmarks that count upstream calls.
+                if self.path.endswith("/_stats"):
+                    with fake._lock:
+                        self.reply_json(200, {
+                            "requests": fake.requests,
+                            "throttled": fake.throttled,
+                            "endpoints": dict(fake.endpoints)})
+                else:
+                    self.reply_json(404, {"error": {"message": "Not found"}})
+
+            def do_POST(self):
+                raw = self.rfile.read(int(self.headers.get("Content-Length")
+                                          or 0))
+                endpoint = self.path.rsplit("/v1/", 1)[-1]
+                if not fake.admit(endpoint):
+                    self.reply_json(429,
+                                    {"error": {"message": "Rate limited",
+                                               "type": "rate_limit"}},
+                                    headers={"Retry-After": "1"})
+                    return
+                fake.delay(endpoint)
+                if fake.fail(endpoint):
+                    # Not retried by the client, so a test stays fast.
+                    self.reply_json(400,
+                                    {"error": {"message": "Fake failure",
+                                               "type": "invalid_request"}})
+                    return
+                if self.path.endswith("/embeddings"):
+                    self.reply_json(200, fake.embeddings(json.loads(raw)))
+                elif self.path.endswith("/chat/completions"):
+                    body = json.loads(raw)
+                    if body.get("stream"):
+                        self.reply_events(fake.chat_chunks(body))
+                    else:
+                        self.reply_json(200, fake.chat_completion(body))
+                elif self.path.endswith("/audio/transcriptions"):
+                    body, content_type = fake.transcription(raw)
+                    self.reply(200, body, content_type=content_type)
+                elif self.path.endswith("/audio/speech"):
+                    self.reply(200, FAKE_MP3, content_type="audio/mpeg")
+                elif self.path.endswith("/images/generations"):
+                    self.reply_json(200, fake.image())
+                else:
+                    self.reply_json(404, {"error": {"message": "Not found"}})
+
+        return Handler
+
+    def start(self, port: int = 0) -> tuple[ThreadingHTTPServer, str]:
+        server = ThreadingHTTPServer(("127.0.0.1", port), self.handler())
+        server.daemon_threads = True
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+        return server, f"http://127.0.0.1:{server.server_address[1]}/v1"
+
+
+def spawn(*args: str) -> tuple[subprocess.Popen, str]:
+    with socket.socket() as probe:
+        probe.bind(("127.0.0.1", 0))
+        port = probe.getsockname()[1]
+    process = subprocess.Popen(
+        [sys.executable, "-m", "benchmarks.fake_openai",
+         "--port", str(port), *args],
+        stdout=subprocess.DEVNULL)
+    for _ in range(100):
+        try:
+            socket.create_connection(("127.0.0.1", port), timeout=0.1).close()
+            break
+        except OSError:
+            time.sleep(0.05)
+    return process, f"http://127.0.0.1:{port}/v1"
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--latency", type=float, default=0.0)
+    parser.add_argument("--jitter", type=float, default=0.0)
+    parser.add_argument("--dimensions", type=int, default=256)
+    parser.add_argument("--rate-limit", type=float, default=None,
+                        help="requests per second before answering 429")
+    parser.add_argument("--bag-of-words", action="store_true",
+                        help="embed texts as sums of per-word vectors")
+    parser.add_argument("--recall", action="store_true",
+                        help="say how many earlier user messages a chat "
+                             "request carried")
+    parser.add_argument("--endpoint-latency", action="append", default=[],
+                        metavar="PATH=SECONDS",
+                        help="latency for one endpoint, e.g. "
+                             "audio/transcriptions=2.0 (repeatable)")
+    parser.add_argument("--tool-calls", action="store_true",
+                        help="answer messages mentioning books with a "
+                             "search_relevant_books -> get_summary_by_title "
+                             "tool chain")
+    parser.add_argument("--fail-endpoint", action="append", default=[],
+                        metavar="PATH=COUNT",
+                        help="answer the first COUNT requests to one "
+                             "endpoint with 400, e.g. embeddings=3 "
+                             "(repeatable)")
+    args = parser.parse_args()
+
+    failures = {path: int(count) for path, count in
+                (item.split("=", 1) for item in args.fail_endpoint)}
+    endpoint_latency = {path: float(seconds) for path, seconds in
+                        (item.split("=", 1)
+                         for item in args.endpoint_latency)}
+    fake = FakeOpenAI(args.latency, args.jitter, args.dimensions,
+                      args.rate_limit, args.bag_of_words, args.recall,
+                      endpoint_latency, args.tool_calls, failures)
+    server = ThreadingHTTPServer(("127.0.0.1", args.port), fake.handler())
+    print(f"Fake OpenAI listening on http://127.0.0.1:{args.port}/v1")
+    server.serve_forever()
+
+
+if __name__ == "__main__":
+    main()
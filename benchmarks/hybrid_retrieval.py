@@ -0,0 +1,179 @@
+"""Retrieval benchmark: vector-only vs hybrid BM25 + vector search.
+
+    python -m benchmarks.hybrid_retrieval [--latency 0.05] [--save]
+
+Runs a labelled set of title, entity, thematic and one-word topic
+queries (the last with several relevant titles each) against the
+bundled catalog in three modes: the vector-only path, hybrid reciprocal
+rank fusion, and hybrid with the lexical fast path. It reports latency,
+hit@1, recall@3, recall@5, how often a full list of five titles came
+back, MRR and how many queries skipped the embedding call.
+Embeddings come from the fake OpenAI server in bag-of-words mode (with
+`--latency` standing in for the API round trip) and the embedding cache
+is disabled, so every vector query pays the round trip.
+`--save` writes benchmarks/results/hybrid_retrieval.json.
+"""
+import os
+import sys
+import json
+import time
+import argparse
+import statistics
+import subprocess
+import tempfile
+from pathlib import Path
+from benchmarks.fake_openai import spawn
+from benchmarks.startup import make_sandbox
+
+ROOT = Path(__file__).resolve().parents[1]
+RESULTS = ROOT / "benchmarks" / "results" / "hybrid_retrieval.json"
+
+QUERIES = [
+    ("title", "The Hobbit", ["The Hobbit"]),
+    ("title", "tell me about Frankenstein", ["Frankenstein"]),
+    ("title", "the catcher in the rye", ["The Catcher in the Rye"]),
+    ("title", "Life of Pi summary", ["Life of Pi"]),
+    ("title", "Animal Farm", ["Animal Farm"]),
+    ("title", "1984", ["1984"]),
+    ("title", "brave new world", ["Brave New World"]),
+    ("entity", "Gandalf and the dragon Smaug", ["The Hobbit"]),
+    ("entity", "Holden Caulfield", ["The Catcher in the Rye"]),
+    ("entity", "Atticus Finch", ["To Kill a Mockingbird"]),
+    ("entity", "Bengal tiger Richard Parker", ["Life of Pi"]),
+    ("entity", "Santiago the shepherd", ["The Alchemist"]),
+    ("entity", "Big Brother", ["1984"]),
+    ("entity", "Orwell", ["1984", "Animal Farm"]),
+    ("entity", "Aldous Huxley", ["Brave New World"]),
+    ("entity", "Harper Lee", ["To Kill a Mockingbird"]),
+    ("entity", "Coelho", ["The Alchemist"]),
+    ("theme", "fantasy adventure with magic", ["The Hobbit"]),
+    ("theme", "dystopian surveillance", ["1984", "Brave New World"]),
+    ("theme", "books about rebellion",
+     ["1984", "Animal Farm", "Brave New World"]),
+    ("theme", "survival stories at sea", ["Life of Pi"]),
+    ("theme", "a story about loneliness and love",
+     ["The Little Prince", "The Catcher in the Rye"]),
+    ("theme", "racial injustice in the south", ["To Kill a Mockingbird"]),
+    ("theme", "teenage alienation and identity",
+     ["The Catcher in the Rye"]),
+    ("theme", "following your dreams and destiny", ["The Alchemist"]),
+    ("theme", "totalitarian control and freedom",
+     ["1984", "Brave New World"]),
+    ("theme", "political corruption allegory", ["Animal Farm"]),
+    ("theme", "scientific ambition gone wrong", ["Frankenstein"]),
+    ("theme", "innocence and discovery", ["The Little Prince"]),
+    ("topic", "fantasy",
+     ["The Hobbit", "The Little Prince", "The Alchemist"]),
+    ("topic", "magic", ["The Hobbit", "The Alchemist", "The Little Prince"]),
+    ("topic", "adventure", ["The Hobbit", "Life of Pi", "The Alchemist"]),
+    ("topic", "friendship",
+     ["The Hobbit", "The Little Prince", "Life of Pi"]),
+    ("topic", "dystopian", ["1984", "Brave New World", "Animal Farm"]),
+    ("topic", "totalitarian", ["1984", "Brave New World", "Animal Farm"]),
+    ("topic", "coming of age",
+     ["The Catcher in the Rye", "To Kill a Mockingbird",
+      "The Little Prince"]),
+]
+
+MODES = {
+    "vector": {"mode": "vector"},
+    "hybrid": {"mode": "hybrid", "fast_path": False},
+    "hybrid_fast_path": {"mode": "hybrid", "fast_path": True},
+}
+
+
+def score(ranked: list[str], relevant: list[str]) -> dict:
+    rank = next((i for i, title in enumerate(ranked, 1)
+                 if title in relevant), None)
+    return {"hit@1": float(rank == 1),
+            "recall@3": (len(set(ranked[:3]) & set(relevant))
+                         / min(len(relevant), 3)),
+            "recall@5": (len(set(ranked[:5]) & set(relevant))
+                         / min(len(relevant), 5)),
+            "full_list": float(len(ranked) >= 5),
+            "mrr": 1.0 / rank if rank else 0.0}
+
+
+def worker(rounds: int):
+    from app.config.classes import RetrievalConfig
+    from app.utils.lexical import lexical_index
+    from app.utils.retriever import get_backend, search_books
+
+    get_backend()
+    lexical_index.refresh()
+    report = {}
+    for name, overrides in MODES.items():
+        config = RetrievalConfig(**overrides)
+        latencies, metrics, skipped = [], {"all": {}}, 0
+        for kind, query, relevant in QUERIES:
+            for _ in range(rounds):
+                started = time.perf_counter()
+                docs = search_books(query, 5, config)
+                latencies.append((time.perf_counter() - started) * 1000)
+            ranked = [doc.metadata["title"] for doc in docs]
+            for metric, value in score(ranked, relevant).items():
+                metrics.setdefault(kind, {}).setdefault(metric, []).append(
+                    value)
+                metrics.setdefault("all", {}).setdefault(metric, []).append(
+                    value)
+            if config.mode == "hybrid" and config.fast_path:
+                hits = lexical_index.search(query, config.candidates)
+                skipped += (len(hits) >= 5 and lexical_index.is_strong(
+                    query, hits, config.fast_path_margin))
+        report[name] = {
+            "latency_ms": {"mean": round(statistics.fmean(latencies), 2),
+                           "p50": round(statistics.median(latencies), 2)},
+            "embedding_calls_skipped": f"{skipped}/{len(QUERIES)}",
+            "quality": {kind: {metric: round(statistics.fmean(values), 3)
+                               for metric, values in values_by.items()}
+                        for kind, values_by in metrics.items()},
+        }
+    print(json.dumps(report))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--latency", type=float, default=0.05)
+    parser.add_argument("--rounds", type=int, default=3)
+    parser.add_argument("--save", action="store_true")
+    parser.add_argument("--worker", action="store_true",
+                        help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.worker:
+        worker(args.rounds)
+        return
+
+    fake, base_url = spawn("--dimensions", "256", "--bag-of-words",
+                           "--latency", str(args.latency))
+    env = dict(os.environ,
+               OPENAI_API_KEY="sk-fake",
+               OPENAI_BASE_URL=base_url,
+               EMBEDDING_CACHE_ENABLED="false",
+               PYTHONPATH=os.pathsep.join(
+                   filter(None, [str(ROOT), os.environ.get("PYTHONPATH")])))
+    try:
+        with tempfile.TemporaryDirectory() as tmp:
+            cwd = make_sandbox(Path(tmp))
+            result = subprocess.run(
+                [sys.executable, "-m", "benchmarks.hybrid_retrieval",
+                 "--worker", "--rounds", str(args.rounds)],
+                cwd=cwd, env=env, capture_output=True, text=True)
+            if result.returncode:
+                sys.exit(result.stderr)
+    finally:
+        fake.terminate()
+
+    results = {"embedding_latency_s": args.latency,
+               "catalog_size": len(json.loads(
+                   (ROOT / "data" / "book_summaries.json").read_text())),
+               "queries": len(QUERIES),
+               "modes": json.loads(result.stdout.splitlines()[-1])}
+    print(json.dumps(results, indent=2))
+    if args.save:
+        RESULTS.parent.mkdir(parents=True, exist_ok=True)
+        RESULTS.write_text(json.dumps(results, indent=2) + "\n")
+
+
+if __name__ == "__main__":
+    main()
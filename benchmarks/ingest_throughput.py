@@ -0,0 +1,91 @@
+"""Ingestion throughput (docs/sec) against the local fake embedding server.
+
+    python -m benchmarks.ingest_throughput [--save]
+
+Embeds a synthetic catalog into a fresh Chroma collection for several
+batch size / concurrency settings, then re-runs the sync with 90% of
+the summaries changed and 100 books removed. `--save` writes
+benchmarks/results/ingest_throughput.json.
+"""
+import json
+import argparse
+import tempfile
+from pathlib import Path
+import chromadb
+from langchain_openai import OpenAIEmbeddings
+from app.utils.ingest import COLLECTION_NAME, sync_catalog
+from benchmarks.fake_openai import spawn
+
+ROOT = Path(__file__).resolve().parents[1]
+RESULTS = ROOT / "benchmarks" / "results" / "ingest_throughput.json"
+
+DOCS = 5000
+LATENCY = 0.05
+SETTINGS = ((16, 1), (64, 1), (64, 4), (64, 8), (128, 8))
+
+
+def make_books(count: int, revision: int = 0) -> list[dict]:
+    return [{"title": f"Book {i}",
+             "summary": f"Summary {i} revision {revision}: a tale of "
+                        f"courage, loss and discovery number {i}.",
+             "full_summary": "..."}
+            for i in range(count)]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--save", action="store_true")
+    args = parser.parse_args()
+
+    server, base_url = spawn("--latency", str(LATENCY))
+    try:
+        results = run(base_url)
+    finally:
+        server.terminate()
+
+    print(json.dumps(results, indent=2))
+    if args.save:
+        RESULTS.parent.mkdir(parents=True, exist_ok=True)
+        RESULTS.write_text(json.dumps(results, indent=2) + "\n")
+
+
+def run(base_url: str) -> dict:
+    embeddings = OpenAIEmbeddings(model="text-embedding-3-small",
+                                  base_url=base_url,
+                                  api_key="sk-fake",
+                                  check_embedding_ctx_length=False)
+    books = make_books(DOCS)
+    print(f"{DOCS} docs, fake embedding latency {LATENCY * 1000:.0f} ms")
+    results = {"docs": DOCS, "embedding_latency_s": LATENCY, "runs": []}
+    for batch_size, concurrency in SETTINGS:
+        with tempfile.TemporaryDirectory() as tmp:
+            collection = chromadb.PersistentClient(
+                path=tmp).get_or_create_collection(COLLECTION_NAME)
+            report = sync_catalog(books, collection, embeddings,
+                                  batch_size=batch_size,
+                                  concurrency=concurrency)
+            print(f"  batch {batch_size:>4} x {concurrency} workers: "
+                  f"{report['docs_per_sec']:>8.1f} docs/sec "
+                  f"({report['seconds']:.2f}s)")
+
+            changed = books[:DOCS // 10] + make_books(DOCS, 1)[DOCS // 10:]
+            rerun = sync_catalog(changed[:-100], collection, embeddings,
+                                 batch_size=batch_size,
+                                 concurrency=concurrency)
+            print(f"    incremental re-run: embedded {rerun['embedded']}, "
+                  f"deleted {rerun['deleted']}, "
+                  f"unchanged {rerun['unchanged']} "
+                  f"in {rerun['seconds']:.2f}s", flush=True)
+            results["runs"].append({
+                "batch_size": batch_size,
+                "concurrency": concurrency,
+                "docs_per_sec": report["docs_per_sec"],
+                "seconds": report["seconds"],
+                "incremental": {key: rerun[key] for key in
+                                ("embedded", "deleted", "unchanged",
+                                 "seconds")}})
+    return results
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,236 @@
+"""Load test: throughput and tail latency per endpoint, no API credits.
+
+    python -m benchmarks.load_test [--users 40] [--concurrency 8]
+                                   [--turns 3] [--latency 0.2]
+                                   [--jitter 0.1] [--workers 1]
+                                   [--save | --compare [--tolerance 0.25]]
+
+Starts the fake OpenAI server (chat with a search -> summary tool chain
+for prompts mentioning books, embeddings, audio, images; every call
+delayed by `--latency` plus up to `--jitter` seconds) and the app under
+uvicorn on a throwaway database. `--users` virtual users, `--concurrency`
+of them at a time, each register, log in, open a conversation and send
+`--turns` messages, listing their conversations and reloading the
+current one after every reply. Each user keeps one keep-alive
+connection, like a browser tab.
+
+Reports requests, errors, RPS and p50/p95/p99 latency per endpoint and
+overall. `--save` writes the baseline benchmarks/results/load_test.json;
+`--compare` runs with the baseline's settings and exits non-zero when an
+endpoint's p95 or the overall RPS is worse than the baseline by more
+than `--tolerance`. Baselines are only comparable on the same machine.
+"""
+import os
+import sys
+import json
+import time
+import socket
+import argparse
+import tempfile
+import threading
+import statistics
+import subprocess
+import http.client
+from pathlib import Path
+from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor
+from benchmarks.fake_openai import spawn
+from benchmarks.startup import make_sandbox, wait_for
+
+ROOT = Path(__file__).resolve().parents[1]
+RESULTS = ROOT / "benchmarks" / "results" / "load_test.json"
+
+PROMPTS = ("Can you recommend a fantasy book about friendship?",
+           "Hello, what can you help me with?",
+           "Which book should I read about war and survival?",
+           "Thanks, tell me more about the last one.")
+
+
+class Recorder:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.latencies = defaultdict(list)
+        self.errors = defaultdict(int)
+
+    def add(self, endpoint: str, ms: float, ok: bool):
+        with self._lock:
+            self.latencies[endpoint].append(ms)
+            if not ok:
+                self.errors[endpoint] += 1
+
+
+class VirtualUser:
+    def __init__(self, port: int, recorder: Recorder):
+        self.connection = http.client.HTTPConnection("127.0.0.1", port,
+                                                     timeout=120)
+        self.recorder = recorder
+        self.token = None
+
+    def call(self, endpoint: str, method: str, path: str,
+             body: dict | None = None):
+        headers = {"Content-Type": "application/json"}
+        if self.token:
+            headers["Authorization"] = f"Bearer {self.token}"
+        started = time.perf_counter()
+        try:
+            self.connection.request(
+                method, path,
+                body=json.dumps(body) if body is not None else None,
+                headers=headers)
+            response = self.connection.getresponse()
+            payload = response.read()
+            ok = response.status < 400
+        except (OSError, http.client.HTTPException):
+            self.connection.close()
+            payload, ok = b"", False
+        self.recorder.add(endpoint, (time.perf_counter() - started) * 1000,
+                          ok)
+        return json.loads(payload) if ok and payload else None
+
+    def session(self, index: int, turns: int):
+        credentials = {"username": f"load{index}", "password": "load-test"}
+        self.call("POST /register", "POST", "/register", credentials)
+        login = self.call("POST /login", "POST", "/login", credentials)
+        if not login:
+            return
+        self.token = login["access_token"]
+        conv = self.call("POST /conversations", "POST", "/conversations",
+                         {})
+        if not conv:
+            return
+        for turn in range(turns):
+            self.call("POST /conversations/{id}/messages", "POST",
+                      f"/conversations/{conv['id']}/messages",
+                      {"content": PROMPTS[(index + turn) % len(PROMPTS)]})
+            self.call("GET /conversations", "GET", "/conversations")
+            self.call("GET /conversations/{id}", "GET",
+                      f"/conversations/{conv['id']}")
+        self.connection.close()
+
+
+def summary(latencies: list[float], errors: int, seconds: float) -> dict:
+    latencies = sorted(latencies)
+
+    def percentile(share: float) -> float:
+        return round(latencies[max(0, int(len(latencies) * share) - 1)], 1)
+
+    return {"requests": len(latencies),
+            "errors": errors,
+            "rps": round(len(latencies) / seconds, 1),
+            "mean_ms": round(statistics.fmean(latencies), 1),
+            "p50_ms": round(statistics.median(latencies), 1),
+            "p95_ms": percentile(0.95),
+            "p99_ms": percentile(0.99)}
+
+
+def run(cwd: Path, env: dict, settings: dict) -> dict:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        port = sock.getsockname()[1]
+    server = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "app.main:app",
+         "--port", str(port), "--log-level", "warning",
+         "--workers", str(settings["workers"])],
+        cwd=cwd, env=env)
+    try:
+        if not wait_for(f"http://127.0.0.1:{port}/readyz",
+                        time.monotonic() + 120):
+            raise RuntimeError("server never became ready")
+        recorder = Recorder()
+        started = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=settings["concurrency"]) as pool:
+            for future in [pool.submit(VirtualUser(port, recorder).session,
+                                       index, settings["turns"])
+                           for index in range(settings["users"])]:
+                future.result()
+        seconds = time.perf_counter() - started
+    finally:
+        server.terminate()
+        server.wait()
+
+    endpoints = {endpoint: summary(latencies, recorder.errors[endpoint],
+                                   seconds)
+                 for endpoint, latencies in recorder.latencies.items()}
+    overall = summary([ms for latencies in recorder.latencies.values()
+                       for ms in latencies],
+                      sum(recorder.errors.values()), seconds)
+    return {"settings": settings,
+            "seconds": round(seconds, 2),
+            "overall": overall,
+            "endpoints": endpoints}
+
+
+def regressions(baseline: dict, results: dict, tolerance: float) -> list:
+    found = []
+    for endpoint, before in baseline["endpoints"].items():
+        after = results["endpoints"].get(endpoint)
+        if after is None:
+            found.append(f"{endpoint}: no requests")
+            continue
+        ratio = after["p95_ms"] / max(before["p95_ms"], 0.1)
+        print(f"{endpoint:36} p95 {before['p95_ms']:8.1f} -> "
+              f"{after['p95_ms']:8.1f} ms ({ratio:4.2f}x)")
+        if ratio > 1 + tolerance:
+            found.append(f"{endpoint}: p95 {ratio:.2f}x the baseline")
+        if after["errors"] > before["errors"]:
+            found.append(f"{endpoint}: {after['errors']} errors")
+    ratio = results["overall"]["rps"] / baseline["overall"]["rps"]
+    print(f"{'overall':36} rps {baseline['overall']['rps']:8.1f} -> "
+          f"{results['overall']['rps']:8.1f} ({ratio:4.2f}x)")
+    if ratio < 1 - tolerance:
+        found.append(f"overall: {ratio:.2f}x the baseline throughput")
+    return found
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--users", type=int, default=40)
+    parser.add_argument("--concurrency", type=int, default=8)
+    parser.add_argument("--turns", type=int, default=3)
+    parser.add_argument("--latency", type=float, default=0.2)
+    parser.add_argument("--jitter", type=float, default=0.1)
+    parser.add_argument("--workers", type=int, default=1)
+    parser.add_argument("--tolerance", type=float, default=0.25)
+    mode = parser.add_mutually_exclusive_group()
+    mode.add_argument("--save", action="store_true")
+    mode.add_argument("--compare", action="store_true")
+    args = parser.parse_args()
+
+    baseline = None
+    settings = {"users": args.users,
+                "concurrency": args.concurrency,
+                "turns": args.turns,
+                "latency": args.latency,
+                "jitter": args.jitter,
+                "workers": args.workers}
+    if args.compare:
+        baseline = json.loads(RESULTS.read_text())
+        settings = baseline["settings"]
+
+    fake, base_url = spawn("--tool-calls",
+                           "--latency", str(settings["latency"]),
+                           "--jitter", str(settings["jitter"]))
+    env = dict(os.environ,
+               OPENAI_API_KEY="sk-fake",
+               OPENAI_BASE_URL=base_url,
+               SECRET_KEY="load-test")
+    try:
+        with tempfile.TemporaryDirectory() as tmp:
+            cwd = make_sandbox(Path(tmp))
+            env["DATABASE_URL"] = f"sqlite:///{cwd / 'load.db'}"
+            results = run(cwd, env, settings)
+    finally:
+        fake.terminate()
+
+    print(json.dumps(results, indent=2))
+    if args.save:
+        RESULTS.parent.mkdir(parents=True, exist_ok=True)
+        RESULTS.write_text(json.dumps(results, indent=2) + "\n")
+    if baseline is not None:
+        found = regressions(baseline, results, args.tolerance)
+        if found:
+            raise SystemExit("regressions:\n  " + "\n  ".join(found))
+
+
+if __name__ == "__main__":
+    main()
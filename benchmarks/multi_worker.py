@@ -0,0 +1,155 @@
+"""Multi-worker check: two app processes serving one conversation.
+
+    python -m benchmarks.multi_worker [--turns 6] [--save]
+
+Starts two uvicorn processes (stand-ins for two workers or two replicas)
+on one shared database, behind the fake OpenAI server in recall mode,
+which states in every reply how many earlier user messages reached the
+model. Turns alternate between the processes, every third one over SSE,
+and the first process is restarted half way through. Each reply must see
+all earlier turns (up to the memory span), whichever process served the
+previous ones. Exits non-zero on the first mismatch. `--save` writes
+benchmarks/results/multi_worker.json.
+"""
+import os
+import re
+import sys
+import json
+import time
+import socket
+import argparse
+import tempfile
+import subprocess
+import urllib.request
+from pathlib import Path
+from benchmarks.fake_openai import spawn
+from benchmarks.startup import make_sandbox, request, wait_for
+
+ROOT = Path(__file__).resolve().parents[1]
+RESULTS = ROOT / "benchmarks" / "results" / "multi_worker.json"
+
+RECALL = re.compile(r"earlier user messages: (\d+)")
+
+
+class Worker:
+    def __init__(self, name: str, cwd: Path, env: dict):
+        self.name = name
+        self.cwd = cwd
+        self.env = env
+        self.process = None
+        with socket.socket() as probe:
+            probe.bind(("127.0.0.1", 0))
+            self.port = probe.getsockname()[1]
+        self.base = f"http://127.0.0.1:{self.port}"
+
+    def start(self):
+        self.process = subprocess.Popen(
+            [sys.executable, "-m", "uvicorn", "app.main:app",
+             "--port", str(self.port), "--log-level", "warning"],
+            cwd=self.cwd, env=self.env)
+        if not wait_for(self.base + "/readyz", time.monotonic() + 120):
+            raise RuntimeError(f"{self.name} never became ready")
+
+    def stop(self):
+        self.process.terminate()
+        self.process.wait()
+
+
+def send(worker: Worker, conversation_id: int, content: str,
+         token: str, stream: bool) -> str:
+    path = f"/conversations/{conversation_id}/messages"
+    if not stream:
+        _, data = request(worker.base + path, {"content": content}, token)
+        return data["messages"][-1]["content"]
+    req = urllib.request.Request(
+        worker.base + path + "/stream",
+        data=json.dumps({"content": content}).encode(),
+        headers={"Content-Type": "application/json",
+                 "Authorization": f"Bearer {token}"})
+    with urllib.request.urlopen(req, timeout=60) as resp:
+        frames = resp.read().decode().split("\n\n")
+    done = next(frame for frame in frames if frame.startswith("event: done"))
+    return json.loads(done.split("data: ", 1)[1])["content"]
+
+
+def run(cwd: Path, env: dict, turns: int, span: int) -> dict:
+    workers = [Worker("worker-a", cwd, env), Worker("worker-b", cwd, env)]
+    # The first worker builds the vector store; the second one starts on
+    # a warm data directory, like an extra replica joining later.
+    for worker in workers:
+        worker.start()
+    log = []
+    try:
+        credentials = {"username": "multi", "password": "worker"}
+        request(workers[0].base + "/register", credentials)
+        _, login = request(workers[1].base + "/login", credentials)
+        token = login["access_token"]
+        _, conv = request(workers[0].base + "/conversations", {}, token)
+
+        for turn in range(turns):
+            if turn == turns // 2:
+                workers[0].stop()
+                workers[0].start()
+            worker = workers[turn % 2]
+            stream = turn % 3 == 2
+            started = time.perf_counter()
+            reply = send(worker, conv["id"], f"question number {turn}",
+                         token, stream)
+            elapsed = (time.perf_counter() - started) * 1000
+            match = RECALL.search(reply)
+            seen = int(match.group(1)) if match else None
+            expected = min(turn, span)
+            log.append({"turn": turn,
+                        "worker": worker.name,
+                        "stream": stream,
+                        "expected_history": expected,
+                        "seen_history": seen,
+                        "ms": round(elapsed, 1)})
+            print(log[-1], flush=True)
+            if seen != expected:
+                raise SystemExit(f"turn {turn} on {worker.name} saw {seen} "
+                                 f"earlier user messages, expected "
+                                 f"{expected}")
+
+        _, data = request(workers[1].base + f"/conversations/{conv['id']}",
+                          token=token)
+        if len(data["messages"]) != 2 * turns:
+            raise SystemExit(f"{len(data['messages'])} messages stored, "
+                             f"expected {2 * turns}")
+    finally:
+        for worker in workers:
+            if worker.process and worker.process.poll() is None:
+                worker.stop()
+    return {"turns": log, "messages_stored": 2 * turns}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--turns", type=int, default=6)
+    parser.add_argument("--save", action="store_true")
+    args = parser.parse_args()
+
+    from app.config.classes import PromptConfig
+    span = PromptConfig().memory_span
+
+    fake, base_url = spawn("--recall")
+    env = dict(os.environ,
+               OPENAI_API_KEY="sk-fake",
+               OPENAI_BASE_URL=base_url,
+               SECRET_KEY="multi-worker")
+    try:
+        with tempfile.TemporaryDirectory() as tmp:
+            cwd = make_sandbox(Path(tmp))
+            env["DATABASE_URL"] = f"sqlite:///{cwd / 'shared.db'}"
+            results = run(cwd, env, args.turns, span)
+    finally:
+        fake.terminate()
+
+    print(json.dumps(results, indent=2))
+    if args.save:
+        RESULTS.parent.mkdir(parents=True, exist_ok=True)
+        RESULTS.write_text(json.dumps(results, indent=2) + "\n")
+
+
+if __name__ == "__main__":
+    main()
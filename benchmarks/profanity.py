@@ -0,0 +1,91 @@
+"""Profanity filter benchmark: legacy token scan vs the compiled matcher.
+
+    python -m benchmarks.profanity [--save]
+
+Times `language_filter` on clean inputs (the worst case: the whole text
+is scanned) and on inputs whose only offending word is at the very end,
+from a sentence up to 1 MB, and lists phrase/diacritic cases the legacy
+check missed. `--save` writes benchmarks/results/profanity.json.
+"""
+import json
+import random
+import argparse
+import timeit
+from pathlib import Path
+from app.config.constants import FORBIDDEN_WORDS
+from app.utils.validators import language_filter
+
+ROOT = Path(__file__).resolve().parents[1]
+RESULTS = ROOT / "benchmarks" / "results" / "profanity.json"
+
+VOCABULARY = ("the a hobbit quest dragon treasure wizard journey library "
+              "book recommend fantasy carte poveste frumoasă călătorie "
+              "dragon-ul prieten, curajos! ce? liniște și pace.").split()
+
+CASES = ["son-of-a-bitch!", "Ești o vacă.",
+         "esti o vaca", "mă-ta", "ma ta", "dobitoca", "TÂMPITĂ!!",
+         "sângele", "shit's"]
+
+
+def legacy_filter(text: str) -> bool:
+    text = text.lower()
+    words = text.split()
+
+    for word in words:
+        clean_word = word.strip(".,!?")
+        if clean_word in FORBIDDEN_WORDS:
+            return True
+    return False
+
+
+def make_text(size: int, seed: int = 3) -> str:
+    rng = random.Random(seed)
+    words, length = [], 0
+    while length < size:
+        word = rng.choice(VOCABULARY)
+        words.append(word)
+        length += len(word) + 1
+    return " ".join(words)
+
+
+def best_ms(function, text: str) -> float:
+    timer = timeit.Timer(lambda: function(text))
+    number, _ = timer.autorange()
+    return min(timer.repeat(repeat=5, number=number)) / number * 1000
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--sizes", type=int, nargs="+",
+                        default=[100, 10_000, 100_000, 1_000_000])
+    parser.add_argument("--save", action="store_true")
+    args = parser.parse_args()
+
+    timings = {}
+    for size in args.sizes:
+        clean = make_text(size)
+        dirty = clean + " idiot"
+        assert not language_filter(clean) and language_filter(dirty)
+        timings[str(size)] = {
+            "clean_legacy_ms": round(best_ms(legacy_filter, clean), 4),
+            "clean_compiled_ms": round(best_ms(language_filter, clean), 4),
+            "match_at_end_legacy_ms": round(best_ms(legacy_filter, dirty),
+                                            4),
+            "match_at_end_compiled_ms": round(
+                best_ms(language_filter, dirty), 4),
+        }
+        print(size, timings[str(size)], flush=True)
+
+    results = {"timings": timings,
+               "coverage": {case: {"legacy": legacy_filter(case),
+                                   "compiled": language_filter(case)}
+                            for case in CASES}}
+    print(json.dumps(results["coverage"], indent=2, ensure_ascii=False))
+    if args.save:
+        RESULTS.parent.mkdir(parents=True, exist_ok=True)
+        RESULTS.write_text(json.dumps(results, indent=2, ensure_ascii=False)
+                           + "\n")
+
+
+if __name__ == "__main__":
+    main()
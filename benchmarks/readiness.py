@@ -0,0 +1,124 @@
+"""Readiness check: a failed catalog sync keeps the pod unready until fixed.
+
+    python -m benchmarks.readiness [--failures 3] [--save]
+
+Starts the app on an empty vector store behind the fake OpenAI server,
+which answers the first `--failures` embedding requests with an error,
+so the warm-up's initial catalog sync fails. /readyz must answer 503
+(naming the vector_backend step) while the sync keeps failing, then 200
+once a retry completes it, after which a topic search must return a
+full list. Exits non-zero otherwise. `--save` writes
+benchmarks/results/readiness.json.
+"""
+import os
+import sys
+import json
+import time
+import socket
+import argparse
+import tempfile
+import subprocess
+import urllib.error
+import urllib.request
+from pathlib import Path
+from benchmarks.fake_openai import spawn
+from benchmarks.startup import make_sandbox, request
+
+ROOT = Path(__file__).resolve().parents[1]
+RESULTS = ROOT / "benchmarks" / "results" / "readiness.json"
+
+
+def readyz(base: str) -> tuple[int, dict] | None:
+    try:
+        with urllib.request.urlopen(base + "/readyz") as resp:
+            return resp.status, json.loads(resp.read())
+    except urllib.error.HTTPError as error:
+        return error.code, json.loads(error.read())
+    except (urllib.error.URLError, ConnectionError):
+        return None
+
+
+def run(cwd: Path, env: dict, timeout: float) -> dict:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        port = sock.getsockname()[1]
+    base = f"http://127.0.0.1:{port}"
+    server = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "app.main:app",
+         "--port", str(port), "--log-level", "critical"],
+        cwd=cwd, env=env, stderr=subprocess.DEVNULL)
+    try:
+        started = time.monotonic()
+        unready, errors = 0, set()
+        while time.monotonic() - started < timeout:
+            state = readyz(base)
+            if state is None:
+                time.sleep(0.05)
+                continue
+            code, body = state
+            if code == 200:
+                break
+            unready += 1
+            if body.get("error"):
+                errors.add(body["error"].split(":", 1)[0])
+            time.sleep(0.1)
+        else:
+            raise SystemExit(f"not ready after {timeout:.0f}s")
+        ready_after = time.monotonic() - started
+
+        credentials = {"username": "ready", "password": "check"}
+        request(base + "/register", credentials)
+        _, login = request(base + "/login", credentials)
+        _, found = request(base + "/search/batch",
+                           {"queries": ["fantasy"], "k": 5},
+                           login["access_token"])
+    finally:
+        server.terminate()
+        server.wait()
+
+    return {"unready_polls": unready,
+            "failed_steps": sorted(errors),
+            "retries": body["retries"],
+            "ready_after_s": round(ready_after, 2),
+            "search_titles": len(found["results"][0]["titles"])}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--failures", type=int, default=3)
+    parser.add_argument("--timeout", type=float, default=60.0)
+    parser.add_argument("--save", action="store_true")
+    args = parser.parse_args()
+
+    fake, base_url = spawn("--fail-endpoint",
+                           f"embeddings={args.failures}")
+    env = dict(os.environ,
+               OPENAI_API_KEY="sk-fake",
+               OPENAI_BASE_URL=base_url,
+               SECRET_KEY="readiness",
+               READINESS_RETRY_INITIAL_SECONDS="0.5",
+               READINESS_RETRY_MAX_SECONDS="2")
+    try:
+        with tempfile.TemporaryDirectory() as tmp:
+            cwd = make_sandbox(Path(tmp))
+            env["DATABASE_URL"] = f"sqlite:///{cwd / 'ready.db'}"
+            results = dict(run(cwd, env, args.timeout),
+                           failures=args.failures)
+    finally:
+        fake.terminate()
+
+    print(json.dumps(results, indent=2))
+    if args.failures and (not results["unready_polls"]
+                          or results["failed_steps"] != ["vector_backend"]
+                          or results["retries"] < args.failures):
+        raise SystemExit("readiness did not stay at 503 while the catalog "
+                         "sync was failing")
+    if results["search_titles"] < 5:
+        raise SystemExit("search returned a partial list once ready")
+    if args.save:
+        RESULTS.parent.mkdir(parents=True, exist_ok=True)
+        RESULTS.write_text(json.dumps(results, indent=2) + "\n")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,138 @@
+"""Single-flight check: identical concurrent requests, upstream calls made.
+
+    python -m benchmarks.single_flight [--burst 16] [--save]
+
+Starts the app under uvicorn behind the fake OpenAI server (tool-call
+mode, slow embeddings and speech), once with SINGLE_FLIGHT_ENABLED=false
+and once with it on. Each run opens `--burst` conversations and, all at
+once, sends the same book request in every one of them, so every agent
+turn searches for the same query and fetches the same summary; then it
+asks for speech of the (identical) replies, again all at once. Upstream
+embedding and speech calls are counted by the fake server; the calls
+the app shared are read from /metrics. `--save` writes
+benchmarks/results/single_flight.json.
+"""
+import os
+import re
+import sys
+import json
+import time
+import socket
+import argparse
+import tempfile
+import statistics
+import subprocess
+import urllib.request
+from pathlib import Path
+from concurrent.futures import ThreadPoolExecutor
+from benchmarks.fake_openai import spawn
+from benchmarks.startup import make_sandbox, request, wait_for
+
+ROOT = Path(__file__).resolve().parents[1]
+RESULTS = ROOT / "benchmarks" / "results" / "single_flight.json"
+
+PROMPT = "Recommend a book about dragons and friendship"
+SHARED = re.compile(r'^librarian_single_flight_(\w+)_shared (\S+)$', re.M)
+
+
+def upstream(base_url: str) -> dict:
+    with urllib.request.urlopen(base_url + "/_stats") as resp:
+        return json.loads(resp.read())["endpoints"]
+
+
+def burst(calls: list) -> dict:
+    def timed(call):
+        started = time.perf_counter()
+        call()
+        return (time.perf_counter() - started) * 1000
+
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=len(calls)) as pool:
+        latencies = list(pool.map(timed, calls))
+    return {"wall_ms": round((time.perf_counter() - started) * 1000, 1),
+            "p50_ms": round(statistics.median(latencies), 1),
+            "max_ms": round(max(latencies), 1)}
+
+
+def run(cwd: Path, env: dict, base_url: str, size: int) -> dict:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        port = sock.getsockname()[1]
+    base = f"http://127.0.0.1:{port}"
+    server = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "app.main:app",
+         "--port", str(port), "--log-level", "warning"],
+        cwd=cwd, env=env)
+    try:
+        if not wait_for(base + "/readyz", time.monotonic() + 120):
+            raise RuntimeError("server never became ready")
+        credentials = {"username": "flight", "password": "single"}
+        request(base + "/register", credentials)
+        _, login = request(base + "/login", credentials)
+        token = login["access_token"]
+        conversations = [request(base + "/conversations", {}, token)[1]["id"]
+                         for _ in range(size)]
+
+        before = upstream(base_url)
+        chat = burst([
+            lambda conv=conv: request(
+                f"{base}/conversations/{conv}/messages",
+                {"content": PROMPT}, token)
+            for conv in conversations])
+        middle = upstream(base_url)
+        speech = burst([
+            lambda conv=conv: request(f"{base}/conversations/{conv}/tts",
+                                      token=token)
+            for conv in conversations])
+        after = upstream(base_url)
+        with urllib.request.urlopen(base + "/metrics") as resp:
+            shared = {name: int(float(value)) for name, value in
+                      SHARED.findall(resp.read().decode())}
+    finally:
+        server.terminate()
+        server.wait()
+
+    def calls(start: dict, end: dict, endpoint: str) -> int:
+        return end.get(endpoint, 0) - start.get(endpoint, 0)
+
+    return {"chat_burst": dict(chat, upstream_embeddings=calls(
+                before, middle, "embeddings")),
+            "tts_burst": dict(speech, upstream_speech=calls(
+                middle, after, "audio/speech")),
+            "shared_calls": shared}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--burst", type=int, default=16)
+    parser.add_argument("--save", action="store_true")
+    args = parser.parse_args()
+
+    results = {"burst": args.burst}
+    for mode, enabled in (("off", "false"), ("on", "true")):
+        fake, base_url = spawn(
+            "--tool-calls", "--latency", "0.05",
+            "--endpoint-latency", "embeddings=0.5",
+            "--endpoint-latency", "audio/speech=1.0")
+        env = dict(os.environ,
+                   OPENAI_API_KEY="sk-fake",
+                   OPENAI_BASE_URL=base_url,
+                   SECRET_KEY="single-flight",
+                   SINGLE_FLIGHT_ENABLED=enabled)
+        try:
+            with tempfile.TemporaryDirectory() as tmp:
+                cwd = make_sandbox(Path(tmp))
+                env["DATABASE_URL"] = f"sqlite:///{cwd / 'flight.db'}"
+                results[mode] = run(cwd, env, base_url, args.burst)
+        finally:
+            fake.terminate()
+        print(mode, results[mode], flush=True)
+
+    print(json.dumps(results, indent=2))
+    if args.save:
+        RESULTS.parent.mkdir(parents=True, exist_ok=True)
+        RESULTS.write_text(json.dumps(results, indent=2) + "\n")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,146 @@
+"""Cold-start benchmark: import-time breakdown and time to first request.
+
+    python -m benchmarks.startup [--save]
+
+Runs against a throwaway copy of the project (so the real Chroma store and
+logs.db are untouched) with the local fake OpenAI server behind it.
+`--save` writes the results to benchmarks/results/startup.json.
+"""
+import os
+import sys
+import json
+import time
+import shutil
+import socket
+import argparse
+import tempfile
+import subprocess
+import urllib.request
+import urllib.error
+from pathlib import Path
+from benchmarks.fake_openai import spawn
+
+ROOT = Path(__file__).resolve().parents[1]
+RESULTS = ROOT / "benchmarks" / "results" / "startup.json"
+
+
+def make_sandbox(tmp: Path) -> Path:
+    shutil.copytree(ROOT / "app", tmp / "app",
+                    ignore=shutil.ignore_patterns("__pycache__"))
+    (tmp / "data").mkdir()
+    shutil.copy(ROOT / "data" / "book_summaries.json", tmp / "data")
+    return tmp
+
+
+def import_breakdown(cwd: Path, env: dict, top: int) -> dict:
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", "import app.main"],
+        cwd=cwd, env=env, capture_output=True, text=True, check=True)
+    modules = []
+    for line in result.stderr.splitlines():
+        if not line.startswith("import time:") or "cumulative" in line:
+            continue
+        _, cumulative, name = line[len("import time:"):].split("|")
+        modules.append((name.strip(), int(cumulative) / 1000,
+                        len(name) - len(name.lstrip())))
+    total = sum(ms for _, ms, depth in modules if depth == 1)
+    heaviest = sorted(modules, key=lambda m: m[1], reverse=True)[:top]
+    return {"total_ms": round(total, 1),
+            "app_main_ms": round(next(ms for name, ms, _ in modules
+                                      if name == "app.main"), 1),
+            "heaviest": [[name, round(ms, 1)] for name, ms, _ in heaviest]}
+
+
+def request(url: str, body: dict | None = None, token: str | None = None):
+    data = json.dumps(body).encode() if body is not None else None
+    req = urllib.request.Request(url, data=data, method="POST" if data
+                                 else "GET")
+    req.add_header("Content-Type", "application/json")
+    if token:
+        req.add_header("Authorization", f"Bearer {token}")
+    with urllib.request.urlopen(req, timeout=60) as resp:
+        payload = resp.read()
+        if resp.headers.get_content_type() != "application/json":
+            return resp.status, None
+        return resp.status, json.loads(payload or b"null")
+
+
+def wait_for(url: str, deadline: float) -> bool:
+    while time.monotonic() < deadline:
+        try:
+            if request(url)[0] == 200:
+                return True
+        except urllib.error.HTTPError as error:
+            if error.code == 404:
+                return False
+        except (urllib.error.URLError, ConnectionError):
+            pass
+        time.sleep(0.02)
+    return False
+
+
+def first_requests(cwd: Path, env: dict) -> dict:
+    with socket.socket() as probe:
+        probe.bind(("127.0.0.1", 0))
+        port = probe.getsockname()[1]
+    base = f"http://127.0.0.1:{port}"
+    started = time.monotonic()
+    server = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "app.main:app",
+         "--port", str(port), "--log-level", "warning"],
+        cwd=cwd, env=env)
+    timings = {}
+    try:
+        deadline = started + 120
+        for name, path in (("listening", "/docs"),
+                           ("healthz", "/healthz"),
+                           ("readyz", "/readyz")):
+            if wait_for(base + path, deadline):
+                timings[f"{name}_ms"] = round(
+                    (time.monotonic() - started) * 1000, 1)
+
+        credentials = {"username": "bench", "password": "bench"}
+        request(base + "/register", credentials)
+        _, login = request(base + "/login", credentials)
+        token = login["access_token"]
+        _, conv = request(base + "/conversations", {}, token)
+        timings["first_authenticated_request_ms"] = round(
+            (time.monotonic() - started) * 1000, 1)
+        request(base + f"/conversations/{conv['id']}/messages",
+                {"content": "recommend a fantasy book"}, token)
+        timings["first_chat_reply_ms"] = round(
+            (time.monotonic() - started) * 1000, 1)
+    finally:
+        server.terminate()
+        server.wait()
+    return timings
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--save", action="store_true")
+    parser.add_argument("--top", type=int, default=15)
+    args = parser.parse_args()
+
+    fake, base_url = spawn("--dimensions", "1536")
+    env = dict(os.environ,
+               OPENAI_API_KEY="sk-fake",
+               OPENAI_BASE_URL=base_url,
+               SECRET_KEY="bench")
+    try:
+        with tempfile.TemporaryDirectory() as tmp:
+            cwd = make_sandbox(Path(tmp))
+            results = {"cold_import": import_breakdown(cwd, env, args.top),
+                       "warm_import": import_breakdown(cwd, env, args.top),
+                       "first_requests": first_requests(cwd, env)}
+    finally:
+        fake.terminate()
+
+    print(json.dumps(results, indent=2))
+    if args.save:
+        RESULTS.parent.mkdir(parents=True, exist_ok=True)
+        RESULTS.write_text(json.dumps(results, indent=2) + "\n")
+
+
+if __name__ == "__main__":
+    main()
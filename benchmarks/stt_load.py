@@ -0,0 +1,171 @@
+"""Speech-to-text under load: does transcription stall the worker?
+
+    python -m benchmarks.stt_load [--uploads 8] [--audio-kib 512]
+                                  [--stt-latency 1.5] [--save]
+
+Starts one uvicorn process behind the fake OpenAI server, with a slow
+`audio/transcriptions` endpoint. A probe loop times `GET /conversations`
+while idle, then while `--uploads` concurrent clients each post an
+`--audio-kib` upload to `/conversations/{id}/stt`. A worker whose event
+loop blocks on the upload or on the agent turn shows it as probe
+latency. An oversized upload must be refused with 413. `--save` writes
+benchmarks/results/stt_load.json.
+"""
+import os
+import sys
+import json
+import time
+import uuid
+import socket
+import argparse
+import tempfile
+import threading
+import statistics
+import subprocess
+import urllib.error
+import urllib.request
+from pathlib import Path
+from concurrent.futures import ThreadPoolExecutor
+from benchmarks.fake_openai import spawn
+from benchmarks.startup import make_sandbox, request, wait_for
+
+ROOT = Path(__file__).resolve().parents[1]
+RESULTS = ROOT / "benchmarks" / "results" / "stt_load.json"
+
+
+def upload(base: str, conversation_id: int, token: str,
+           audio: bytes) -> tuple[int, float]:
+    boundary = uuid.uuid4().hex
+    body = (f"--{boundary}\r\n"
+            f'Content-Disposition: form-data; name="file"; '
+            f'filename="speech.webm"\r\n'
+            f"Content-Type: audio/webm\r\n\r\n").encode()
+    body += audio + f"\r\n--{boundary}--\r\n".encode()
+    req = urllib.request.Request(
+        f"{base}/conversations/{conversation_id}/stt", data=body,
+        headers={"Content-Type": f"multipart/form-data; boundary={boundary}",
+                 "Authorization": f"Bearer {token}"})
+    started = time.perf_counter()
+    try:
+        with urllib.request.urlopen(req, timeout=120) as resp:
+            resp.read()
+            code = resp.status
+    except urllib.error.HTTPError as error:
+        code = error.code
+    return code, (time.perf_counter() - started) * 1000
+
+
+def probe(base: str, token: str, stop: threading.Event) -> list[float]:
+    latencies = []
+    while not stop.is_set():
+        started = time.perf_counter()
+        request(base + "/conversations", token=token)
+        latencies.append((time.perf_counter() - started) * 1000)
+        time.sleep(0.02)
+    return latencies
+
+
+def summary(latencies: list[float]) -> dict:
+    latencies = sorted(latencies)
+    return {"count": len(latencies),
+            "p50_ms": round(statistics.median(latencies), 1),
+            "p95_ms": round(latencies[int(len(latencies) * 0.95) - 1], 1),
+            "max_ms": round(latencies[-1], 1)}
+
+
+def probed(base: str, token: str, work) -> tuple[list[float], object]:
+    stop = threading.Event()
+    with ThreadPoolExecutor(max_workers=1) as pool:
+        future = pool.submit(probe, base, token, stop)
+        try:
+            result = work()
+        finally:
+            stop.set()
+        return future.result(), result
+
+
+def run(cwd: Path, env: dict, uploads: int, audio_kib: int) -> dict:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        port = sock.getsockname()[1]
+    base = f"http://127.0.0.1:{port}"
+    server = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "app.main:app",
+         "--port", str(port), "--log-level", "warning"],
+        cwd=cwd, env=env)
+    try:
+        if not wait_for(base + "/readyz", time.monotonic() + 120):
+            raise RuntimeError("server never became ready")
+        credentials = {"username": "stt", "password": "load-test"}
+        request(base + "/register", credentials)
+        _, login = request(base + "/login", credentials)
+        token = login["access_token"]
+        conversations = [request(base + "/conversations", {}, token)[1]["id"]
+                         for _ in range(uploads)]
+        audio = os.urandom(audio_kib * 1024)
+
+        idle, _ = probed(base, token, lambda: time.sleep(2.0))
+
+        def transcribe_all():
+            with ThreadPoolExecutor(max_workers=uploads) as pool:
+                return list(pool.map(
+                    lambda conv: upload(base, conv, token, audio),
+                    conversations))
+
+        started = time.perf_counter()
+        busy, results = probed(base, token, transcribe_all)
+        wall = time.perf_counter() - started
+        codes = [code for code, _ in results]
+        if any(code != 200 for code in codes):
+            raise SystemExit(f"uploads failed: {codes}")
+
+        limit = int(env.get("STT_MAX_UPLOAD_BYTES", 25 * 1024 * 1024))
+        oversized, _ = upload(base, conversations[0], token,
+                              b"\0" * (limit + 1))
+        if oversized != 413:
+            raise SystemExit(f"oversized upload answered {oversized}")
+    finally:
+        server.terminate()
+        server.wait()
+    return {"uploads": uploads,
+            "audio_kib": audio_kib,
+            "wall_seconds": round(wall, 2),
+            "upload": summary([ms for _, ms in results]),
+            "probe_idle": summary(idle),
+            "probe_during_stt": summary(busy),
+            "oversized_status": oversized}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--uploads", type=int, default=8)
+    parser.add_argument("--audio-kib", type=int, default=512)
+    parser.add_argument("--stt-latency", type=float, default=1.5)
+    parser.add_argument("--chat-latency", type=float, default=0.3)
+    parser.add_argument("--save", action="store_true")
+    args = parser.parse_args()
+
+    fake, base_url = spawn(
+        "--latency", str(args.chat_latency),
+        "--endpoint-latency", f"audio/transcriptions={args.stt_latency}")
+    env = dict(os.environ,
+               OPENAI_API_KEY="sk-fake",
+               OPENAI_BASE_URL=base_url,
+               SECRET_KEY="stt-load",
+               STT_MAX_UPLOAD_BYTES=str(4 * 1024 * 1024))
+    try:
+        with tempfile.TemporaryDirectory() as tmp:
+            cwd = make_sandbox(Path(tmp))
+            env["DATABASE_URL"] = f"sqlite:///{cwd / 'stt.db'}"
+            results = run(cwd, env, args.uploads, args.audio_kib)
+    finally:
+        fake.terminate()
+
+    print(json.dumps(results, indent=2))
+    if args.save:
+        RESULTS.parent.mkdir(parents=True, exist_ok=True)
+        RESULTS.write_text(json.dumps(results, indent=2) + "\n")
+
+
+if __name__ == "__main__":
+    main()
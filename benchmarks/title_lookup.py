@@ -0,0 +1,98 @@
+"""Title lookup latency: catalog index vs. the old load-and-scan path.
+
+Run from the project root:
+
+    python -m benchmarks.title_lookup
+"""
+import json
+import random
+import statistics
+import tempfile
+import time
+from pathlib import Path
+from app.utils.catalog import CatalogIndex
+
+SYLLABLES = ("ka", "lo", "ri", "men", "tha", "vor", "sel", "dra", "qui", "ben",
+             "os", "nar", "te", "wyn", "gal", "ith", "mor", "cae", "un", "pel")
+STOPWORDS = ("the", "of", "a", "and", "in")
+SIZES = (10, 10_000, 100_000)
+
+
+def make_vocabulary(rng: random.Random, size: int = 5000) -> list[str]:
+    return ["".join(rng.choice(SYLLABLES) for _ in range(rng.randint(1, 4)))
+            for _ in range(size)]
+
+
+def make_catalog(size: int, rng: random.Random) -> list[dict]:
+    vocabulary = make_vocabulary(rng)
+    books, seen = [], set()
+    while len(books) < size:
+        words = [rng.choice(vocabulary) for _ in range(rng.randint(1, 4))]
+        if rng.random() < 0.5:
+            words.insert(0, rng.choice(STOPWORDS))
+        title = " ".join(words).title()
+        title = f"{title} {len(books)}" if title in seen else title
+        seen.add(title)
+        books.append({"title": title,
+                      "summary": "A short summary.",
+                      "full_summary": "A longer summary. " * 20})
+    return books
+
+
+def misspell(title: str, rng: random.Random) -> str:
+    i = rng.randrange(len(title))
+    return title[:i] + title[i + 1:]
+
+
+def legacy_lookup(path: Path, title: str):
+    with open(path, "r", encoding="utf-8") as f:
+        books = json.load(f)
+    for book in books:
+        if book["title"].strip().lower() == title.strip().lower():
+            return book["full_summary"]
+    return None
+
+
+def timed(fn, queries) -> list[float]:
+    samples = []
+    for q in queries:
+        start = time.perf_counter()
+        fn(q)
+        samples.append((time.perf_counter() - start) * 1e6)
+    return samples
+
+
+def report(label: str, samples: list[float]):
+    samples = sorted(samples)
+    p99 = samples[min(len(samples) - 1, int(len(samples) * 0.99))]
+    print(f"  {label:<18} mean {statistics.fmean(samples):>12.1f} us"
+          f"   p50 {statistics.median(samples):>12.1f} us"
+          f"   p99 {p99:>12.1f} us")
+
+
+def main():
+    rng = random.Random(7)
+    with tempfile.TemporaryDirectory() as tmp:
+        for size in SIZES:
+            books = make_catalog(size, rng)
+            path = Path(tmp) / f"catalog_{size}.json"
+            path.write_text(json.dumps(books), encoding="utf-8")
+
+            index = CatalogIndex(path)
+            start = time.perf_counter()
+            index.refresh()
+            build_ms = (time.perf_counter() - start) * 1e3
+
+            titles = [b["title"] for b in rng.choices(books, k=1000)]
+            typos = [misspell(t, rng) for t in titles[:200]]
+            legacy_runs = titles[:max(3, 2000 // max(1, size // 100))]
+
+            print(f"{size} titles (index build {build_ms:.1f} ms)")
+            report("index exact", timed(index.get, titles))
+            report("index fuzzy", timed(index.closest, typos))
+            report("legacy scan",
+                   timed(lambda t: legacy_lookup(path, t), legacy_runs))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,197 @@
+"""Vector backend benchmark: Chroma vs the NumPy/mmap engine.
+
+    python -m benchmarks.vector_backends [--sizes 10000 100000] [--save]
+
+Builds both backends over the same synthetic, clustered corpus in a
+temporary directory, then queries each one from a fresh process and
+reports queries per second, memory (resident and private, i.e. not
+shareable with other workers), on-disk size and recall@k against an exact
+float32 search. `--save` writes benchmarks/results/vector_backends.json.
+"""
+import sys
+import json
+import time
+import argparse
+import tempfile
+import subprocess
+import numpy as np
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parents[1]
+RESULTS = ROOT / "benchmarks" / "results" / "vector_backends.json"
+COLLECTION = "bench"
+
+
+def corpus(size: int, dimensions: int, seed: int = 7) -> np.ndarray:
+    rng = np.random.default_rng(seed)
+    centers = rng.standard_normal((max(size // 50, 1), dimensions),
+                                  dtype=np.float32)
+    vectors = (centers[rng.integers(len(centers), size=size)]
+               + 0.5 * rng.standard_normal((size, dimensions),
+                                           dtype=np.float32))
+    return vectors / np.linalg.norm(vectors, axis=1, keepdims=True)
+
+
+def queries(vectors: np.ndarray, count: int, seed: int = 11) -> np.ndarray:
+    rng = np.random.default_rng(seed)
+    picked = vectors[rng.integers(len(vectors), size=count)]
+    noisy = picked + 0.3 * rng.standard_normal(picked.shape,
+                                               dtype=np.float32)
+    return noisy / np.linalg.norm(noisy, axis=1, keepdims=True)
+
+
+def build_chroma(path: Path, vectors: np.ndarray):
+    import chromadb
+
+    client = chromadb.PersistentClient(path=str(path))
+    collection = client.get_or_create_collection(COLLECTION)
+    batch = client.get_max_batch_size()
+    for start in range(0, len(vectors), batch):
+        ids = range(start, min(start + batch, len(vectors)))
+        collection.add(ids=[str(i) for i in ids],
+                       embeddings=vectors[start:start + batch].tolist(),
+                       documents=[f"summary {i}" for i in ids],
+                       metadatas=[{"title": f"book-{i}"} for i in ids])
+
+
+def build_numpy(path: Path, vectors: np.ndarray, dtype: str):
+    from app.utils.vector_backends import NumpyBackend
+
+    NumpyBackend.write(path, vectors,
+                       [f"book-{i}" for i in range(len(vectors))],
+                       [f"summary {i}" for i in range(len(vectors))],
+                       dtype)
+
+
+def memory_mb() -> dict:
+    fields = {}
+    with open("/proc/self/smaps_rollup") as f:
+        for line in f:
+            name, _, value = line.partition(":")
+            if value.strip().endswith("kB"):
+                fields[name] = int(value.split()[0])
+    return {"rss": fields["Rss"] / 1024,
+            "private": (fields["Private_Clean"]
+                        + fields["Private_Dirty"]) / 1024}
+
+
+def disk_mb(path: Path) -> float:
+    return sum(f.stat().st_size for f in path.rglob("*")
+               if f.is_file()) / 2 ** 20
+
+
+def worker(backend: str, path: Path, queries_path: Path, k: int):
+    from app.utils.vector_backends import ChromaBackend, NumpyBackend
+
+    probes = np.load(queries_path)
+    if backend == "chroma":
+        import chromadb
+        from langchain_chroma import Chroma
+    before = memory_mb()
+    if backend == "chroma":
+        store = ChromaBackend(Chroma(
+            client=chromadb.PersistentClient(path=str(path)),
+            collection_name=COLLECTION))
+    else:
+        store = NumpyBackend(path)
+
+    store.search_by_vector(probes[0].tolist(), k)
+    found = []
+    started = time.perf_counter()
+    for probe in probes:
+        docs = store.search_by_vector(probe.tolist(), k)
+        found.append([int(doc.metadata["title"][5:]) for doc in docs])
+    elapsed = time.perf_counter() - started
+    after = memory_mb()
+    print(json.dumps({"qps": len(probes) / elapsed,
+                      "rss_mb": after["rss"] - before["rss"],
+                      "private_mb": after["private"] - before["private"],
+                      "found": found}))
+
+
+def run_worker(backend: str, path: Path, queries_path: Path, k: int):
+    result = subprocess.run(
+        [sys.executable, "-m", "benchmarks.vector_backends",
+         "--worker", backend, "--path", str(path),
+         "--queries-file", str(queries_path), "--k", str(k)],
+        capture_output=True, text=True, check=True)
+    return json.loads(result.stdout.splitlines()[-1])
+
+
+def recall(found: list[list[int]], exact: np.ndarray) -> float:
+    hits = sum(len(set(row) & set(truth.tolist()))
+               for row, truth in zip(found, exact))
+    return hits / exact.size
+
+
+def run(size: int, dimensions: int, count: int, k: int,
+        dtypes: list[str]) -> dict:
+    vectors = corpus(size, dimensions)
+    probes = queries(vectors, count)
+    scores = probes @ vectors.T
+    exact = np.argsort(-scores, axis=1)[:, :k]
+
+    report = {}
+    with tempfile.TemporaryDirectory() as tmp:
+        tmp = Path(tmp)
+        np.save(tmp / "queries.npy", probes)
+        targets = [("chroma", tmp / "chroma")]
+        started = time.perf_counter()
+        build_chroma(tmp / "chroma", vectors)
+        build_seconds = {"chroma": time.perf_counter() - started}
+        for dtype in dtypes:
+            name = f"numpy-{dtype}"
+            started = time.perf_counter()
+            build_numpy(tmp / name, vectors, dtype)
+            build_seconds[name] = time.perf_counter() - started
+            targets.append((name, tmp / name))
+
+        for name, path in targets:
+            result = run_worker(name.split("-")[0], path,
+                                tmp / "queries.npy", k)
+            report[name] = {
+                "qps": round(result["qps"], 1),
+                "rss_mb": round(result["rss_mb"], 1),
+                "private_mb": round(result["private_mb"], 1),
+                "disk_mb": round(disk_mb(path), 1),
+                "build_s": round(build_seconds[name], 2),
+                f"recall@{k}": round(recall(result["found"], exact), 3),
+            }
+    return report
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--sizes", type=int, nargs="+",
+                        default=[10_000, 100_000])
+    parser.add_argument("--dimensions", type=int, default=384)
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--k", type=int, default=5)
+    parser.add_argument("--dtypes", nargs="+",
+                        default=["float32", "float16", "int8"])
+    parser.add_argument("--save", action="store_true")
+    parser.add_argument("--worker", help=argparse.SUPPRESS)
+    parser.add_argument("--path", type=Path, help=argparse.SUPPRESS)
+    parser.add_argument("--queries-file", type=Path, help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.worker:
+        worker(args.worker, args.path, args.queries_file, args.k)
+        return
+
+    results = {"dimensions": args.dimensions,
+               "queries": args.queries,
+               "sizes": {}}
+    for size in args.sizes:
+        results["sizes"][str(size)] = run(size, args.dimensions,
+                                          args.queries, args.k, args.dtypes)
+        print(json.dumps({size: results["sizes"][str(size)]}, indent=2),
+              flush=True)
+
+    if args.save:
+        RESULTS.parent.mkdir(parents=True, exist_ok=True)
+        RESULTS.write_text(json.dumps(results, indent=2) + "\n")
+
+
+if __name__ == "__main__":
+    main()